@@ -35,12 +35,32 @@ class Settings(BaseSettings):
     ]
 
     # 缓存配置
-    COOKIE_EXPIRE_SECONDS: int = 1800  # Cookie 30分钟过期
+    COOKIE_EXPIRE_SECONDS: int = 1800  # Cookie 30分钟过期（未学习到域名有效期时的默认 TTL）
+    CREDENTIAL_TTL_LEARNING: bool = True  # 按 cf_clearance 实际过期时间与观察到的提前失效为每个域名设置 TTL
+    CREDENTIAL_TTL_MIN: int = 120  # 学习得到的 TTL 下限 (秒)
+    CREDENTIAL_TTL_MAX: int = 14400  # 学习得到的 TTL 上限 (秒)
+    CREDENTIAL_TTL_SAFETY: float = 0.8  # 观察到提前失效时，TTL 取失效时间的比例
+    SOLVE_BACKOFF_ENABLED: bool = True  # 过盾连续失败的域名进入回避期，期间请求快速失败
+    SOLVE_BACKOFF_BASE: int = 30  # 首次失败后的回避时间 (秒)，每次连续失败翻倍
+    SOLVE_BACKOFF_MAX: int = 1800  # 回避时间上限 (秒)
+    SOLVE_BACKOFF_JITTER: float = 0.3  # 回避时间随机缩短的最大比例
+    SOLVE_BACKOFF_PROXY: str = ""  # 回避期间改用的出口代理（如 "pool"），为空则直接失败
+    DIRECT_PROBE_ENABLED: bool = True  # 先直连探测，仅在遇到挑战时才启动浏览器过盾
     CACHE_DB_PATH: str = "data/cache.db"  # SQLite 数据库路径
+    CACHE_L1_ENABLED: bool = True  # 进程内一级凭证缓存，命中时不访问 Redis/SQLite
+    CACHE_L1_MAX_ENTRIES: int = 1024  # 一级缓存最大条目数 (LRU 淘汰)
+    CACHE_L1_MAX_AGE: int = 60  # 一级缓存条目最长存活 (秒)，兜底错过的失效广播
+    CACHE_STATS_FLUSH_INTERVAL: float = 1.0  # 缓存命中统计批量写入 Redis 的间隔 (秒)
+    RULE_CACHE_MAX_ENTRIES: int = 1000  # 进程内规则缓存最大条数 (LRU 淘汰)
+    RULE_CACHE_MAX_AGE: int = 300  # 进程内规则缓存最长存活 (秒)，兜底错过的变更广播
 
     # 内存看门狗配置
     MEMORY_LIMIT_MB: int = 1500  # 浏览器内存超过此值则重启 (MB)
-    WATCHDOG_INTERVAL: int = 300  # 看门狗检查间隔 (秒)
+    WATCHDOG_INTERVAL: int = 300  # 浏览器回收/内存检查间隔 (秒)
+    WATCHDOG_CACHE_INTERVAL: int = 300  # 过期缓存清理间隔 (秒)
+    WATCHDOG_REFRESH_INTERVAL: int = 120  # 即将过期凭证的主动刷新间隔 (秒)
+    WATCHDOG_JOB_TIMEOUT: int = 60  # 维护作业超时 (秒)
+    WATCHDOG_REFRESH_TIMEOUT: int = 180  # 凭证刷新作业超时 (秒)，需覆盖多次过盾
 
     # 指纹随机化配置
     FINGERPRINT_ENABLED: bool = True  # 是否启用 Canvas/WebGL 指纹随机化
@@ -49,6 +69,7 @@ class Settings(BaseSettings):
     PROXIES: list = []  # 代理列表 (from data/proxies.txt or env)
     PROXY_STRATEGY: str = "random"  # 代理策略: "random", "sticky_session" (未来扩展)
     PROXIES_FILE: str = "data/proxies.txt"
+    PROXY_COOKIE_MODE: bool = True  # 代理请求也走 Cookie 复用（凭证按域名+代理绑定），关闭则代理请求直接用浏览器
 
     # Redis 配置 (异步任务队列)
     REDIS_URL: str = "redis://localhost:6379"  # docker-compose override 会覆盖此项
@@ -57,9 +78,19 @@ class Settings(BaseSettings):
     BROWSER_POOL_MIN: int = 1  # 最小浏览器数量
     BROWSER_POOL_MAX: int = 3  # 最大浏览器数量
     BROWSER_POOL_IDLE_TIMEOUT: int = 300  # 空闲超时回收时间 (秒)
+    BROWSER_POOL_MAX_PER_PROXY: int = 2  # 单个代理子池的最大浏览器数量
+    BROWSER_TABS_PER_INSTANCE: int = 5  # 单个浏览器同时租出的最大标签页数 (并发过盾数 = 浏览器数 × 标签页数)
+    BROWSER_TAB_ISOLATION: bool = True  # 每个标签页使用独立的 BrowserContext (Cookie/存储隔离)
+    BROWSER_BLOCK_PROFILE: str = "lite"  # 浏览器直读资源拦截档位: off / lite / strict
+    BROWSER_BLOCK_DOMAIN_PROFILES: dict = {}  # 按域名指定拦截档位 {"example.com": "strict"}，子域名继承
+    BROWSER_BLOCK_BASELINE_RATE: float = 0.05  # 抽样不拦截的比例，用于计算节省的渲染耗时
 
     # 凭证自动刷新配置
     AUTO_REFRESH_CREDENTIALS: bool = True  # 是否自动刷新即将过期的凭证
+    REFRESH_AHEAD_THRESHOLD: int = 300  # 剩余有效期低于此值 (秒) 的凭证进入提前刷新
+    REFRESH_AHEAD_CONCURRENCY: int = 3  # 提前刷新的并发过盾数（另受浏览器池空闲标签页限制）
+    REFRESH_AHEAD_MAX_PER_ROUND: int = 20  # 每轮最多刷新的凭证数，其余按热度留到下一轮
+    REFRESH_AHEAD_MIN_RATE: float = 0.0  # 近期请求速率 (次/分钟) 低于此值的凭证不刷新，任其自然过期
 
     class Config:
         env_file = ".env"
@@ -2,8 +2,9 @@
 浏览器对象池 - 支持高并发过盾
 
 特性:
-- 维护多个浏览器实例
-- 自动扩缩容
+- 维护多个浏览器实例，每个实例以标签页租约的形式并发使用
+- 按代理分组的子池，同代理请求复用实例
+- 自动扩缩容（全局上限 + LRU 淘汰）
 - 空闲超时回收
 - 线程安全
 """
@@ -11,8 +12,7 @@
 import threading
 import time
 import sys
-from typing import Optional
-from queue import Queue, Empty
+from typing import Dict, Optional
 
 from DrissionPage import ChromiumOptions, ChromiumPage
 from config import settings
@@ -29,32 +29,69 @@ if sys.platform.startswith("linux"):
 
 
 class BrowserInstance:
-    """浏览器实例包装类"""
+    """浏览器实例包装类
 
-    def __init__(self, page: ChromiumPage):
+    一个浏览器进程可同时承载多个标签页租约，tabs_in_use 为当前租出的标签页数。
+    """
+
+    def __init__(self, page: ChromiumPage, proxy: Optional[str] = None):
         self.page = page
         self.pid = page.process_id
+        self.proxy = proxy  # 启动时绑定的代理，None 表示直连
         self.created_at = time.time()
         self.last_used_at = time.time()
         self.use_count = 0
-        self.in_use = False
+        self.tabs_in_use = 0
+
+    @property
+    def in_use(self) -> bool:
+        return self.tabs_in_use > 0
 
     def mark_used(self):
-        """标记为使用中"""
-        self.in_use = True
+        """占用一个标签页名额"""
+        self.tabs_in_use += 1
         self.last_used_at = time.time()
         self.use_count += 1
 
     def mark_free(self):
-        """标记为空闲"""
-        self.in_use = False
+        """归还一个标签页名额"""
+        self.tabs_in_use = max(0, self.tabs_in_use - 1)
         self.last_used_at = time.time()
 
 
+class TabLease:
+    """标签页租约
+
+    过盾和浏览器直读都在租到的标签页上执行，page 为该标签页对象。
+    开启隔离时每个标签页位于独立的 BrowserContext，Cookie/缓存/存储互不共享。
+    """
+
+    def __init__(self, instance: BrowserInstance, page, context_id: Optional[str] = None):
+        self.instance = instance
+        self.page = page
+        self.context_id = context_id
+
+    @property
+    def pid(self):
+        return self.instance.pid
+
+    @property
+    def proxy(self) -> Optional[str]:
+        return self.instance.proxy
+
+
 class BrowserPool:
     """浏览器对象池
 
     管理多个浏览器实例，支持高并发过盾。
+
+    并发单位是标签页：每个浏览器进程最多同时租出 tabs_per_instance 个标签页，
+    所有进程都满载时才启动新进程。
+
+    代理是浏览器启动参数，因此实例按代理分组为子池 (None 为直连子池)：
+    - 同一代理的请求复用该子池中的实例
+    - 每个代理子池有独立上限 max_per_proxy，直连子池上限为 max_size
+    - 所有子池共享全局上限 max_size，达到上限时按 LRU 淘汰其他子池中最久未用的空闲实例
     """
 
     def __init__(
@@ -62,27 +99,47 @@ class BrowserPool:
         min_size: int = 1,
         max_size: int = 3,
         idle_timeout: int = 300,
+        max_per_proxy: int = 2,
+        tabs_per_instance: int = 5,
+        tab_isolation: bool = True,
     ):
         """
         Args:
-            min_size: 最小浏览器数量
-            max_size: 最大浏览器数量
+            min_size: 最小浏览器数量 (直连子池)
+            max_size: 最大浏览器数量 (所有子池合计)
             idle_timeout: 空闲超时时间 (秒)，超时后回收
+            max_per_proxy: 单个代理子池的最大浏览器数量
+            tabs_per_instance: 单个浏览器同时租出的最大标签页数
+            tab_isolation: 是否为每个标签页创建独立的 BrowserContext
         """
         self.min_size = min_size
         self.max_size = max_size
         self.idle_timeout = idle_timeout
+        self.max_per_proxy = max_per_proxy
+        self.tabs_per_instance = tabs_per_instance
+        self.tab_isolation = tab_isolation
 
-        self._pool: Queue[BrowserInstance] = Queue()
         self._all_instances: list[BrowserInstance] = []
+        # 代理 -> 正在启动中的实例数（已占用名额，尚未加入 _all_instances）
+        self._pending: Dict[Optional[str], int] = {}
         self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
         self._initialized = False
+        self._metrics = {
+            "launches": 0,
+            "reuses": 0,
+            "evictions": 0,
+            "proxied_acquires": 0,
+            "proxied_launches": 0,
+            "tabs_opened": 0,
+            "tab_failures": 0,
+        }
 
     def _create_browser(self, proxy: str = None) -> BrowserInstance:
         """创建新的浏览器实例
 
         Args:
-            proxy: 代理地址，None 表示不使用代理，"pool" 表示从代理池获取，其他值为指定代理
+            proxy: 实际使用的代理地址，None 表示直连
         """
         log.info("[BrowserPool] 创建新浏览器实例...")
 
@@ -93,27 +150,23 @@ class BrowserPool:
         for arg in settings.BROWSER_ARGS:
             co.set_argument(arg)
 
-        # 根据参数决定是否使用代理
-        actual_proxy = None
-        if proxy == "pool":
-            actual_proxy = proxy_manager.get_proxy()
-            if actual_proxy:
-                log.info(f"[BrowserPool] 从代理池分配代理: {actual_proxy}")
-            else:
-                log.warning("[BrowserPool] 代理池为空，使用直连")
-        elif proxy:
-            actual_proxy = proxy
-            log.info(f"[BrowserPool] 使用指定代理: {actual_proxy}")
+        if proxy:
+            log.info(f"[BrowserPool] 使用代理: {proxy}")
+            co.set_argument(f"--proxy-server={proxy}")
         else:
             log.info("[BrowserPool] 不使用代理 (直连)")
 
-        if actual_proxy:
-            co.set_argument(f"--proxy-server={actual_proxy}")
-
         co.headless(settings.HEADLESS)
 
         page = ChromiumPage(co)
 
+        instance = BrowserInstance(page, proxy=proxy)
+        log.info(f"[BrowserPool] 浏览器已创建, PID: {instance.pid}")
+
+        return instance
+
+    def _inject_scripts(self, page):
+        """向标签页注入反检测与指纹脚本（初始化脚本按标签页生效，每个新标签页都需注入）"""
         # 注入反检测脚本（必须最先注入）
         try:
             page.add_init_js(get_stealth_script())
@@ -129,11 +182,121 @@ class BrowserPool:
             except Exception as e:
                 log.warning(f"[BrowserPool] 指纹脚本注入失败: {e}")
 
-        instance = BrowserInstance(page)
-        log.info(f"[BrowserPool] 浏览器已创建, PID: {instance.pid}")
+    def _open_tab(self, instance: BrowserInstance) -> TabLease:
+        """在浏览器实例中打开一个新标签页"""
+        tab = instance.page.new_tab(new_context=self.tab_isolation)
+        context_id = None
+        if self.tab_isolation:
+            try:
+                context_id = tab.run_cdp("Target.getTargetInfo")["targetInfo"].get("browserContextId")
+            except Exception as e:
+                log.debug(f"[BrowserPool] 获取标签页上下文失败: {e}")
+        self._inject_scripts(tab)
+        return TabLease(instance, tab, context_id)
 
+    def _close_tab(self, lease: TabLease):
+        """关闭标签页；隔离模式下销毁其 BrowserContext（连同其中的页面和 Cookie）"""
+        try:
+            if lease.context_id:
+                lease.instance.page.run_cdp("Target.disposeBrowserContext", browserContextId=lease.context_id)
+            else:
+                lease.page.close()
+        except Exception as e:
+            log.debug(f"[BrowserPool] 关闭标签页失败 PID {lease.pid}: {e}")
+
+    def _resolve_proxy(self, proxy: Optional[str]) -> Optional[str]:
+        """解析子池键: "pool" 从代理池分配，其他值原样使用"""
+        if proxy == "pool":
+            actual_proxy = proxy_manager.get_proxy()
+            if actual_proxy:
+                log.info(f"[BrowserPool] 从代理池分配代理: {actual_proxy}")
+            else:
+                log.warning("[BrowserPool] 代理池为空，使用直连")
+            return actual_proxy
+        return proxy or None
+
+    # ---------- 以下方法需在持有 self._lock 时调用 ----------
+
+    def _sub_pool_limit(self, key: Optional[str]) -> int:
+        if key is None:
+            return self.max_size
+        return min(self.max_per_proxy, self.max_size)
+
+    def _count(self, key: Optional[str]) -> int:
+        """子池实例数（含启动中）"""
+        return sum(1 for i in self._all_instances if i.proxy == key) + self._pending.get(key, 0)
+
+    def _total(self) -> int:
+        """全局实例数（含启动中）"""
+        return len(self._all_instances) + sum(self._pending.values())
+
+    def _pick_instance(self, key: Optional[str]) -> Optional[BrowserInstance]:
+        """选子池中仍有空余标签页名额、负载最低的实例（同负载优先最近使用的热实例）"""
+        candidates = [
+            i for i in self._all_instances
+            if i.proxy == key and i.tabs_in_use < self.tabs_per_instance
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: (i.tabs_in_use, -i.last_used_at))
+
+    def _reserve(self, key: Optional[str]):
+        self._pending[key] = self._pending.get(key, 0) + 1
+
+    def _detach(self, instance: BrowserInstance):
+        """从实例列表中移除（不关闭进程）"""
+        try:
+            self._all_instances.remove(instance)
+        except ValueError:
+            pass
+
+    def _find_eviction_victim(self, key: Optional[str]) -> Optional[BrowserInstance]:
+        """在其他子池中找最久未使用的空闲实例（直连子池保留 min_size 个）"""
+        direct_count = self._count(None)
+        candidates = [
+            i for i in self._all_instances
+            if i.proxy != key
+            and not i.in_use
+            and not (i.proxy is None and direct_count <= self.min_size)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: i.last_used_at)
+
+    # ---------- 以上方法需在持有 self._lock 时调用 ----------
+
+    def _launch(self, key: Optional[str], take_tab: bool = False) -> Optional[BrowserInstance]:
+        """启动已预留名额的浏览器实例（不持锁执行，避免阻塞其他子池）
+
+        Args:
+            take_tab: 是否在加入池的同时为调用方占用一个标签页名额
+        """
+        try:
+            instance = self._create_browser(proxy=key)
+        except Exception as e:
+            log.error(f"[BrowserPool] 创建浏览器失败: {e}")
+            instance = None
+
+        with self._cond:
+            self._pending[key] -= 1
+            if self._pending[key] <= 0:
+                del self._pending[key]
+            if instance:
+                if take_tab:
+                    instance.mark_used()
+                self._all_instances.append(instance)
+                self._metrics["launches"] += 1
+                if key:
+                    self._metrics["proxied_launches"] += 1
+            self._cond.notify_all()
         return instance
 
+    def _quit(self, instance: BrowserInstance):
+        try:
+            instance.page.quit()
+        except Exception as e:
+            log.debug(f"[BrowserPool] 关闭浏览器失败 PID {instance.pid} (可能已崩溃): {e}")
+
     def _init_pool(self):
         """初始化浏览器池"""
         if self._initialized:
@@ -147,162 +310,197 @@ class BrowserPool:
 
             for _ in range(self.min_size):
                 try:
-                    instance = self._create_browser()
-                    self._pool.put(instance)
-                    self._all_instances.append(instance)
+                    self._all_instances.append(self._create_browser())
                 except Exception as e:
                     log.error(f"[BrowserPool] 初始化浏览器失败: {e}")
 
             self._initialized = True
             log.info(f"[BrowserPool] 初始化完成, 当前数量: {len(self._all_instances)}")
 
-    def acquire(self, timeout: float = 30.0, proxy: str = None) -> Optional[BrowserInstance]:
-        """获取一个浏览器实例
+    def acquire(self, timeout: float = 30.0, proxy: str = None) -> Optional[TabLease]:
+        """租用一个标签页
 
         Args:
             timeout: 等待超时时间 (秒)
             proxy: 代理地址，None 表示不使用代理，"pool" 表示从代理池获取
 
         Returns:
-            BrowserInstance 或 None (超时)
+            TabLease 或 None (超时)
 
-        注意: 由于浏览器代理是启动参数，每次请求都会创建新的浏览器实例。
-        池中的实例仅用于无代理请求的复用。
+        优先在对应代理子池中负载最低的实例上开标签页；所有实例满载时在子池和全局上限内启动新实例，
+        全局已满且本子池没有实例时淘汰其他子池中最久未用的空闲实例；仍无法获取则等待释放。
         """
         self._init_pool()
 
-        # 如果指定了代理，直接创建新实例（因为代理是启动参数）
-        if proxy:
-            log.info(f"[BrowserPool] 请求使用代理，创建专用实例")
-            with self._lock:
-                if len(self._all_instances) < self.max_size:
-                    try:
-                        instance = self._create_browser(proxy=proxy)
-                        self._all_instances.append(instance)
+        key = self._resolve_proxy(proxy)
+        deadline = time.time() + timeout
+
+        with self._lock:
+            if key:
+                self._metrics["proxied_acquires"] += 1
+
+        while True:
+            instance = None
+            victim = None
+            with self._cond:
+                while True:
+                    instance = self._pick_instance(key)
+                    if instance:
                         instance.mark_used()
-                        return instance
-                    except Exception as e:
-                        log.error(f"[BrowserPool] 创建代理浏览器失败: {e}")
+                        self._metrics["reuses"] += 1
+                        break
+                    # 子池已有实例在启动中时等它就绪，它的空余标签页足以承接后续请求
+                    if not self._pending.get(key) and self._count(key) < self._sub_pool_limit(key):
+                        if self._total() < self.max_size:
+                            self._reserve(key)
+                            break
+                        # 全局已满：子池已有实例时等待其释放，避免子池间互相淘汰抖动
+                        victim = self._find_eviction_victim(key) if self._count(key) == 0 else None
+                        if victim:
+                            self._detach(victim)
+                            self._metrics["evictions"] += 1
+                            self._reserve(key)
+                            break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        log.warning("[BrowserPool] 获取浏览器超时，池已满")
                         return None
-                else:
-                    log.warning("[BrowserPool] 池已满，无法创建代理浏览器")
+                    self._cond.wait(remaining)
+
+            if victim:
+                log.info(f"[BrowserPool] LRU 淘汰空闲浏览器 PID: {victim.pid} (proxy={victim.proxy})")
+                self._quit(victim)
+
+            if instance is None:
+                instance = self._launch(key, take_tab=True)
+                if not instance:
                     return None
 
-        # 无代理请求，尝试从池中获取
-        try:
-            instance = self._pool.get(timeout=timeout)
-
-            # 检查浏览器是否还活着
-            if not instance.page.process_id:
-                log.warning(f"[BrowserPool] 浏览器已崩溃, 创建新实例")
-                with self._lock:
-                    self._all_instances.remove(instance)
-                instance = self._create_browser(proxy=None)
-                with self._lock:
-                    self._all_instances.append(instance)
-
-            instance.mark_used()
-            log.debug(f"[BrowserPool] 获取浏览器 PID: {instance.pid}")
-            return instance
-
-        except Empty:
-            # 池为空，尝试创建新实例
-            with self._lock:
-                if len(self._all_instances) < self.max_size:
-                    try:
-                        instance = self._create_browser(proxy=None)
-                        self._all_instances.append(instance)
-                        instance.mark_used()
-                        return instance
-                    except Exception as e:
-                        log.error(f"[BrowserPool] 创建浏览器失败: {e}")
+            try:
+                lease = self._open_tab(instance)
+            except Exception as e:
+                log.warning(f"[BrowserPool] 打开标签页失败 PID {instance.pid}: {e}")
+                with self._cond:
+                    instance.mark_free()
+                    self._cond.notify_all()
+                if self._is_alive(instance):
+                    # 进程正常：同进程中还有其他租约的标签页，不能销毁整个浏览器
+                    raise
+                # 浏览器已崩溃：移除该实例后重试
+                self._discard(instance)
+                if time.time() >= deadline:
+                    return None
+                continue
 
-            log.warning("[BrowserPool] 获取浏览器超时，池已满")
-            return None
+            with self._lock:
+                self._metrics["tabs_opened"] += 1
+            log.debug(f"[BrowserPool] 租用标签页 PID: {instance.pid} (proxy={key}, tabs={instance.tabs_in_use})")
+            return lease
 
-    def release(self, instance: BrowserInstance):
-        """归还浏览器实例到池中
+    def release(self, lease: TabLease):
+        """关闭标签页并归还名额
 
         Args:
-            instance: 要归还的浏览器实例
+            lease: 要归还的标签页租约
         """
-        instance.mark_free()
-        self._pool.put(instance)
-        log.debug(f"[BrowserPool] 归还浏览器 PID: {instance.pid}")
-
-    def destroy(self, instance: BrowserInstance):
-        """销毁损坏的浏览器实例并创建新实例补充池
+        self._close_tab(lease)
+        instance = lease.instance
+        with self._cond:
+            instance.mark_free()
+            stale = instance not in self._all_instances and not instance.in_use
+            self._cond.notify_all()
+        if stale:
+            # 使用期间已被回收或替换，最后一个标签页归还后关闭进程
+            self._quit(instance)
+        log.debug(f"[BrowserPool] 归还标签页 PID: {lease.pid}")
+
+    def destroy(self, lease: TabLease):
+        """销毁出错的标签页；浏览器进程已失效时连同实例一起销毁并补充池
 
         Args:
-            instance: 要销毁的浏览器实例
+            lease: 出错的标签页租约
         """
+        instance = lease.instance
+        with self._lock:
+            self._metrics["tab_failures"] += 1
+
+        if self._is_alive(instance):
+            # 进程正常，只丢弃该标签页，不影响同进程中的其他租约
+            log.warning(f"[BrowserPool] 丢弃出错标签页 PID: {instance.pid}")
+            self.release(lease)
+            return
+
+        with self._cond:
+            instance.mark_free()
+            self._cond.notify_all()
+        self._discard(instance)
+
+    def _is_alive(self, instance: BrowserInstance) -> bool:
+        try:
+            return bool(instance.page.states.is_alive)
+        except Exception:
+            return False
+
+    def _discard(self, instance: BrowserInstance):
+        """销毁损坏的浏览器实例并创建新实例补充池"""
         pid = instance.pid
         log.warning(f"[BrowserPool] 销毁损坏浏览器 PID: {pid}")
 
         # 1. 尝试关闭浏览器进程
-        try:
-            instance.page.quit()
-        except Exception as e:
-            log.debug(f"[BrowserPool] 关闭浏览器失败 (可能已崩溃): {e}")
+        self._quit(instance)
 
         # 2. 从实例列表中移除
-        with self._lock:
-            try:
-                self._all_instances.remove(instance)
-            except ValueError:
-                pass  # 已经不在列表中
-
-            # 3. 如果低于最小数量，创建新实例补充
-            if len(self._all_instances) < self.min_size:
-                try:
-                    new_instance = self._create_browser()
-                    self._all_instances.append(new_instance)
-                    self._pool.put(new_instance)
-                    log.info(f"[BrowserPool] 已创建新实例补充池, 新 PID: {new_instance.pid}")
-                except Exception as e:
-                    log.error(f"[BrowserPool] 创建补充实例失败: {e}")
+        with self._cond:
+            self._detach(instance)
+            # 3. 如果直连子池低于最小数量，创建新实例补充
+            replenish = self._count(None) < self.min_size and self._total() < self.max_size
+            if replenish:
+                self._reserve(None)
+            self._cond.notify_all()
+
+        if replenish:
+            new_instance = self._launch(None)
+            if new_instance:
+                log.info(f"[BrowserPool] 已创建新实例补充池, 新 PID: {new_instance.pid}")
 
     def cleanup_idle(self) -> int:
         """清理空闲超时的浏览器
 
+        直连子池保留 min_size 个，代理子池的空闲实例超时即回收。
+
         Returns:
             清理的数量
         """
-        cleaned = 0
         now = time.time()
+        to_remove = []
 
-        with self._lock:
-            # 保留最小数量
-            if len(self._all_instances) <= self.min_size:
-                return 0
-
-            to_remove = []
+        with self._cond:
+            direct_count = self._count(None)
             for instance in self._all_instances:
-                if not instance.in_use and (now - instance.last_used_at) > self.idle_timeout:
-                    if len(self._all_instances) - len(to_remove) > self.min_size:
-                        to_remove.append(instance)
+                if instance.in_use or (now - instance.last_used_at) <= self.idle_timeout:
+                    continue
+                if instance.proxy is None:
+                    if direct_count <= self.min_size:
+                        continue
+                    direct_count -= 1
+                to_remove.append(instance)
 
             for instance in to_remove:
-                try:
-                    instance.page.quit()
-                    self._all_instances.remove(instance)
-                    cleaned += 1
-                    log.info(f"[BrowserPool] 回收空闲浏览器 PID: {instance.pid}")
-                except Exception as e:
-                    log.warning(f"[BrowserPool] 回收浏览器失败 PID {instance.pid}: {e}")
-                    # 仍然从列表中移除，避免泄漏
-                    try:
-                        self._all_instances.remove(instance)
-                    except ValueError:
-                        pass
+                self._detach(instance)
+            if to_remove:
+                self._cond.notify_all()
+
+        for instance in to_remove:
+            self._quit(instance)
+            log.info(f"[BrowserPool] 回收空闲浏览器 PID: {instance.pid} (proxy={instance.proxy})")
 
-        return cleaned
+        return len(to_remove)
 
     def shutdown(self):
         """关闭所有浏览器"""
         log.info("[BrowserPool] 关闭所有浏览器...")
 
-        with self._lock:
+        with self._cond:
             for instance in self._all_instances:
                 try:
                     instance.page.quit()
@@ -311,46 +509,72 @@ class BrowserPool:
                     log.warning(f"[BrowserPool] 关闭浏览器失败 PID {instance.pid}: {e}")
             self._all_instances.clear()
             self._initialized = False
+            self._cond.notify_all()
 
     def get_stats(self) -> dict:
         """获取池状态"""
         with self._lock:
             in_use = sum(1 for i in self._all_instances if i.in_use)
+            tabs_in_use = sum(i.tabs_in_use for i in self._all_instances)
+            sub_pools = {}
+            for instance in self._all_instances:
+                label = instance.proxy or "direct"
+                sub = sub_pools.setdefault(label, {"total": 0, "in_use": 0, "tabs_in_use": 0})
+                sub["total"] += 1
+                sub["tabs_in_use"] += instance.tabs_in_use
+                if instance.in_use:
+                    sub["in_use"] += 1
+            proxied = self._metrics["proxied_acquires"]
             return {
                 "total": len(self._all_instances),
                 "in_use": in_use,
                 "available": len(self._all_instances) - in_use,
                 "min_size": self.min_size,
                 "max_size": self.max_size,
+                "max_per_proxy": self.max_per_proxy,
+                "tabs_per_instance": self.tabs_per_instance,
+                "tabs_in_use": tabs_in_use,
+                "tab_capacity": len(self._all_instances) * self.tabs_per_instance,
+                "sub_pools": sub_pools,
+                **self._metrics,
+                "launches_per_proxied_request": round(
+                    self._metrics["proxied_launches"] / proxied, 3
+                ) if proxied else 0,
             }
 
-    def get_memory_usage_mb(self) -> float:
-        """获取所有浏览器进程的内存使用量 (MB)"""
+    @staticmethod
+    def _process_rss_kb(pid: int, include_children: bool = True) -> int:
+        """读取进程（及其子进程）的 RSS (KB)"""
         import subprocess
         total_kb = 0
+        if include_children:
+            result = subprocess.run(
+                ["ps", "-o", "rss=", "--ppid", str(pid)],
+                capture_output=True, text=True, timeout=5
+            )
+            total_kb += sum(int(x) for x in result.stdout.split() if x.isdigit())
+        result = subprocess.run(
+            ["ps", "-o", "rss=", "-p", str(pid)],
+            capture_output=True, text=True, timeout=5
+        )
+        total_kb += int(result.stdout.strip()) if result.stdout.strip().isdigit() else 0
+        return total_kb
+
+    def get_memory_usage_mb(self) -> float:
+        """获取所有浏览器进程的内存使用量 (MB)
 
+        只在锁内复制 PID 列表，ps 子进程在锁外执行，不阻塞租用/归还。
+        """
         with self._lock:
-            for instance in self._all_instances:
-                if not instance.pid:
-                    continue
-                try:
-                    # 获取主进程及其子进程的内存总和
-                    result = subprocess.run(
-                        ["ps", "-o", "rss=", "--ppid", str(instance.pid)],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    child_mem = sum(int(x) for x in result.stdout.split() if x.isdigit())
-
-                    # 加上主进程内存
-                    result = subprocess.run(
-                        ["ps", "-o", "rss=", "-p", str(instance.pid)],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    main_mem = int(result.stdout.strip()) if result.stdout.strip().isdigit() else 0
-
-                    total_kb += child_mem + main_mem
-                except Exception:
-                    pass
+            pids = [i.pid for i in self._all_instances if i.pid]
+
+        total_kb = 0
+        for pid in pids:
+            try:
+                # 获取主进程及其子进程的内存总和
+                total_kb += self._process_rss_kb(pid)
+            except Exception:
+                pass
 
         return total_kb / 1024.0
 
@@ -363,38 +587,32 @@ class BrowserPool:
         Returns:
             重启的数量
         """
-        import subprocess
-        restarted = 0
-
         with self._lock:
-            for instance in self._all_instances:
-                if instance.in_use or not instance.pid:
+            candidates = [i for i in self._all_instances if not i.in_use and i.pid]
+
+        restarted = 0
+        for instance in candidates:
+            try:
+                # 获取该浏览器的内存使用（锁外执行）
+                mem_mb = self._process_rss_kb(instance.pid, include_children=False) / 1024.0
+            except Exception as e:
+                log.debug(f"[BrowserPool] 检查内存失败: {e}")
+                continue
+            if mem_mb <= limit_mb:
+                continue
+
+            with self._cond:
+                # 检查期间可能已被租用或回收
+                if instance.in_use or instance not in self._all_instances:
                     continue
+                self._detach(instance)
+                # 占住名额，创建替换实例（保持原代理子池）
+                self._reserve(instance.proxy)
 
-                try:
-                    # 获取该浏览器的内存使用
-                    result = subprocess.run(
-                        ["ps", "-o", "rss=", "-p", str(instance.pid)],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    mem_kb = int(result.stdout.strip()) if result.stdout.strip().isdigit() else 0
-                    mem_mb = mem_kb / 1024.0
-
-                    if mem_mb > limit_mb:
-                        log.warning(f"[BrowserPool] 浏览器 PID {instance.pid} 内存超限 ({mem_mb:.1f}MB > {limit_mb}MB)，重启中...")
-                        try:
-                            instance.page.quit()
-                        except Exception:
-                            pass
-
-                        # 创建新实例替换
-                        new_instance = self._create_browser()
-                        idx = self._all_instances.index(instance)
-                        self._all_instances[idx] = new_instance
-                        self._pool.put(new_instance)
-                        restarted += 1
-                except Exception as e:
-                    log.debug(f"[BrowserPool] 检查内存失败: {e}")
+            log.warning(f"[BrowserPool] 浏览器 PID {instance.pid} 内存超限 ({mem_mb:.1f}MB > {limit_mb}MB)，重启中...")
+            self._quit(instance)
+            if self._launch(instance.proxy):
+                restarted += 1
 
         return restarted
 
@@ -404,4 +622,7 @@ browser_pool = BrowserPool(
     min_size=settings.BROWSER_POOL_MIN,
     max_size=settings.BROWSER_POOL_MAX,
     idle_timeout=settings.BROWSER_POOL_IDLE_TIMEOUT,
+    max_per_proxy=settings.BROWSER_POOL_MAX_PER_PROXY,
+    tabs_per_instance=settings.BROWSER_TABS_PER_INSTANCE,
+    tab_isolation=settings.BROWSER_TAB_ISOLATION,
 )
@@ -12,7 +12,7 @@ Browser Fetcher - 浏览器直读页面获取器
 
 缺点:
 - 资源消耗大，每次请求都需要浏览器渲染
-- 并发能力差，浏览器实例有限
+- 并发受限于浏览器实例数 × 单实例标签页数
 - 速度较慢
 
 适用场景:
@@ -21,13 +21,62 @@ Browser Fetcher - 浏览器直读页面获取器
 - 对性能要求不高的场景
 """
 
+import threading
+import time
 from typing import Any, Dict, Optional
+from urllib.parse import urlparse
 
 from .base import BaseFetcher, FetchResponse
 from core.browser_pool import browser_pool
+from core.resource_blocker import ResourceBlocker
+from core.solve_events import SolveWatcher, click_turnstile
+from core.solver import SolveChallengeError, get_solve_stats, read_clearance_cookie
+from services.cache_service import credential_cache
+from services.domain_intelligence import domain_intel
+from services.proxy_manager import proxy_manager
 from utils.logger import log
 
 
+# 凭证预置统计：预置后未出现挑战即视为省掉一次过盾
+_seed_lock = threading.Lock()
+_seed_stats = {"seeded": 0, "avoided": 0, "challenged": 0, "saved_seconds": 0.0}
+# 未预置且遇到挑战时的过盾耗时滚动均值，用于估算省掉的浏览器时间
+_cold_solve_seconds: Optional[float] = None
+
+
+def _record_seed_outcome(seeded: bool, challenged: bool, cleared_after: float) -> None:
+    global _cold_solve_seconds
+    with _seed_lock:
+        if not seeded:
+            if challenged:
+                _cold_solve_seconds = cleared_after if _cold_solve_seconds is None else (
+                    _cold_solve_seconds + 0.2 * (cleared_after - _cold_solve_seconds)
+                )
+            return
+        _seed_stats["seeded"] += 1
+        if challenged:
+            _seed_stats["challenged"] += 1
+            return
+        _seed_stats["avoided"] += 1
+        saved = _cold_solve_seconds
+        if saved is None:
+            saved = get_solve_stats()["avg_solve_ms"] / 1000
+        # 省掉的是过盾部分，扣除本次真实加载耗时
+        _seed_stats["saved_seconds"] += max(0.0, saved - cleared_after)
+
+
+def get_seed_stats() -> dict:
+    """凭证预置统计：预置次数、避免过盾次数、估算节省的浏览器秒数"""
+    with _seed_lock:
+        seeded = _seed_stats["seeded"]
+        return {
+            **_seed_stats,
+            "saved_seconds": round(_seed_stats["saved_seconds"], 2),
+            "avoid_rate": round(_seed_stats["avoided"] / seeded, 3) if seeded else 0,
+            "cold_solve_seconds": round(_cold_solve_seconds, 2) if _cold_solve_seconds is not None else None,
+        }
+
+
 class BrowserFetcher(BaseFetcher):
     """浏览器直读 Fetcher
 
@@ -55,6 +104,7 @@ class BrowserFetcher(BaseFetcher):
         json: Optional[Dict[str, Any]] = None,
         proxy: str = None,
         wait_for: Optional[str] = None,
+        block_profile: Optional[str] = None,
         **kwargs
     ) -> FetchResponse:
         """使用浏览器直接获取页面
@@ -64,69 +114,80 @@ class BrowserFetcher(BaseFetcher):
             data: POST 表单数据（字符串格式如 "key1=value1&key2=value2" 或 dict）
             proxy: 代理地址，None 表示不使用代理，"pool" 表示从代理池获取
             wait_for: 等待指定的 CSS 选择器元素出现后再采集
+            block_profile: 资源拦截档位 (off / lite / strict)，None 表示按域名/全局配置
         """
         log.info(f"[{self.name}] 使用浏览器直接获取: {url} (method={method})")
 
-        # 从浏览器池获取实例，传递代理参数
-        instance = browser_pool.acquire(timeout=60, proxy=proxy)
-        if not instance:
+        # 代理池模式按域名固定出口，与 CookieFetcher 保持一致，回写的凭证才能被其复用
+        if proxy == "pool":
+            proxy = proxy_manager.get_sticky_proxy(urlparse(url).netloc, ttl=credential_cache.expire_seconds)
+
+        # 过盾连续失败的域名在回避期内直接失败，不占用浏览器
+        credential_cache.check_backoff(url, proxy)
+
+        # 从浏览器池租用标签页，传递代理参数
+        lease = browser_pool.acquire(timeout=60, proxy=proxy)
+        if not lease:
             raise Exception("无法获取浏览器实例，池已满")
 
+        page = lease.page
+        watcher = SolveWatcher(page)
+        blocker = ResourceBlocker(page, url, block_profile)
+
         try:
-            page = instance.page
+            watcher.start()
+            blocker.start()
+            # 0. 用缓存中的凭证预置 Cookie 与 UA，挑战通常不会再出现
+            seeded_creds = self._seed_credentials(page, url, lease.proxy)
+            seeded = seeded_creds is not None
+            nav_start = time.time()
 
             # 1. 访问目标页面或提交表单
             if method.upper() == "POST" and data:
                 # POST 请求：通过 JavaScript 创建并提交表单
-                log.info(f"[{self.name}] 使用 JS 表单提交 POST 请求: {url} (浏览器 PID: {instance.pid})")
-                self._submit_form_via_js(page, url, data)
+                log.info(f"[{self.name}] 使用 JS 表单提交 POST 请求: {url} (浏览器 PID: {lease.pid})")
+                self._submit_form_via_js(page, url, data, watcher)
             else:
                 # GET 请求：直接访问
-                log.info(f"[{self.name}] 正在访问: {url} (浏览器 PID: {instance.pid})")
+                log.info(f"[{self.name}] 正在访问: {url} (浏览器 PID: {lease.pid})")
                 page.get(url)
 
-            # 2. 等待页面加载并处理 Cloudflare 验证
-            import time
-            start_time = time.time()
-            click_count = 0
-            last_click_time = 0
-            while time.time() - start_time < self.timeout:
-                title = page.title.lower()
+            # 2. 等待真实页面文档就绪并处理 Cloudflare 验证（由 CDP 事件唤醒）
+            deadline = time.time() + self.timeout
+            if not self._wait_until_cleared(page, watcher, deadline):
+                # 只有确实遇到挑战且未通过才计入过盾失败，加载慢的无防护页面不进入回避
+                if watcher.challenged:
+                    error = SolveChallengeError(f"页面加载超时 ({self.timeout}秒)，挑战未通过")
+                    credential_cache.record_solve_failure(url, error, proxy=lease.proxy)
+                    raise error
+                raise Exception(f"页面加载超时 ({self.timeout}秒)")
+
+            log.success(f"[{self.name}] 页面加载成功 (信号: {watcher.signal})")
+            credential_cache.record_solve_success(url, proxy=lease.proxy)
+            _record_seed_outcome(seeded, watcher.challenged, watcher.cleared_at - nav_start)
+            if seeded and watcher.challenged:
+                # 预置的缓存凭证已被站点拒绝，上报用于学习该域名凭证的实际有效期
+                credential_cache.report_blocked(url, seeded_creds, proxy=lease.proxy)
 
-                # 尝试点击 Cloudflare 验证码（避免频繁点击，间隔至少1.5秒）
+            # 如果指定了 wait_for，等待元素出现
+            if wait_for:
+                log.info(f"[{self.name}] 等待元素: {wait_for}")
                 try:
-                    box = page.ele("@name=cf-turnstile-response", timeout=0.5)
-                    if box:
-                        wrapper = box.parent()
-                        iframe = wrapper.shadow_root.ele("tag:iframe")
-                        cb = iframe.ele("tag:body").shadow_root.ele("tag:input")
-                        if cb and (time.time() - last_click_time) > 1.5:
-                            click_count += 1
-                            log.info(f"[{self.name}] 发现验证码，第 {click_count} 次点击...")
-                            cb.click()
-                            last_click_time = time.time()
-                except Exception:
-                    pass
-
-                # 检查是否过盾成功
-                if "just a moment" not in title and "cloudflare" not in title:
-                    log.success(f"[{self.name}] 页面加载成功，标题: {title}")
-
-                    # 如果指定了 wait_for，等待元素出现
-                    if wait_for:
-                        log.info(f"[{self.name}] 等待元素: {wait_for}")
-                        try:
-                            page.ele(wait_for, timeout=10)
-                            log.success(f"[{self.name}] 元素已出现: {wait_for}")
-                        except Exception as e:
-                            log.warning(f"[{self.name}] 等待元素超时: {wait_for}, 继续采集")
-                    else:
-                        time.sleep(1)  # 等待页面完全渲染
-                    break
-
-                time.sleep(1)
+                    page.ele(wait_for, timeout=10)
+                    log.success(f"[{self.name}] 元素已出现: {wait_for}")
+                except Exception as e:
+                    log.warning(f"[{self.name}] 等待元素超时: {wait_for}, 继续采集")
             else:
-                raise Exception(f"页面加载超时 ({self.timeout}秒)")
+                # 等待文档加载完成，替代固定等待
+                page.wait.doc_loaded(timeout=max(1.0, deadline - time.time()))
+
+            report = blocker.finish((time.time() - nav_start) * 1000)
+            log.info(
+                f"[{self.name}] 资源拦截[{report['profile']}]: 渲染 {report['render_ms']}ms, "
+                f"加载 {report['bytes_loaded']}B, 拦截 {sum(report['blocked'].values())} 个请求, "
+                f"约节省 {report['bytes_saved']}B / "
+                f"{'%sms' % report['ms_saved'] if report['ms_saved'] is not None else '(无基线)'}"
+            )
 
             # 3. 获取页面内容
             html = page.html
@@ -138,6 +199,11 @@ class BrowserFetcher(BaseFetcher):
 
             log.info(f"[{self.name}] 浏览器获取成功，内容长度: {len(html)}")
 
+            # 5. 回写凭证：浏览器已通过验证，后续请求可走 Cookie 复用而不必再次启用浏览器
+            # 未出现挑战说明预置的旧凭证仍在使用，回写时沿用其过盾时间与过期时间
+            reused = seeded_creds if seeded and not watcher.challenged else None
+            self._write_back_credentials(url, page, cookies, lease.proxy, reused)
+
             return FetchResponse(
                 status_code=200,
                 content=html.encode("utf-8", errors="ignore"),
@@ -153,19 +219,116 @@ class BrowserFetcher(BaseFetcher):
             raise
 
         finally:
-            # 归还浏览器到池中
-            browser_pool.release(instance)
+            blocker.stop()
+            watcher.stop()
+            # 关闭标签页，归还名额
+            browser_pool.release(lease)
 
-    def _submit_form_via_js(self, page, url: str, data) -> None:
+    def _seed_credentials(self, page, url: str, proxy: Optional[str]) -> Optional[Dict[str, Any]]:
+        """导航前通过 CDP 注入缓存凭证（Cookie + 匹配的 UA），只读缓存，不触发过盾
+
+        Returns:
+            已注入的凭证，未注入返回 None
+        """
+        try:
+            creds = credential_cache.peek_credentials(url, proxy=proxy)
+        except Exception as e:
+            log.debug(f"[{self.name}] 读取缓存凭证失败: {e}")
+            return None
+        if not creds or not creds.get("cookies"):
+            return None
+
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}/"
+        secure = parsed.scheme == "https"
+        cookies = [
+            {"name": name, "value": str(value), "url": origin, "secure": secure}
+            for name, value in creds["cookies"].items()
+        ]
+        try:
+            page.run_cdp("Network.setCookies", cookies=cookies)
+            # cf_clearance 与签发时的 UA 绑定，标签页 UA 必须与缓存一致
+            if creds.get("ua"):
+                page.run_cdp("Emulation.setUserAgentOverride", userAgent=creds["ua"])
+        except Exception as e:
+            log.warning(f"[{self.name}] 预置凭证失败: {e}")
+            return None
+
+        log.info(f"[{self.name}] 已预置缓存凭证: {parsed.netloc} ({len(cookies)} 个 Cookie)")
+        return creds
+
+    def _write_back_credentials(
+        self,
+        url: str,
+        page,
+        cookies: Dict[str, str],
+        proxy: Optional[str],
+        reused: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """将浏览器拿到的 Cookie 与 UA 写入凭证缓存（键与 CookieFetcher 相同: 域名 + 出口代理）
+
+        附带 cf_clearance 的实际过期时间与 Domain 属性，缓存据此设置 TTL 和共享作用域。
+        没有 cf_clearance 时只为已知无防护的域名回写，挑战页残留的 Cookie 不会进入缓存。
+
+        Args:
+            reused: 预置且未被拒绝的缓存凭证；cf_clearance 未变时沿用其过盾时间与过期时间，不重置 TTL
+        """
+        if not cookies:
+            return
+        if "cf_clearance" not in cookies and domain_intel.get_protection(url) != "unprotected":
+            log.debug(f"[{self.name}] 未获得 cf_clearance，不回写凭证: {urlparse(url).netloc}")
+            return
+        try:
+            creds = {"cookies": cookies, "ua": page.user_agent, "solved_at": None}
+            reused_cookies = (reused or {}).get("cookies") or {}
+            if reused and cookies.get("cf_clearance") == reused_cookies.get("cf_clearance"):
+                expires_at = reused.get("expires_at") or reused.get("expire_at")
+                if cookies == reused_cookies or (expires_at and expires_at <= time.time()):
+                    return
+                creds.update(
+                    solved_at=reused.get("solved_at"),
+                    expires_at=expires_at,
+                    cookie_domain=reused.get("cookie_domain"),
+                )
+            elif "cf_clearance" in cookies:
+                creds.update(read_clearance_cookie(page, url))
+            if credential_cache.store_credentials(url, creds, proxy=proxy):
+                clearance = "含 cf_clearance" if "cf_clearance" in cookies else "无 cf_clearance"
+                log.info(f"[{self.name}] 凭证已回写缓存: {urlparse(url).netloc} ({len(cookies)} 个 Cookie, {clearance})")
+        except Exception as e:
+            log.warning(f"[{self.name}] 凭证回写失败: {e}")
+
+    def _wait_until_cleared(self, page, watcher: SolveWatcher, deadline: float, tag: str = "") -> bool:
+        """点击验证码直到真实页面文档就绪或超时
+
+        Returns:
+            是否在截止时间前就绪
+        """
+        click_count = 0
+        last_click_time = 0
+        while not watcher.document_ready.is_set() and time.time() < deadline:
+            # 尝试点击 Cloudflare 验证码（避免频繁点击，间隔至少1.5秒）
+            try:
+                if (time.time() - last_click_time) > 1.5 and click_turnstile(page):
+                    click_count += 1
+                    log.info(f"[{self.name}] {tag}发现验证码，第 {click_count} 次点击...")
+                    last_click_time = time.time()
+            except Exception:
+                pass
+
+            watcher.wait_document(min(0.5, deadline - time.time()))
+        return watcher.document_ready.is_set()
+
+    def _submit_form_via_js(self, page, url: str, data, watcher: SolveWatcher) -> None:
         """通过 JavaScript 创建并提交表单实现 POST 请求
 
         Args:
             page: DrissionPage 页面对象
             url: 表单提交目标 URL
             data: 表单数据（字符串 "key1=value1&key2=value2" 或 dict）
+            watcher: 当前标签页的过盾信号监听器
         """
         from urllib.parse import parse_qs, urlparse
-        import time
 
         # 解析表单数据
         form_data = {}
@@ -184,30 +347,12 @@ class BrowserFetcher(BaseFetcher):
         page.get(base_url)
 
         # 等待页面加载并处理可能的 Cloudflare 验证
-        start_time = time.time()
-        while time.time() - start_time < self.timeout:
-            title = page.title.lower()
-
-            # 尝试点击 Cloudflare 验证码
-            try:
-                box = page.ele("@name=cf-turnstile-response", timeout=0.5)
-                if box:
-                    wrapper = box.parent()
-                    iframe = wrapper.shadow_root.ele("tag:iframe")
-                    cb = iframe.ele("tag:body").shadow_root.ele("tag:input")
-                    if cb:
-                        log.info(f"[{self.name}] [POST] 发现验证码，点击中...")
-                        cb.click()
-            except Exception:
-                pass
-
-            # 检查是否过盾成功
-            if "just a moment" not in title and "cloudflare" not in title:
-                log.info(f"[{self.name}] [POST] 基础页面加载成功，准备提交表单")
-                time.sleep(0.5)  # 短暂等待页面稳定
-                break
+        if self._wait_until_cleared(page, watcher, time.time() + self.timeout, tag="[POST] "):
+            page.wait.doc_loaded(timeout=self.timeout)
+            log.info(f"[{self.name}] [POST] 基础页面加载成功，准备提交表单")
 
-            time.sleep(0.5)
+        # 提交后等待的是表单响应页面的信号
+        watcher.reset()
 
         # 构建 JavaScript 代码创建并提交表单
         # 使用 JSON 传递数据避免转义问题
@@ -18,21 +18,102 @@ TLS 指纹方案说明:
 - 方案1 (当前): 不使用 impersonate，使用 curl_cffi 默认指纹
 - 方案2 (备选): 使用标准 requests 库
 - 方案3 (备选): 使用 impersonate 模拟特定浏览器版本
+
+直连探测 (probe-first):
+- 域名未被判定为受挑战保护时，先用 curl_cffi 指纹模拟直接请求（不带凭证）
+- 仅当 _is_blocked 检测到挑战时才启动浏览器过盾，结论记录到 domain_intel
+
+异步路径:
+- fetch_async() 基于长连接的 curl_cffi AsyncSession，按 (域名, 代理, 指纹) 复用连接池，
+  避免每次请求重新握手，也不占用 FastAPI 线程池
 """
 
-from typing import Any, Dict, Optional
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
 
 from curl_cffi import requests as curl_requests
+from curl_cffi.requests import AsyncSession
 # 方案2备选: 使用标准 requests
 # import requests as std_requests
 
 from .base import BaseFetcher, FetchResponse
+from config import settings
 from core.solver import solve_turnstile
-from services.cache_service import credential_cache
+from services.cache_service import SolveBackoffError, credential_cache
+from services.domain_intelligence import domain_intel
 from services.proxy_manager import proxy_manager
 from utils.logger import log
 
 
+class _AsyncSessionPool:
+    """AsyncSession 连接池
+
+    按 (事件循环, 域名, 代理, impersonate) 复用 AsyncSession，
+    超出上限时按 LRU 关闭最久未使用的会话。
+
+    会话只用于复用连接：不同调用方共用同一会话，响应的 Set-Cookie 不能进入会话 Cookie 罐，
+    否则会随后续无关请求发出，请求只携带显式传入的 cookies。
+    """
+
+    def __init__(self, max_sessions: int = 256, max_clients: int = 64):
+        self.max_sessions = max_sessions
+        self.max_clients = max_clients
+        self._sessions: "OrderedDict[Tuple, AsyncSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, domain: str, proxy: Optional[str], impersonate: Optional[str]) -> AsyncSession:
+        loop = asyncio.get_running_loop()
+        key = (id(loop), domain, proxy, impersonate)
+        evicted = None
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                return session
+
+            # discard_cookies: 响应的 Set-Cookie 不写入会话 Cookie 罐
+            session = AsyncSession(loop=loop, max_clients=self.max_clients, discard_cookies=True)
+            self._sessions[key] = session
+            if len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+
+        if evicted is not None:
+            loop.create_task(self._close_session(evicted))
+        return session
+
+    async def _close_session(self, session: AsyncSession):
+        try:
+            await session.close()
+        except Exception as e:
+            log.debug(f"[AsyncSessionPool] 关闭会话失败: {e}")
+
+    async def close_all(self):
+        """关闭当前事件循环下的所有会话（应用关闭时调用）"""
+        loop_id = id(asyncio.get_running_loop())
+        with self._lock:
+            keys = [k for k in self._sessions if k[0] == loop_id]
+            sessions = [self._sessions.pop(k) for k in keys]
+        for session in sessions:
+            await self._close_session(session)
+        if sessions:
+            log.info(f"[AsyncSessionPool] 已关闭 {len(sessions)} 个会话")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+
+# 只对幂等方法做直连探测，避免 POST 等请求在被拦截后重复提交
+PROBE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+# 全局异步会话池
+async_session_pool = _AsyncSessionPool()
+
+
 class CookieFetcher(BaseFetcher):
     """基于 Cookie 复用的 Fetcher
 
@@ -74,32 +155,47 @@ class CookieFetcher(BaseFetcher):
         """使用 Cookie 复用方式获取页面"""
         headers = headers or {}
 
+        # 确定出口代理 (只有明确指定时才使用)，本次请求的探测、过盾和复用都走该代理
+        use_proxy = self._resolve_proxy(proxy, url)
+
+        # 0. 直连探测：未受保护的域名无需浏览器过盾
+        if self._should_probe(url, method):
+            resp = None
+            try:
+                resp = self._do_request(
+                    url=url,
+                    method=method,
+                    headers=self._build_safe_headers(headers, None, url, method, body_type),
+                    cookies={},
+                    data=data,
+                    json=json,
+                    data_encoding=data_encoding,
+                    proxy=use_proxy,
+                )
+            except Exception as e:
+                log.warning(f"[{self.name}] 直连探测异常: {e}，转入过盾流程")
+            if resp is not None and self._accept_probe(url, resp):
+                return resp
+
         for attempt in range(self.retries + 1):
             force_refresh = attempt > 0
 
             # 1. 获取凭证 (Cookie + UA)
-            # 将代理参数传递给过盾流程
-            creds = credential_cache.get_credentials(url, force_refresh=force_refresh, proxy=proxy)
+            # 凭证按 (域名, 出口代理) 缓存，过盾与请求使用同一代理
+            try:
+                creds = credential_cache.get_credentials(url, force_refresh=force_refresh, proxy=use_proxy)
+            except SolveBackoffError:
+                # 当前出口处于过盾失败回避期，有备用出口时改走备用出口
+                alt_proxy = self._backoff_alternative(url, use_proxy)
+                if not alt_proxy:
+                    raise
+                use_proxy = alt_proxy
+                creds = credential_cache.get_credentials(url, force_refresh=force_refresh, proxy=use_proxy)
 
             # 2. 构造安全的请求头
             safe_headers = self._build_safe_headers(headers, creds["ua"], url, method, body_type)
 
-            # 3. 获取代理 (只有明确指定时才使用)
-            # proxy=None 表示不使用代理，proxy="pool" 表示从代理池获取
-            use_proxy = None
-            if proxy == "pool":
-                use_proxy = proxy_manager.get_proxy()
-                if use_proxy:
-                    log.info(f"[{self.name}] 使用代理池: {use_proxy}")
-                else:
-                    log.warning(f"[{self.name}] 代理池为空，使用直连")
-            elif proxy:
-                use_proxy = proxy
-                log.info(f"[{self.name}] 使用指定代理: {use_proxy}")
-            else:
-                log.info(f"[{self.name}] 不使用代理 (直连)")
-
-            # 4. 发起请求
+            # 3. 发起请求
             log.info(f"[{self.name}] 发起请求: {url} (尝试 {attempt + 1}/{self.retries + 1})")
 
             try:
@@ -114,11 +210,12 @@ class CookieFetcher(BaseFetcher):
                     proxy=use_proxy,
                 )
 
-                # 5. 检查是否被拦截，被拦截直接返回（由上层降级处理）
+                # 4. 检查是否被拦截，被拦截直接返回（由上层降级处理）
                 if self._is_blocked(resp):
                     log.warning(f"[{self.name}] 被拦截，返回响应（等待降级）")
                     # 注意：不清除缓存，因为无代理模式下 Cookie 可能仍然有效
                     # 清除缓存的逻辑已移除，降级后由 BrowserFetcher 处理
+                    self._report_blocked(url, resp, creds, use_proxy)
 
                 return resp
 
@@ -130,14 +227,155 @@ class CookieFetcher(BaseFetcher):
         # 不应该到达这里
         raise Exception("Unexpected error in CookieFetcher")
 
+    async def fetch_async(
+        self,
+        url: str,
+        method: str = "GET",
+        headers: Optional[Dict[str, str]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        data_encoding: Optional[str] = None,
+        proxy: Optional[str] = None,
+        body_type: Optional[str] = None,
+        **kwargs
+    ) -> FetchResponse:
+        """fetch() 的异步版本，HTTP 请求走复用连接的 AsyncSession
+
+        凭证获取可能触发浏览器过盾（阻塞），放到线程中执行。
+        """
+        headers = headers or {}
+        use_proxy = self._resolve_proxy(proxy, url)
+
+        if self._should_probe(url, method):
+            resp = None
+            try:
+                resp = await self._do_request_async(
+                    url=url,
+                    method=method,
+                    headers=self._build_safe_headers(headers, None, url, method, body_type),
+                    cookies={},
+                    data=data,
+                    json=json,
+                    data_encoding=data_encoding,
+                    proxy=use_proxy,
+                )
+            except Exception as e:
+                log.warning(f"[{self.name}] 直连探测异常: {e}，转入过盾流程")
+            if resp is not None and self._accept_probe(url, resp):
+                return resp
+
+        for attempt in range(self.retries + 1):
+            force_refresh = attempt > 0
+
+            try:
+                creds = await asyncio.to_thread(
+                    credential_cache.get_credentials, url, force_refresh=force_refresh, proxy=use_proxy
+                )
+            except SolveBackoffError:
+                alt_proxy = self._backoff_alternative(url, use_proxy)
+                if not alt_proxy:
+                    raise
+                use_proxy = alt_proxy
+                creds = await asyncio.to_thread(
+                    credential_cache.get_credentials, url, force_refresh=force_refresh, proxy=use_proxy
+                )
+            safe_headers = self._build_safe_headers(headers, creds["ua"], url, method, body_type)
+
+            log.info(f"[{self.name}] 发起异步请求: {url} (尝试 {attempt + 1}/{self.retries + 1})")
+
+            try:
+                resp = await self._do_request_async(
+                    url=url,
+                    method=method,
+                    headers=safe_headers,
+                    cookies=creds["cookies"],
+                    data=data,
+                    json=json,
+                    data_encoding=data_encoding,
+                    proxy=use_proxy,
+                )
+
+                if self._is_blocked(resp):
+                    log.warning(f"[{self.name}] 被拦截，返回响应（等待降级）")
+                    self._report_blocked(url, resp, creds, use_proxy)
+
+                return resp
+
+            except Exception as e:
+                log.error(f"[{self.name}] 异步请求异常: {e}")
+                if attempt == self.retries:
+                    raise
+
+        raise Exception("Unexpected error in CookieFetcher")
+
+    def _backoff_alternative(self, url: str, use_proxy: Optional[str]) -> Optional[str]:
+        """过盾回避期间的备用出口 (SOLVE_BACKOFF_PROXY)，未配置或与当前出口相同时返回 None"""
+        if not settings.SOLVE_BACKOFF_PROXY:
+            return None
+        alt_proxy = self._resolve_proxy(settings.SOLVE_BACKOFF_PROXY, url)
+        if not alt_proxy or alt_proxy == use_proxy:
+            return None
+        log.warning(f"[{self.name}] {urlparse(url).netloc} 处于过盾回避期，改用备用出口: {alt_proxy}")
+        return alt_proxy
+
+    def _report_blocked(self, url: str, resp: FetchResponse, creds: Dict[str, Any], proxy: Optional[str]):
+        """凭证被拒时上报缓存，学习该域名凭证的实际失效时间（429 为限流，不计入）"""
+        if resp.status_code == 429:
+            return
+        try:
+            credential_cache.report_blocked(url, creds, proxy=proxy)
+        except Exception as e:
+            log.debug(f"[{self.name}] 上报凭证失效失败: {e}")
+
+    def _should_probe(self, url: str, method: str) -> bool:
+        """是否先做直连探测
+
+        只探测幂等方法：探测被拦截后会带凭证重发，POST 等请求可能因此到达源站两次。
+        - 未受保护 / 未知：探测
+        - 已判定为受保护：直接走凭证流程
+        """
+        if not settings.DIRECT_PROBE_ENABLED or method.upper() not in PROBE_METHODS:
+            return False
+        return domain_intel.get_protection(url) != "protected"
+
+    def _accept_probe(self, url: str, resp: FetchResponse) -> bool:
+        """判定直连结果并记录结论，返回 True 表示可直接使用该响应"""
+        if self._is_blocked(resp):
+            log.info(f"[{self.name}] 直连遇到挑战，转入过盾流程: {url}")
+            domain_intel.set_protection(url, "protected")
+            return False
+        log.info(f"[{self.name}] 直连成功，跳过浏览器过盾: {url}")
+        domain_intel.set_protection(url, "unprotected")
+        return True
+
+    def _resolve_proxy(self, proxy: Optional[str], url: str) -> Optional[str]:
+        """解析实际使用的代理
+
+        proxy=None 表示不使用代理，proxy="pool" 表示从代理池获取。
+        代理池模式下同一域名在凭证有效期内固定使用同一代理。
+        """
+        use_proxy = None
+        if proxy == "pool":
+            use_proxy = proxy_manager.get_sticky_proxy(urlparse(url).netloc, ttl=credential_cache.expire_seconds)
+            if use_proxy:
+                log.info(f"[{self.name}] 使用代理池: {use_proxy}")
+            else:
+                log.warning(f"[{self.name}] 代理池为空，使用直连")
+        elif proxy:
+            use_proxy = proxy
+            log.info(f"[{self.name}] 使用指定代理: {use_proxy}")
+        else:
+            log.info(f"[{self.name}] 不使用代理 (直连)")
+        return use_proxy
+
     def _build_safe_headers(
-        self, headers: Dict[str, str], ua: str, url: str, method: str, body_type: Optional[str] = None
+        self, headers: Dict[str, str], ua: Optional[str], url: str, method: str, body_type: Optional[str] = None
     ) -> Dict[str, str]:
         """构造安全的请求头，过滤可能冲突的字段
 
         Args:
             headers: 用户自定义请求头
-            ua: User-Agent
+            ua: User-Agent，None 表示沿用 impersonate 指纹自带的 UA
             url: 请求 URL
             method: HTTP 方法
             body_type: 请求体类型 ("form" / "json" / "raw")
@@ -150,7 +388,8 @@ class CookieFetcher(BaseFetcher):
             "cookie",
         }
         safe = {k: v for k, v in headers.items() if k.lower() not in blocked_headers}
-        safe["User-Agent"] = ua
+        if ua:
+            safe["User-Agent"] = ua
 
         # 对于 POST/PUT/PATCH 等修改性请求，添加必要的浏览器请求头
         if method.upper() in ["POST", "PUT", "PATCH", "DELETE"]:
@@ -196,6 +435,43 @@ class CookieFetcher(BaseFetcher):
         proxy: Optional[str] = None,
     ) -> FetchResponse:
         """执行实际的 HTTP 请求"""
+        request_kwargs = self._build_request_kwargs(
+            url, method, headers, cookies, data, json, data_encoding, proxy
+        )
+        resp = curl_requests.request(**request_kwargs)
+        return self._to_fetch_response(resp)
+
+    async def _do_request_async(
+        self,
+        url: str,
+        method: str,
+        headers: Dict[str, str],
+        cookies: Dict[str, str],
+        data: Optional[Dict[str, Any]],
+        json: Optional[Dict[str, Any]],
+        data_encoding: Optional[str] = None,
+        proxy: Optional[str] = None,
+    ) -> FetchResponse:
+        """通过连接池中的 AsyncSession 执行 HTTP 请求"""
+        request_kwargs = self._build_request_kwargs(
+            url, method, headers, cookies, data, json, data_encoding, proxy
+        )
+        session = async_session_pool.get(urlparse(url).netloc, proxy, self.impersonate)
+        resp = await session.request(**request_kwargs)
+        return self._to_fetch_response(resp)
+
+    def _build_request_kwargs(
+        self,
+        url: str,
+        method: str,
+        headers: Dict[str, str],
+        cookies: Dict[str, str],
+        data: Optional[Dict[str, Any]],
+        json: Optional[Dict[str, Any]],
+        data_encoding: Optional[str] = None,
+        proxy: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """构造 curl_cffi 请求参数（同步/异步共用）"""
         # 处理 data 编码（如 GBK）
         request_data = data
         if data and data_encoding:
@@ -233,9 +509,10 @@ class CookieFetcher(BaseFetcher):
         if self.impersonate:
             request_kwargs["impersonate"] = self.impersonate
 
-        resp = curl_requests.request(**request_kwargs)
+        return request_kwargs
 
-        # 转换为统一的 FetchResponse
+    def _to_fetch_response(self, resp) -> FetchResponse:
+        """转换为统一的 FetchResponse"""
         return FetchResponse(
             status_code=resp.status_code,
             content=resp.content,
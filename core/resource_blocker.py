@@ -0,0 +1,279 @@
+"""
+浏览器资源拦截 - 减少 BrowserFetcher 渲染时的无效流量
+
+BrowserFetcher 只需要 page.html，图片/字体/媒体/统计脚本都是浪费。
+通过 CDP Fetch 域按资源类型拦截请求，Network.setBlockedURLs 屏蔽常见追踪域名；
+Cloudflare 挑战相关请求 (challenges.cloudflare.com、/cdn-cgi/) 始终放行。
+
+档位:
+- off: 不拦截
+- lite: 图片、字体、媒体、追踪脚本
+- strict: lite + 样式表、预取、信标等杂项请求
+
+选择顺序: 规则指定 > 域名配置 (BROWSER_BLOCK_DOMAIN_PROFILES) > 全局默认 (BROWSER_BLOCK_PROFILE)
+"""
+
+import random
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from config import settings
+from utils.logger import log
+
+PROFILES: Dict[str, tuple] = {
+    "off": (),
+    "lite": ("Image", "Font", "Media"),
+    "strict": ("Image", "Font", "Media", "Stylesheet", "Ping", "Prefetch", "TextTrack", "Manifest"),
+}
+
+# 追踪/广告域名，lite 和 strict 档位屏蔽
+TRACKER_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*googlesyndication.com*",
+    "*doubleclick.net*",
+    "*adservice.google.*",
+    "*facebook.net*",
+    "*connect.facebook.com*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*scorecardresearch.com*",
+    "*segment.io*",
+    "*hm.baidu.com*",
+    "*cnzz.com*",
+    "*umeng.com*",
+]
+
+# 过盾所需请求，任何档位都不拦截
+_ALLOW_HOSTS = ("challenges.cloudflare.com",)
+_ALLOW_PATH_MARK = "/cdn-cgi/"
+
+# 各资源类型的平均传输字节数初值，运行中按实际加载的资源滚动修正
+_DEFAULT_AVG_BYTES = {
+    "Image": 40_000,
+    "Font": 50_000,
+    "Media": 300_000,
+    "Stylesheet": 25_000,
+    "Script": 30_000,
+    "Ping": 500,
+    "Prefetch": 20_000,
+    "TextTrack": 5_000,
+    "Manifest": 2_000,
+}
+_EMA_ALPHA = 0.1
+_BASELINE_ALPHA = 0.3
+
+
+def resolve_profile(url: str, profile: Optional[str] = None) -> str:
+    """确定本次请求使用的拦截档位"""
+    if profile in PROFILES:
+        return profile
+    if profile:
+        log.warning(f"[ResourceBlocker] 未知拦截档位: {profile}，使用默认配置")
+
+    host = (urlparse(url).hostname or "").lower()
+    domain_profiles = settings.BROWSER_BLOCK_DOMAIN_PROFILES or {}
+    # 按域名逐级向上匹配: a.b.example.com -> b.example.com -> example.com
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        candidate = ".".join(labels[i:])
+        if domain_profiles.get(candidate) in PROFILES:
+            return domain_profiles[candidate]
+
+    default = settings.BROWSER_BLOCK_PROFILE
+    return default if default in PROFILES else "off"
+
+
+class _BlockingStats:
+    """拦截效果统计：按资源类型学习平均体积，按域名记录不拦截时的渲染耗时基线"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._avg_bytes: Dict[str, float] = dict(_DEFAULT_AVG_BYTES)
+        self._baseline_ms: Dict[str, float] = {}
+        self._totals = {
+            "fetches": 0,
+            "blocked_requests": 0,
+            "bytes_loaded": 0,
+            "bytes_saved": 0,
+            "ms_saved": 0.0,
+            "ms_saved_samples": 0,
+            "baseline_samples": 0,
+        }
+
+    def learn_size(self, resource_type: str, size: int):
+        if not resource_type or size <= 0:
+            return
+        with self._lock:
+            prev = self._avg_bytes.get(resource_type)
+            self._avg_bytes[resource_type] = size if prev is None else prev + _EMA_ALPHA * (size - prev)
+
+    def estimate_bytes(self, blocked: Dict[str, int]) -> int:
+        with self._lock:
+            return int(sum(self._avg_bytes.get(t, 0) * n for t, n in blocked.items()))
+
+    def record(self, domain: str, profile: str, render_ms: float, bytes_loaded: int,
+               blocked: Dict[str, int], bytes_saved: int) -> Optional[float]:
+        """记录一次渲染，返回相对该域名不拦截基线节省的毫秒数（无基线时为 None）"""
+        with self._lock:
+            self._totals["fetches"] += 1
+            self._totals["bytes_loaded"] += bytes_loaded
+            if profile == "off":
+                prev = self._baseline_ms.get(domain)
+                self._baseline_ms[domain] = render_ms if prev is None else prev + _BASELINE_ALPHA * (render_ms - prev)
+                self._totals["baseline_samples"] += 1
+                return None
+            self._totals["blocked_requests"] += sum(blocked.values())
+            self._totals["bytes_saved"] += bytes_saved
+            baseline = self._baseline_ms.get(domain)
+            if baseline is None:
+                return None
+            ms_saved = baseline - render_ms
+            self._totals["ms_saved"] += ms_saved
+            self._totals["ms_saved_samples"] += 1
+            return ms_saved
+
+    def has_baseline(self, domain: str) -> bool:
+        with self._lock:
+            return domain in self._baseline_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            totals = dict(self._totals)
+            samples = totals.pop("ms_saved_samples")
+            fetches = totals["fetches"]
+            totals["avg_bytes_saved"] = int(totals["bytes_saved"] / fetches) if fetches else 0
+            totals["avg_ms_saved"] = round(totals.pop("ms_saved") / samples, 1) if samples else None
+            totals["baseline_domains"] = len(self._baseline_ms)
+            totals["avg_bytes_by_type"] = {t: int(v) for t, v in self._avg_bytes.items()}
+            return totals
+
+
+blocking_stats = _BlockingStats()
+
+
+def get_blocking_stats() -> dict:
+    """资源拦截统计"""
+    return {"default_profile": settings.BROWSER_BLOCK_PROFILE, **blocking_stats.snapshot()}
+
+
+class ResourceBlocker:
+    """在单个标签页上应用拦截档位，并统计加载/拦截的流量
+
+    用法:
+        blocker = ResourceBlocker(page, url, profile)
+        blocker.start()          # 必须在 page.get 之前调用
+        ...
+        report = blocker.finish(render_ms)
+        blocker.stop()
+    """
+
+    def __init__(self, page, url: str, profile: Optional[str] = None):
+        self.page = page
+        self.domain = (urlparse(url).hostname or "").lower()
+        self.profile = resolve_profile(url, profile)
+        # 未显式指定档位时按比例抽样不拦截的渲染，作为该域名的耗时基线（没有基线时先采一次）
+        if self.profile != "off" and profile != self.profile:
+            rate = settings.BROWSER_BLOCK_BASELINE_RATE
+            if rate > 0 and (not blocking_stats.has_baseline(self.domain) or random.random() < rate):
+                log.debug(f"[ResourceBlocker] {self.domain} 本次不拦截，采集耗时基线")
+                self.profile = "off"
+        self.blocked: Dict[str, int] = {}
+        self.bytes_loaded = 0
+        self._types: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        page = self.page
+        page.run_cdp("Network.enable")
+        driver = page.driver
+        driver.set_callback("Network.requestWillBeSent", self._on_request, immediate=True)
+        driver.set_callback("Network.loadingFinished", self._on_finished, immediate=True)
+        driver.set_callback("Network.loadingFailed", self._on_failed, immediate=True)
+
+        types = PROFILES[self.profile]
+        if types:
+            page.run_cdp("Network.setBlockedURLs", urls=TRACKER_PATTERNS)
+            driver.set_callback("Fetch.requestPaused", self._on_paused, immediate=True)
+            page.run_cdp(
+                "Fetch.enable",
+                patterns=[{"urlPattern": "*", "resourceType": t, "requestStage": "Request"} for t in types],
+            )
+        self._started = True
+
+    def stop(self):
+        if not self._started:
+            return
+        try:
+            driver = self.page.driver
+            for event in (
+                "Network.requestWillBeSent",
+                "Network.loadingFinished",
+                "Network.loadingFailed",
+                "Fetch.requestPaused",
+            ):
+                driver.set_callback(event, None, immediate=True)
+            if PROFILES[self.profile]:
+                self.page.run_cdp("Fetch.disable")
+        except Exception as e:
+            log.debug(f"[ResourceBlocker] 停止拦截失败: {e}")
+        self._started = False
+
+    def finish(self, render_ms: float) -> dict:
+        """结束统计并返回本次报告"""
+        with self._lock:
+            blocked = dict(self.blocked)
+            bytes_loaded = self.bytes_loaded
+        bytes_saved = blocking_stats.estimate_bytes(blocked) if self.profile != "off" else 0
+        ms_saved = blocking_stats.record(self.domain, self.profile, render_ms, bytes_loaded, blocked, bytes_saved)
+        return {
+            "profile": self.profile,
+            "render_ms": round(render_ms, 1),
+            "bytes_loaded": bytes_loaded,
+            "blocked": blocked,
+            "bytes_saved": bytes_saved,
+            "ms_saved": round(ms_saved, 1) if ms_saved is not None else None,
+        }
+
+    @staticmethod
+    def _is_allowed(url: str) -> bool:
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        return any(host == h or host.endswith("." + h) for h in _ALLOW_HOSTS) or _ALLOW_PATH_MARK in parsed.path
+
+    def _on_paused(self, **params):
+        request_id = params.get("requestId")
+        url = (params.get("request") or {}).get("url", "")
+        try:
+            if self._is_allowed(url):
+                self.page.run_cdp("Fetch.continueRequest", requestId=request_id)
+                return
+            resource_type = params.get("resourceType", "Other")
+            with self._lock:
+                self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+            self.page.run_cdp("Fetch.failRequest", requestId=request_id, errorReason="BlockedByClient")
+        except Exception as e:
+            log.debug(f"[ResourceBlocker] 处理拦截请求失败: {e}")
+
+    def _on_request(self, **params):
+        request_id = params.get("requestId")
+        if request_id:
+            with self._lock:
+                self._types[request_id] = params.get("type", "Other")
+
+    def _on_finished(self, **params):
+        size = int(params.get("encodedDataLength") or 0)
+        with self._lock:
+            resource_type = self._types.pop(params.get("requestId"), None)
+            self.bytes_loaded += size
+        blocking_stats.learn_size(resource_type, size)
+
+    def _on_failed(self, **params):
+        with self._lock:
+            resource_type = self._types.pop(params.get("requestId"), None)
+            # setBlockedURLs 屏蔽的追踪请求以 blockedReason=inspector 失败
+            if params.get("blockedReason") == "inspector":
+                key = resource_type or "Other"
+                self.blocked[key] = self.blocked.get(key, 0) + 1
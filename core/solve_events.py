@@ -0,0 +1,188 @@
+"""
+过盾完成事件检测 - 基于 CDP 事件而非轮询标题
+
+信号来源:
+- cookie: 响应头 Set-Cookie 中出现 cf_clearance (Network.responseReceivedExtraInfo)
+- response: 主框架文档响应不是挑战页 (Network.responseReceived)
+- dom: 页面内 MutationObserver 发现挑战组件已消失 (Runtime.bindingCalled)
+
+任一信号到达即唤醒等待方，不再依赖固定 sleep。
+
+挑战判定只看 cf-mitigated 响应头与页面中的挑战标记：普通的 404/500 不算被拦截，
+不会让已注入的凭证失效或缩短该域名学习到的凭证有效期。
+"""
+
+import threading
+import time
+from typing import Optional
+
+from utils.logger import log
+
+# 页面内回调绑定名
+_BINDING_NAME = "__cfgwChallengeCleared"
+
+# 挑战页判定标记，与原标题/元素判断保持一致
+_OBSERVER_SCRIPT = """
+(function() {
+    if (window.__cfgwObserverInstalled) return;
+    window.__cfgwObserverInstalled = true;
+    var cleared = function() {
+        var title = (document.title || '').toLowerCase();
+        if (title.indexOf('just a moment') >= 0 || title.indexOf('cloudflare') >= 0) return false;
+        if (document.querySelector('[name="cf-turnstile-response"], #challenge-form, #challenge-stage')) return false;
+        try { window.%s('dom'); } catch (e) {}
+        return true;
+    };
+    document.addEventListener('DOMContentLoaded', function() {
+        if (cleared()) return;
+        try { window.%s('challenge'); } catch (e) {}
+        var observer = new MutationObserver(function() {
+            if (cleared()) observer.disconnect();
+        });
+        observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    });
+})();
+""" % (_BINDING_NAME, _BINDING_NAME)
+
+# 可能是挑战页的状态码，需结合 cf-mitigated 或页面挑战标记确认
+_CHALLENGE_STATUSES = (403, 503)
+
+# 旧轮询实现的时间模型，用于估算每次过盾节省的时间:
+# 每轮 ele(timeout=0.5) + sleep(0.5)，成功后再 ele(timeout=0.3) 复查并固定 sleep(1)
+LEGACY_POLL_INTERVAL = 1.0
+LEGACY_SETTLE_SECONDS = 1.3
+
+
+class SolveWatcher:
+    """监听单个标签页的过盾完成信号
+
+    用法:
+        watcher = SolveWatcher(page)
+        watcher.start()          # 必须在 page.get 之前调用
+        page.get(url)
+        if watcher.wait_cleared(timeout): ...
+        watcher.stop()
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.cleared = threading.Event()  # 任一信号：挑战已通过
+        self.document_ready = threading.Event()  # 真实页面文档已就绪 (response/dom)
+        self.clearance_cookie = threading.Event()  # 已收到 cf_clearance
+        self.signal: Optional[str] = None  # 最先到达的信号
+        self.challenged = False  # 主框架是否返回过挑战页
+        self.cleared_at: Optional[float] = None
+        self.main_status: Optional[int] = None
+        self._started = False
+
+    def start(self):
+        """启用 CDP 事件并注册回调"""
+        page = self.page
+        page.run_cdp("Network.enable")
+        page.run_cdp("Runtime.enable")
+        page.run_cdp("Runtime.addBinding", name=_BINDING_NAME)
+        page.add_init_js(_OBSERVER_SCRIPT)
+
+        driver = page.driver
+        # immediate=True: 在独立线程即时分发，不排在普通事件队列之后
+        driver.set_callback("Network.responseReceivedExtraInfo", self._on_extra_info, immediate=True)
+        driver.set_callback("Network.responseReceived", self._on_response, immediate=True)
+        driver.set_callback("Runtime.bindingCalled", self._on_binding, immediate=True)
+        self._started = True
+
+    def stop(self):
+        """注销回调"""
+        if not self._started:
+            return
+        try:
+            driver = self.page.driver
+            for event in (
+                "Network.responseReceivedExtraInfo",
+                "Network.responseReceived",
+                "Runtime.bindingCalled",
+            ):
+                driver.set_callback(event, None, immediate=True)
+        except Exception as e:
+            log.debug(f"[SolveWatcher] 注销回调失败: {e}")
+        self._started = False
+
+    def reset(self):
+        """清除已到达的信号，用于同一标签页上的下一次导航"""
+        self.cleared.clear()
+        self.document_ready.clear()
+        self.signal = None
+        self.cleared_at = None
+
+    def wait_cleared(self, timeout: float) -> bool:
+        return self.cleared.wait(max(0.0, timeout))
+
+    def wait_cookie(self, timeout: float) -> bool:
+        return self.clearance_cookie.wait(max(0.0, timeout))
+
+    def wait_document(self, timeout: float) -> bool:
+        return self.document_ready.wait(max(0.0, timeout))
+
+    def _fire(self, signal: str, document: bool = False):
+        if not self.cleared.is_set():
+            self.signal = signal
+            self.cleared_at = time.time()
+            self.cleared.set()
+            log.debug(f"[SolveWatcher] 过盾信号: {signal}")
+        if document:
+            self.document_ready.set()
+
+    def _on_extra_info(self, **params):
+        headers = params.get("headers") or {}
+        for name, value in headers.items():
+            if name.lower() == "set-cookie" and "cf_clearance=" in str(value):
+                self.clearance_cookie.set()
+                self._fire("cookie")
+                return
+
+    def _on_response(self, **params):
+        if params.get("type") != "Document":
+            return
+        # 页面目标的主框架 ID 与 targetId 相同
+        if params.get("frameId") != self.page.tab_id:
+            return
+        response = params.get("response") or {}
+        status = response.get("status") or 0
+        self.main_status = status
+        headers = {k.lower(): v for k, v in (response.get("headers") or {}).items()}
+        if "cf-mitigated" in headers:
+            self.challenged = True
+        elif status not in _CHALLENGE_STATUSES:
+            # 普通错误页 (404/500 等) 也是源站的最终响应，不是挑战
+            self._fire("response", document=True)
+        # 403/503 等待页面内检测：出现挑战标记才算挑战 (challenge)，否则按 dom 信号放行
+
+    def _on_binding(self, **params):
+        if params.get("name") != _BINDING_NAME:
+            return
+        if params.get("payload") == "challenge":
+            # 只有 403/503 的页面带挑战标记才算挑战，避免正文恰好提到 Cloudflare 的正常页面被误判
+            if self.main_status in _CHALLENGE_STATUSES:
+                self.challenged = True
+        else:
+            self._fire("dom", document=True)
+
+
+def click_turnstile(page, timeout: float = 0.2) -> bool:
+    """尝试点击 Turnstile 复选框，找到并点击返回 True"""
+    box = page.ele("@name=cf-turnstile-response", timeout=timeout)
+    if not box:
+        return False
+    wrapper = box.parent()
+    iframe = wrapper.shadow_root.ele("tag:iframe")
+    cb = iframe.ele("tag:body").shadow_root.ele("tag:input")
+    if not cb:
+        return False
+    cb.click()
+    return True
+
+
+def estimate_legacy_seconds(started_at: float, cleared_at: float) -> float:
+    """按旧轮询实现估算同一次过盾的完成耗时：信号后下一个轮询点 + 复查与固定等待"""
+    elapsed = max(0.0, cleared_at - started_at)
+    ticks = int(elapsed // LEGACY_POLL_INTERVAL) + 1
+    return ticks * LEGACY_POLL_INTERVAL + LEGACY_SETTLE_SECONDS
@@ -1,107 +1,169 @@
+import threading
 import time
 from config import settings
 from core.browser_pool import browser_pool
+from core.solve_events import SolveWatcher, click_turnstile, estimate_legacy_seconds
 from utils.logger import log
 
 # 过盾超时时间（秒），可通过配置覆盖
 SOLVE_TIMEOUT = getattr(settings, 'SOLVE_TIMEOUT', 30)
+# 页面信号先于 cf_clearance 到达时，等待 Cookie 的最长时间（秒）
+CLEARANCE_GRACE_SECONDS = 1.0
+
+_stats_lock = threading.Lock()
+_solve_stats = {
+    "solves": 0,
+    "signals": {"cookie": 0, "response": 0, "dom": 0},
+    "total_seconds": 0.0,
+    "saved_seconds": 0.0,
+}
+
+
+class SolveChallengeError(Exception):
+    """Cloudflare 挑战在时限内未通过（真正的过盾失败，计入失败回避；浏览器池满、等待超时等不属于此类）"""
+
+
+def _read_cookies(page) -> dict:
+    """读取标签页 Cookie 为 dict"""
+    raw_cookies = page.cookies()
+
+    # 通用一点的兼容处理：
+    if isinstance(raw_cookies, dict):
+        return raw_cookies
+    cookie_dict = {}
+    if isinstance(raw_cookies, list):
+        for c in raw_cookies:
+            if isinstance(c, dict) and "name" in c and "value" in c:
+                cookie_dict[c["name"]] = c["value"]
+            elif isinstance(c, (list, tuple)) and len(c) >= 2:
+                cookie_dict[c[0]] = c[1]
+        return cookie_dict
+    try:
+        return dict(raw_cookies)
+    except Exception as e:
+        log.error(f"⚠️ cookie 解析失败: {e}")
+        return {}
+
+
+def read_clearance_cookie(page, url: str) -> dict:
+    """通过 CDP 读取 cf_clearance 的属性
+
+    Returns:
+        {"expires_at": 过期时间戳或 None（会话 Cookie）, "cookie_domain": Domain 属性或 None}，
+        读取失败或无 cf_clearance 时两者均为 None
+    """
+    meta = {"expires_at": None, "cookie_domain": None}
+    try:
+        result = page.run_cdp("Network.getCookies", urls=[url]) or {}
+    except Exception as e:
+        log.debug(f"[solver] 读取 cf_clearance 属性失败: {e}")
+        return meta
+    for cookie in result.get("cookies", []):
+        if cookie.get("name") == "cf_clearance":
+            expires = cookie.get("expires") or -1
+            meta["expires_at"] = float(expires) if expires > 0 else None
+            meta["cookie_domain"] = cookie.get("domain") or None
+            break
+    return meta
+
+
+def _record_solve(watcher: SolveWatcher, start_time: float, elapsed: float) -> float:
+    """记录一次成功过盾，返回相对旧轮询实现估算节省的秒数"""
+    saved = max(0.0, estimate_legacy_seconds(start_time, watcher.cleared_at) - elapsed)
+    with _stats_lock:
+        _solve_stats["solves"] += 1
+        _solve_stats["signals"][watcher.signal] = _solve_stats["signals"].get(watcher.signal, 0) + 1
+        _solve_stats["total_seconds"] += elapsed
+        _solve_stats["saved_seconds"] += saved
+    return saved
+
+
+def get_solve_stats() -> dict:
+    """过盾耗时与完成信号统计"""
+    with _stats_lock:
+        solves = _solve_stats["solves"]
+        return {
+            "solves": solves,
+            "signals": dict(_solve_stats["signals"]),
+            "avg_solve_ms": round(_solve_stats["total_seconds"] / solves * 1000, 1) if solves else 0,
+            "avg_saved_ms": round(_solve_stats["saved_seconds"] / solves * 1000, 1) if solves else 0,
+            "total_saved_seconds": round(_solve_stats["saved_seconds"], 2),
+        }
 
 
 def solve_turnstile(url: str, proxy: str = None):
     """
     核心过盾逻辑
-    返回: {"cookies": dict, "ua": str}
+    返回: {"cookies": dict, "ua": str, "solved_at": float, "expires_at": float | None, "cookie_domain": str | None}
+    expires_at 为 cf_clearance 的实际过期时间，供缓存按域名设置 TTL；
+    cookie_domain 为其 Domain 属性，供缓存按作用域在子域名间共享凭证
 
     Args:
         url: 目标 URL
         proxy: 代理地址，None 表示不使用代理，"pool" 表示从代理池获取
     """
-    # 从浏览器池获取实例，传递代理参数
-    instance = browser_pool.acquire(timeout=60, proxy=proxy)
-    if not instance:
+    # 从浏览器池租用标签页，传递代理参数
+    lease = browser_pool.acquire(timeout=60, proxy=proxy)
+    if not lease:
         raise Exception("无法获取浏览器实例，池已满")
 
-    page = instance.page
+    page = lease.page
+    watcher = SolveWatcher(page)
+    broken = False
 
     try:
-        log.info(f"🕵️ 正在访问: {url} (浏览器 PID: {instance.pid})")
+        watcher.start()
+        start_time = time.time()
 
+        log.info(f"🕵️ 正在访问: {url} (浏览器 PID: {lease.pid})")
         page.get(url)
 
-        start_time = time.time()
-        success = False
+        deadline = start_time + SOLVE_TIMEOUT
         click_count = 0
         last_click_time = 0
 
-        while time.time() - start_time < SOLVE_TIMEOUT:
-            title = page.title.lower()
-
-            # 1. 尝试点击验证 (支持多次验证)
+        # 1. 尝试点击验证 (支持多次验证)，完成信号到达即退出
+        while not watcher.cleared.is_set() and time.time() < deadline:
             try:
-                box = page.ele("@name=cf-turnstile-response", timeout=0.5)
-                if box:
-                    wrapper = box.parent()
-                    iframe = wrapper.shadow_root.ele("tag:iframe")
-                    cb = iframe.ele("tag:body").shadow_root.ele("tag:input")
-                    # 避免频繁点击，至少间隔1.5秒
-                    if cb and (time.time() - last_click_time) > 1.5:
-                        click_count += 1
-                        log.info(f"👆 发现验证码，第 {click_count} 次点击...")
-                        cb.click()
-                        last_click_time = time.time()
+                # 避免频繁点击，至少间隔1.5秒
+                if (time.time() - last_click_time) > 1.5 and click_turnstile(page):
+                    click_count += 1
+                    log.info(f"👆 发现验证码，第 {click_count} 次点击...")
+                    last_click_time = time.time()
             except Exception as e:
                 # 只记录非预期的异常
                 if "timeout" not in str(e).lower() and "not found" not in str(e).lower():
                     log.debug(f"[solver] 验证码检测异常: {e}")
 
-            # 2. 判断成功条件：标题正常且没有验证码
-            if "just a moment" not in title and "cloudflare" not in title:
-                # 额外检查：确保没有验证码元素
-                try:
-                    still_has_turnstile = page.ele("@name=cf-turnstile-response", timeout=0.3)
-                    if still_has_turnstile:
-                        log.debug("[solver] 标题已变但验证码仍存在，继续等待...")
-                        time.sleep(0.5)
-                        continue
-                except Exception:
-                    pass  # 没有验证码元素，说明真的过盾了
-
-                log.success(f"✅ 过盾成功，当前标题: {title} (点击次数: {click_count})")
-                # 等待 cf_clearance Cookie 设置完成
-                time.sleep(1)
-                success = True
-                break
-
-            time.sleep(0.5)
-
-        if not success:
+            watcher.wait_cleared(min(0.5, deadline - time.time()))
+
+        if not watcher.cleared.is_set():
             log.error(f"❌ 验证超时 ({SOLVE_TIMEOUT}秒)，点击次数: {click_count}")
-            raise Exception(f"Cloudflare Bypass Timeout after {click_count} clicks")
+            raise SolveChallengeError(f"Cloudflare Bypass Timeout after {click_count} clicks")
+
+        # 2. 出现过挑战页但先到的是页面信号时，等待 cf_clearance 落地
+        if watcher.challenged and not watcher.clearance_cookie.is_set():
+            watcher.wait_cookie(min(CLEARANCE_GRACE_SECONDS, max(0.0, deadline - time.time())))
 
         # 3. 提取凭证
-        raw_cookies = page.cookies()
-
-        cookie_dict = {}
-
-        # 通用一点的兼容处理：
-        if isinstance(raw_cookies, dict):
-            cookie_dict = raw_cookies
-        elif isinstance(raw_cookies, list):
-            for c in raw_cookies:
-                if isinstance(c, dict) and "name" in c and "value" in c:
-                    cookie_dict[c["name"]] = c["value"]
-                elif isinstance(c, (list, tuple)) and len(c) >= 2:
-                    cookie_dict[c[0]] = c[1]
-        else:
-            try:
-                cookie_dict = dict(raw_cookies)
-            except Exception as e:
-                log.error(f"⚠️ cookie 解析失败: {e}")
-                cookie_dict = {}
+        cookie_dict = _read_cookies(page)
+        if watcher.clearance_cookie.is_set() and "cf_clearance" not in cookie_dict:
+            # Set-Cookie 事件先于写入 Cookie 存储，短暂重读
+            for _ in range(10):
+                time.sleep(0.05)
+                cookie_dict = _read_cookies(page)
+                if "cf_clearance" in cookie_dict:
+                    break
 
         ua = page.user_agent
-
-        log.info(f"[solver] raw_cookies 类型: {type(raw_cookies)}")
+        clearance = read_clearance_cookie(page, url)
+        elapsed = time.time() - start_time
+        saved = _record_solve(watcher, start_time, elapsed)
+
+        log.success(
+            f"✅ 过盾成功，信号: {watcher.signal}，耗时 {elapsed:.2f}s"
+            f"（较轮询约节省 {saved:.2f}s），点击次数: {click_count}"
+        )
         log.info(f"[solver] 提取后的 cookie_dict: {cookie_dict}")
         log.info(f"[solver] 提取到的 UA: {ua}")
 
@@ -111,7 +173,10 @@ def solve_turnstile(url: str, proxy: str = None):
 
         return {
             "cookies": cookie_dict,
-            "ua": ua
+            "ua": ua,
+            "solved_at": time.time(),
+            "expires_at": clearance["expires_at"],
+            "cookie_domain": clearance["cookie_domain"],
         }
 
     except Exception as e:
@@ -119,22 +184,16 @@ def solve_turnstile(url: str, proxy: str = None):
         error_msg = str(e) if str(e) else type(e).__name__
         log.error(f"💥 过盾过程异常: {error_msg}")
         log.error(f"💥 异常堆栈:\n{traceback.format_exc()}")
-        # 标记浏览器实例为损坏，需要销毁而非归还
-        instance._is_broken = True
+        # 标记标签页为损坏，需要销毁而非归还
+        broken = True
         raise
 
     finally:
-        # 检查浏览器是否损坏
-        is_broken = getattr(instance, '_is_broken', False)
-        if is_broken:
-            # 损坏的实例需要销毁并从池中移除
-            log.warning(f"[solver] 浏览器实例已损坏，销毁 PID: {instance.pid}")
-            browser_pool.destroy(instance)
+        watcher.stop()
+        if broken:
+            # 损坏的标签页需要销毁；浏览器进程失效时池会一并移除该实例
+            log.warning(f"[solver] 标签页已损坏，销毁 (浏览器 PID: {lease.pid})")
+            browser_pool.destroy(lease)
         else:
-            # 归还前清理页面状态，避免复用时出现问题
-            try:
-                page.get("about:blank")
-            except Exception:
-                pass
-            # 正常归还到池中
-            browser_pool.release(instance)
+            # 正常归还：关闭标签页（及其隔离上下文），释放名额
+            browser_pool.release(lease)
@@ -4,8 +4,8 @@
 """
 from __future__ import annotations
 
-import asyncio
 from contextlib import asynccontextmanager
+from typing import Dict
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -13,63 +13,76 @@ from fastapi.responses import FileResponse
 
 from config import settings
 from core.browser_pool import browser_pool
+from core.fetchers.cookie_fetcher import async_session_pool
 from routers import dashboard, health, proxy, raw, reader, job, runner
 from services.cache_service import credential_cache
+from services.credential_refresher import credential_refresher
 from services.domain_intelligence import domain_intel
+from services.maintenance import maintenance_scheduler
 from services import config_store
 
 from utils.logger import log
 
 
-async def watchdog_task():
-    """后台看门狗任务：定期清理空闲浏览器、清理过期缓存、监控内存"""
-    while True:
-        await asyncio.sleep(settings.WATCHDOG_INTERVAL)
-        try:
-            # 1. 清理空闲浏览器
-            cleaned = browser_pool.cleanup_idle()
-            if cleaned > 0:
-                log.info(f"[Watchdog] 回收了 {cleaned} 个空闲浏览器")
-
-            # 2. 内存监控：重启内存超限的浏览器
-            mem_usage = browser_pool.get_memory_usage_mb()
-            if mem_usage > 0:
-                log.info(f"[Watchdog] 浏览器总内存: {mem_usage:.1f}MB")
-                if mem_usage > settings.MEMORY_LIMIT_MB:
-                    restarted = browser_pool.restart_high_memory_browsers(
-                        settings.MEMORY_LIMIT_MB / settings.BROWSER_POOL_MAX
-                    )
-                    if restarted > 0:
-                        log.warning(f"[Watchdog] 重启了 {restarted} 个内存超限浏览器")
-
-            # 3. 记录浏览器池状态
-            stats = browser_pool.get_stats()
-            log.info(f"[Watchdog] 浏览器池状态: {stats}")
-
-            # 4. 清理过期缓存
-            expired = credential_cache.cleanup_expired()
-            if expired > 0:
-                log.info(f"[Watchdog] 清理了 {expired} 条过期缓存")
-
-            # 5. 主动刷新即将过期的凭证（5分钟内过期）- 可通过配置开关控制
-            if settings.AUTO_REFRESH_CREDENTIALS:
-                expiring_domains = credential_cache.get_expiring_domains(threshold_seconds=300)
-                if expiring_domains:
-                    log.info(f"[Watchdog] 发现 {len(expiring_domains)} 个即将过期的凭证，开始刷新...")
-                    for domain in expiring_domains[:3]:  # 每次最多刷新3个，避免阻塞太久
-                        success = credential_cache.refresh_credential(domain)
-                        if success:
-                            log.info(f"[Watchdog] 凭证已提前刷新: {domain}")
-                        else:
-                            log.warning(f"[Watchdog] 凭证刷新失败: {domain}")
-
-            # 6. 清理过期的域名智能统计
-            intel_cleaned = domain_intel.cleanup_expired()
-            if intel_cleaned > 0:
-                log.info(f"[Watchdog] 清理了 {intel_cleaned} 条过期域名统计")
-
-        except Exception as e:
-            log.error(f"[Watchdog] 任务异常: {e}")
+def _job_browser_cleanup() -> int:
+    """清理空闲浏览器"""
+    cleaned = browser_pool.cleanup_idle()
+    if cleaned > 0:
+        log.info(f"[Watchdog] 回收了 {cleaned} 个空闲浏览器")
+    return cleaned
+
+
+def _job_browser_memory() -> float:
+    """内存监控：重启内存超限的浏览器，并记录浏览器池状态"""
+    mem_usage = browser_pool.get_memory_usage_mb()
+    if mem_usage > 0:
+        log.info(f"[Watchdog] 浏览器总内存: {mem_usage:.1f}MB")
+        if mem_usage > settings.MEMORY_LIMIT_MB:
+            restarted = browser_pool.restart_high_memory_browsers(
+                settings.MEMORY_LIMIT_MB / settings.BROWSER_POOL_MAX
+            )
+            if restarted > 0:
+                log.warning(f"[Watchdog] 重启了 {restarted} 个内存超限浏览器")
+
+    log.info(f"[Watchdog] 浏览器池状态: {browser_pool.get_stats()}")
+    return round(mem_usage, 1)
+
+
+def _job_cache_cleanup() -> Dict[str, int]:
+    """清理过期缓存与过期的域名智能统计"""
+    expired = credential_cache.cleanup_expired()
+    if expired > 0:
+        log.info(f"[Watchdog] 清理了 {expired} 条过期缓存")
+
+    intel_cleaned = domain_intel.cleanup_expired()
+    if intel_cleaned > 0:
+        log.info(f"[Watchdog] 清理了 {intel_cleaned} 条过期域名统计")
+    return {"credentials": expired, "domain_stats": intel_cleaned}
+
+
+def _job_credential_refresh() -> Dict[str, int]:
+    """按热度并发提前刷新即将过期的凭证 - 可通过配置开关控制"""
+    return credential_refresher.run_once()
+
+
+def _register_maintenance_jobs():
+    """注册后台维护作业：各自的间隔与超时，全部在工作线程中执行"""
+    maintenance_scheduler.add_job(
+        "browser_cleanup", _job_browser_cleanup,
+        interval=lambda: settings.WATCHDOG_INTERVAL, timeout=settings.WATCHDOG_JOB_TIMEOUT,
+    )
+    maintenance_scheduler.add_job(
+        "browser_memory", _job_browser_memory,
+        interval=lambda: settings.WATCHDOG_INTERVAL, timeout=settings.WATCHDOG_JOB_TIMEOUT,
+    )
+    maintenance_scheduler.add_job(
+        "cache_cleanup", _job_cache_cleanup,
+        interval=lambda: settings.WATCHDOG_CACHE_INTERVAL, timeout=settings.WATCHDOG_JOB_TIMEOUT,
+    )
+    maintenance_scheduler.add_job(
+        "credential_refresh", _job_credential_refresh,
+        interval=lambda: settings.WATCHDOG_REFRESH_INTERVAL, timeout=settings.WATCHDOG_REFRESH_TIMEOUT,
+    )
 
 
 @asynccontextmanager
@@ -85,17 +98,17 @@ async def lifespan(app: FastAPI):
         browser_pool._init_pool()
 
     log.info("[Startup] 启动看门狗任务...")
-    task = asyncio.create_task(watchdog_task())
+    _register_maintenance_jobs()
+    maintenance_scheduler.start()
 
     yield
 
     # 关闭时
     log.info("[Shutdown] 停止看门狗任务...")
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    await maintenance_scheduler.stop()
+
+    # 关闭 curl_cffi 异步会话池
+    await async_session_pool.close_all()
 
     # 关闭浏览器池
     log.info("[Shutdown] 关闭浏览器池...")
@@ -14,11 +14,18 @@ from pydantic import BaseModel
 
 from config import settings
 from core.browser_pool import browser_pool
+from core.fetchers.browser_fetcher import get_seed_stats
+from core.resource_blocker import get_blocking_stats
+from core.solver import get_solve_stats
 from dependencies import verify_admin_flexible, verify_api_key, verify_query_key, verify_admin
 from services import api_key_store
 from services.cache_service import credential_cache
 from services.proxy_manager import proxy_manager
 from services.domain_intelligence import domain_intel
+from services.maintenance import maintenance_scheduler
+from services.credential_refresher import credential_refresher
+from services.run_coalescer import run_coalescer
+from services.rule_service import rule_service
 from services import config_store
 from utils.logger import log
 
@@ -135,6 +142,8 @@ def get_stats() -> Dict[str, Any]:
     return {
         "browser_pool": browser_stats,
         "cache": cache_stats,
+        "rule_runs": run_coalescer.get_stats(),
+        "rule_cache": rule_service.get_cache_stats(),
         "requests": {
             "total": _request_stats["total"],
             "success": _request_stats["success"],
@@ -168,11 +177,13 @@ def get_browser_pool_status() -> Dict[str, Any]:
 
     # 获取每个实例的详细信息
     instances = []
-    for i, inst in enumerate(browser_pool._all_instances):
+    for i, inst in enumerate(list(browser_pool._all_instances)):
         instances.append({
             "id": i + 1,
             "pid": inst.pid,
+            "proxy": inst.proxy,
             "in_use": inst.in_use,
+            "tabs_in_use": inst.tabs_in_use,
             "use_count": inst.use_count,
             "created_at": time.strftime("%H:%M:%S", time.localtime(inst.created_at)),
             "last_used": time.strftime("%H:%M:%S", time.localtime(inst.last_used_at)),
@@ -181,9 +192,18 @@ def get_browser_pool_status() -> Dict[str, Any]:
     return {
         **stats,
         "instances": instances,
+        "solve_events": get_solve_stats(),
+        "resource_blocking": get_blocking_stats(),
+        "credential_seeding": get_seed_stats(),
     }
 
 
+@router.get("/maintenance", dependencies=[Depends(verify_api_key)])
+def get_maintenance_status() -> Dict[str, Any]:
+    """获取后台维护作业状态、事件循环延迟与凭证提前刷新统计"""
+    return {**maintenance_scheduler.get_status(), "credential_refresh": credential_refresher.get_stats()}
+
+
 @router.get("/cache", dependencies=[Depends(verify_api_key)])
 def get_cache_status() -> Dict[str, Any]:
     """获取缓存详细状态"""
@@ -203,6 +223,7 @@ def get_domain_intelligence() -> Dict[str, Any]:
         "domains": stats,
         "total_domains": len(stats),
         "browser_recommended": sum(1 for s in stats if s["recommended_mode"] == "browser"),
+        "unprotected": sum(1 for s in stats if s["protection"] == "unprotected"),
     }
 
 
@@ -356,6 +377,20 @@ def clear_cache(domain: Optional[str] = None) -> Dict[str, Any]:
         return {"message": f"已清除 {count} 条缓存", "count": count}
 
 
+@router.get("/solve-backoff", dependencies=[Depends(verify_api_key)])
+def get_solve_backoff() -> Dict[str, Any]:
+    """获取过盾失败回避状态（连续失败的域名在回避期内快速失败）"""
+    return credential_cache.get_backoff_stats()
+
+
+@router.post("/solve-backoff/clear", dependencies=[Depends(verify_admin)])
+def clear_solve_backoff(domain: Optional[str] = None) -> Dict[str, Any]:
+    """解除过盾失败回避，不指定域名时解除全部"""
+    count = credential_cache.clear_backoff(domain)
+    log.info(f"[Dashboard] 已解除 {count} 条过盾回避记录")
+    return {"message": f"已解除 {count} 条回避记录", "count": count}
+
+
 @router.post("/browser-pool/restart", dependencies=[Depends(verify_admin)])
 def restart_browser_pool() -> Dict[str, Any]:
     """重启浏览器池"""
@@ -380,7 +415,8 @@ def get_proxies() -> Dict[str, Any]:
         "proxies": proxies,
         "total": len(proxies),
         "available": len(proxies),
-        "strategy": "round_robin"
+        "strategy": "round_robin",
+        "pinned": proxy_manager.get_pins(),
     }
 
 
@@ -426,6 +462,7 @@ class TestRequest(BaseModel):
     headers: Optional[Dict[str, str]] = None
     selectors: Optional[Dict[str, str]] = None
     wait_for: Optional[str] = None
+    block_profile: Optional[str] = None
 
 
 def _get_request_user(request: Request) -> str:
@@ -462,6 +499,7 @@ def test_bypass(req: TestRequest, request: Request) -> Dict[str, Any]:
             headers=req.headers or {},
             selectors=req.selectors or {},
             wait_for=req.wait_for,
+            block_profile=req.block_profile,
             # 默认值
             method="GET" if not req.body or req.body_type == "none" else "POST",
             is_public=False
@@ -6,7 +6,8 @@ from fastapi.responses import JSONResponse
 
 from dependencies import verify_api_key
 from schemas.proxy import ProxyRequest
-from services.proxy_service import proxy_request
+from services.cache_service import SolveBackoffError
+from services.proxy_service import proxy_request_async
 from utils.logger import log
 from utils.response_builder import decode_response
 
@@ -18,10 +19,10 @@ router = APIRouter()
     dependencies=[Depends(verify_api_key)],
     summary="⚡ 通用代理 (JSON)",
 )
-def proxy_handler(req: ProxyRequest) -> JSONResponse:
+async def proxy_handler(req: ProxyRequest) -> JSONResponse:
     """通用 JSON 代理端点，保持请求/响应结构不变。"""
     try:
-        resp = proxy_request(
+        resp = await proxy_request_async(
             url=req.url,
             method=req.method,
             headers=req.headers,
@@ -45,6 +46,11 @@ def proxy_handler(req: ProxyRequest) -> JSONResponse:
                 "text": text,
             }
         )
+    except SolveBackoffError as e:
+        log.warning(f"API Backoff: {str(e)}")
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
     except Exception as e:
         log.error(f"API Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
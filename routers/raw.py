@@ -6,14 +6,15 @@ from fastapi import APIRouter, Depends, Query
 from fastapi.responses import Response
 
 from dependencies import verify_query_key
-from services.proxy_service import proxy_request
+from services.cache_service import SolveBackoffError
+from services.proxy_service import proxy_request_async
 from utils.logger import log
 
 router = APIRouter()
 
 
 @router.get("/raw", dependencies=[Depends(verify_query_key)], summary="💾 原始数据代理")
-def raw_proxy(
+async def raw_proxy(
     url: str,
     fetcher: Optional[str] = Query(None, description="指定 Fetcher: cookie 或 browser")
 ) -> Response:
@@ -24,7 +25,7 @@ def raw_proxy(
         fetcher: 可选，指定使用的 Fetcher ("cookie" 或 "browser")
     """
     try:
-        resp = proxy_request(url=url, method="GET", headers={}, fetcher=fetcher)
+        resp = await proxy_request_async(url=url, method="GET", headers={}, fetcher=fetcher)
 
         # 兼容 FetchResponse 和原始 Response 对象
         content_type = resp.headers.get("Content-Type", "application/octet-stream")
@@ -36,6 +37,11 @@ def raw_proxy(
             status_code=resp.status_code,
             media_type=content_type,
         )
+    except SolveBackoffError as e:
+        log.warning(f"Raw Proxy Backoff: {str(e)}")
+        return Response(
+            content=f"Error: {str(e)}", status_code=503, headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
     except Exception as e:
         log.error(f"Raw Proxy Error: {str(e)}")
         return Response(content=f"Error: {str(e)}", status_code=500)
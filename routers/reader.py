@@ -5,19 +5,30 @@ from fastapi import APIRouter, Depends, Request
 from fastapi.responses import Response
 
 from dependencies import verify_query_key
-from services.proxy_service import proxy_request
+from services.cache_service import SolveBackoffError
+from services.proxy_service import proxy_request_async
 from utils.logger import log
 from utils.response_builder import make_html_response
 
 router = APIRouter()
 
 
+def _backoff_response(e: SolveBackoffError) -> Response:
+    """过盾回避期内返回 503 + Retry-After，与 /proxy、/raw 一致"""
+    return Response(
+        content=f"Error: {str(e)}", status_code=503, headers={"Retry-After": str(int(e.retry_after) + 1)}
+    )
+
+
 @router.get("/reader", dependencies=[Depends(verify_query_key)], summary="📖 阅读模式 (获取章节)")
-def reader_proxy_get(url: str) -> Response:
+async def reader_proxy_get(url: str) -> Response:
     """GET 阅读模式：保持原有 HTML 注入与返回格式。"""
     try:
-        resp = proxy_request(url=url, method="GET", headers={})
+        resp = await proxy_request_async(url=url, method="GET", headers={})
         return make_html_response(resp, url)
+    except SolveBackoffError as e:
+        log.warning(f"Reader GET Backoff: {str(e)}")
+        return _backoff_response(e)
     except Exception as e:
         log.error(f"Reader GET Error: {str(e)}")
         return Response(content=f"Error: {str(e)}", status_code=500)
@@ -36,7 +47,7 @@ async def reader_proxy_post(request: Request, url: str) -> Response:
             body_str = raw_body.decode("utf-8", errors="ignore")
             log.info(f"🔍 FORM-urlencoded body: {body_str}")
 
-            resp = proxy_request(
+            resp = await proxy_request_async(
                 url=url,
                 method="POST",
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -48,18 +59,20 @@ async def reader_proxy_post(request: Request, url: str) -> Response:
             form_data = dict(await request.form())
             log.info(f"🔍 multipart/form-data body: {form_data}")
 
-            resp = proxy_request(
+            resp = await proxy_request_async(
                 url=url,
                 method="POST",
                 headers={"Content-Type": content_type},
                 data=form_data,
             )
             return make_html_response(resp, url)
+        except SolveBackoffError:
+            raise
         except Exception:
             pass
 
         log.info(f"🔍 FALLBACK raw body: {raw_body[:200]}")
-        resp = proxy_request(
+        resp = await proxy_request_async(
             url=url,
             method="POST",
             headers={"Content-Type": content_type},
@@ -67,6 +80,9 @@ async def reader_proxy_post(request: Request, url: str) -> Response:
         )
         return make_html_response(resp, url)
 
+    except SolveBackoffError as e:
+        log.warning(f"Reader POST Backoff: {str(e)}")
+        return _backoff_response(e)
     except Exception as e:
         log.error(f"Reader POST Error: {str(e)}")
         return Response(content=f"Error: {str(e)}", status_code=500)
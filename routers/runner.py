@@ -2,25 +2,29 @@
 """
 Runner API - 规则执行与管理
 """
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse, PlainTextResponse
 from typing import Dict, Any, List, Optional
-import json
 import hashlib
 import time
 
-from services.rule_service import rule_service, ScrapeConfig
+from services.rule_service import rule_service, CompiledRule, ScrapeConfig
 from services.proxy_service import proxy_request
 from services.proxy_manager import proxy_manager
+from services.run_coalescer import run_coalescer
 from dependencies import verify_api_key
+from utils import codec
 from utils.logger import log
 
-# 规则结果缓存 (使用 Redis)
+# 规则结果缓存 (使用 Redis，数据为 codec 二进制编码)
 try:
     import redis
     from config import settings
-    _result_cache = redis.from_url(getattr(settings, "REDIS_URL", "redis://localhost:6379"), decode_responses=True)
+    _result_cache = redis.from_url(getattr(settings, "REDIS_URL", "redis://localhost:6379"))
     _RESULT_CACHE_PREFIX = "result:"
+    # 过期结果后台刷新锁，保证多副本下同一结果只刷新一次
+    _RESULT_REFRESH_PREFIX = "result_refresh:"
+    _RESULT_REFRESH_LOCK_TTL = 120
 except Exception as e:
     log.warning(f"[Runner] Redis 缓存不可用: {e}")
     _result_cache = None
@@ -58,10 +62,24 @@ def create_rule(rule: ScrapeConfig, request: Request) -> Dict[str, Any]:
     }
 
 @router.get("/rules", summary="获取规则列表", dependencies=[Depends(verify_api_key)])
-def list_rules(request: Request) -> Dict[str, List[ScrapeConfig]]:
+def list_rules(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    public: bool = False,
+) -> Dict[str, Any]:
+    """按创建时间倒序列出规则
+
+    不带 cursor/limit 时返回全部规则；带 limit 时分页，下一页使用返回的 next_cursor，为 null 时没有更多
+    """
     username, is_admin = _get_current_user(request)
-    rules = rule_service.list_rules(owner=username, is_admin=is_admin)
-    return {"rules": rules}
+    try:
+        rules, next_cursor = rule_service.list_rules(
+            owner=username, is_admin=is_admin, cursor=cursor, limit=limit, public_only=public
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"rules": rules, "next_cursor": next_cursor}
 
 @router.put("/rules/{rule_id}", summary="更新规则", dependencies=[Depends(verify_api_key)])
 def update_rule(rule_id: str, rule: ScrapeConfig, request: Request) -> Dict[str, Any]:
@@ -135,68 +153,131 @@ def _get_cache_key(rule_id: str, params: Dict[str, str]) -> str:
 
 
 def _get_cached_result(cache_key: str) -> Optional[Dict]:
-    """从缓存获取结果"""
+    """从缓存获取结果条目（含 fresh_until，旧版条目没有该字段，视为新鲜）"""
     if not _result_cache:
         return None
     try:
         data = _result_cache.get(cache_key)
         if data:
-            return json.loads(data)
+            return codec.decode(data)
     except Exception as e:
         log.warning(f"[Runner] 读取缓存失败: {e}")
     return None
 
 
-def _set_cached_result(cache_key: str, result: Any, ttl: int):
-    """将结果写入缓存"""
+def _set_cached_result(
+    cache_key: str, result: Any, ttl: int, stale_ttl: int = 0, run_token: Optional[str] = None
+):
+    """将结果写入缓存
+
+    ttl 内为新鲜结果；之后 stale_ttl 内仍保留，供过期即返回 + 后台刷新使用。
+    run_token 为跨副本合并执行的锁令牌，等待的副本据此识别本次执行的结果。
+    """
     if not _result_cache or ttl <= 0:
         return
     try:
+        now = time.time()
+        entry = {"cached_at": now, "fresh_until": now + ttl}
+        if run_token:
+            entry["run_token"] = run_token
         # 只缓存可序列化的结果
         if isinstance(result, dict):
-            _result_cache.setex(cache_key, ttl, json.dumps(result))
-            log.info(f"[Runner] 结果已缓存 (TTL={ttl}s)")
+            entry["data"] = result
         elif isinstance(result, Response):
-            # 对于 Response 对象，缓存其内容
-            cache_data = {
+            # 对于 Response 对象，原样缓存字节内容与响应头（GBK 页面、图片等不会被破坏）
+            headers = {k: v for k, v in result.headers.items() if k.lower() != "content-length"}
+            entry.update({
                 "_type": "response",
-                "content": result.body.decode("utf-8", errors="ignore") if result.body else "",
+                "content": bytes(result.body or b""),
                 "status_code": result.status_code,
                 "media_type": result.media_type,
-            }
-            _result_cache.setex(cache_key, ttl, json.dumps(cache_data))
-            log.info(f"[Runner] Response 已缓存 (TTL={ttl}s)")
+                "headers": headers,
+            })
+        else:
+            return
+        _result_cache.setex(cache_key, ttl + max(stale_ttl, 0), codec.encode(entry))
+        log.info(f"[Runner] 结果已缓存 (TTL={ttl}s, stale={stale_ttl}s)")
     except Exception as e:
         log.warning(f"[Runner] 写入缓存失败: {e}")
 
 
-def _apply_params_to_rule(rule: ScrapeConfig, params: Dict[str, str]) -> ScrapeConfig:
-    """将 URL 查询参数应用到规则的 target_url 和 body 中
+def _cached_to_result(cached: Dict) -> Any:
+    """缓存条目还原为响应"""
+    if cached.get("_type") == "response":
+        headers = cached.get("headers")
+        return Response(
+            content=cached["content"],
+            status_code=cached["status_code"],
+            media_type=None if headers else cached["media_type"],
+            headers=headers,
+        )
+    # 旧版条目直接存储结果本身
+    return cached["data"] if "fresh_until" in cached else cached
 
-    支持占位符格式: {param_name}
-    例如: target_url="https://example.com/search?q={q}" 或 body="searchkey={q}"
+
+def _load_result_of_run(cache_key: str, run_token: str) -> Any:
+    """读取令牌为 run_token 的执行写入的缓存结果（其他副本合并执行的产出），没有则返回 None
+
+    按令牌而不是写入时间判断，不受副本间时钟偏差影响。
     """
-    if not params:
-        return rule
+    cached = _get_cached_result(cache_key)
+    if cached and cached.get("run_token") == run_token:
+        return _cached_to_result(cached)
+    return None
 
-    # 创建规则副本，避免修改原始规则
-    rule_copy = rule.model_copy()
 
-    # 替换 target_url 中的占位符
-    if rule_copy.target_url:
-        for key, value in params.items():
-            rule_copy.target_url = rule_copy.target_url.replace(f"{{{key}}}", value)
+def _claim_refresh(cache_key: str) -> bool:
+    """抢占过期结果的后台刷新权"""
+    try:
+        lock_key = _RESULT_REFRESH_PREFIX + cache_key[len(_RESULT_CACHE_PREFIX):]
+        return bool(_result_cache.set(lock_key, 1, nx=True, ex=_RESULT_REFRESH_LOCK_TTL))
+    except Exception as e:
+        log.warning(f"[Runner] 获取刷新锁失败: {e}")
+        return False
 
-    # 替换 body 中的占位符
-    if rule_copy.body:
-        for key, value in params.items():
-            rule_copy.body = rule_copy.body.replace(f"{{{key}}}", value)
 
-    return rule_copy
+def _refresh_cached_result(rule_id: str, query_params: Dict[str, str], cache_key: str):
+    """后台重新执行规则并更新缓存（在响应发送后执行）"""
+    lock_key = _RESULT_REFRESH_PREFIX + cache_key[len(_RESULT_CACHE_PREFIX):]
+    try:
+        compiled = rule_service.get_compiled(rule_id)
+        if not compiled or compiled.rule.cache_ttl <= 0:
+            return
+        rule = compiled.rule
+        result = _execute_rule(compiled, query_params)
+        _set_cached_result(cache_key, result, rule.cache_ttl, rule.stale_ttl)
+        log.info(f"[Runner] 过期结果已后台刷新: {rule.name} ({rule_id})")
+    except Exception as e:
+        log.error(f"[Runner] 后台刷新失败: {rule_id}, 错误: {e}")
+    finally:
+        try:
+            _result_cache.delete(lock_key)
+        except Exception:
+            pass
+
+
+def _execute_rule(compiled: CompiledRule, query_params: Dict[str, str], test: bool = False):
+    """代入参数（预编译模板，见 CompiledRule.render）并按 api_type 执行规则"""
+    rule = compiled.render(query_params)
+    if query_params:
+        log.info(f"[Runner] 参数替换: {query_params}")
+
+    api_type = getattr(rule, "api_type", "proxy")
+    if api_type == "raw":
+        return execute_rule_raw(rule, test_mode=test)
+    if api_type == "reader":
+        return execute_rule_reader(rule, test_mode=test)
+    return execute_rule_proxy(rule)  # proxy (默认)
 
 
 @router.get("/run/{rule_id}", summary="执行爬虫规则")
-def run_rule(rule_id: str, request: Request, test: bool = False, refresh: bool = False):
+def run_rule(
+    rule_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    test: bool = False,
+    refresh: bool = False,
+):
     """
     通过 Permlink 执行预定义的爬虫规则。
     根据规则配置的 api_type 返回不同格式的响应。
@@ -208,10 +289,13 @@ def run_rule(rule_id: str, request: Request, test: bool = False, refresh: bool =
     支持动态参数替换:
         URL 查询参数会替换规则中的 {param} 占位符
         例如: /v1/run/abc123?q=斗破 会将规则中的 {q} 替换为 "斗破"
+
+    规则设置了 stale_ttl 时，缓存过期后的 stale_ttl 秒内立即返回旧结果，并在后台刷新一次。
     """
-    rule = rule_service.get_rule(rule_id)
-    if not rule:
+    compiled = rule_service.get_compiled(rule_id)
+    if not compiled:
         raise HTTPException(status_code=404, detail="Rule not found")
+    rule = compiled.rule
 
     # 检查访问权限
     _check_access(rule, request)
@@ -222,44 +306,41 @@ def run_rule(rule_id: str, request: Request, test: bool = False, refresh: bool =
 
     # 检查缓存 (仅当 cache_ttl > 0 且非强制刷新时)
     cache_ttl = getattr(rule, "cache_ttl", 0)
+    stale_ttl = getattr(rule, "stale_ttl", 0)
     cache_key = None
-    if cache_ttl > 0 and not refresh and not test:
+    if cache_ttl > 0 and not test:
         cache_key = _get_cache_key(rule_id, query_params)
+    if cache_key and not refresh:
         cached = _get_cached_result(cache_key)
         if cached:
-            log.info(f"[Runner] 命中缓存: {rule.name} ({rule_id})")
-            # 检查是否是 Response 类型的缓存
-            if cached.get("_type") == "response":
-                return Response(
-                    content=cached["content"],
-                    status_code=cached["status_code"],
-                    media_type=cached["media_type"],
-                )
-            return cached
-
-    # 应用参数替换
-    if query_params:
-        rule = _apply_params_to_rule(rule, query_params)
-        log.info(f"[Runner] 参数替换: {query_params}")
+            if time.time() < cached.get("fresh_until", float("inf")):
+                log.info(f"[Runner] 命中缓存: {rule.name} ({rule_id})")
+            else:
+                # 过期但仍在 stale_ttl 内：立即返回旧结果，由一个请求在后台刷新
+                log.info(f"[Runner] 命中过期缓存: {rule.name} ({rule_id})")
+                if _claim_refresh(cache_key):
+                    background_tasks.add_task(_refresh_cached_result, rule_id, query_params, cache_key)
+            return _cached_to_result(cached)
 
     log.info(f"[Runner] 执行规则: {rule.name} ({rule_id}) [api_type={rule.api_type}] [test={test}] [cache_ttl={cache_ttl}]")
 
-    try:
-        api_type = getattr(rule, "api_type", "proxy")
-
-        if api_type == "raw":
-            result = execute_rule_raw(rule, test_mode=test)
-        elif api_type == "reader":
-            result = execute_rule_reader(rule, test_mode=test)
-        else:  # proxy (默认)
-            result = execute_rule_proxy(rule)
-
+    def execute(run_token: Optional[str] = None):
+        result = _execute_rule(compiled, query_params, test=test)
         # 写入缓存
-        if cache_key and cache_ttl > 0:
-            _set_cached_result(cache_key, result, cache_ttl)
-
+        if cache_key:
+            _set_cached_result(cache_key, result, cache_ttl, stale_ttl, run_token)
         return result
 
+    try:
+        if test:
+            return execute()
+
+        # 相同规则 + 参数的并发执行合并为一次；开启缓存时经结果缓存跨副本共享
+        load_shared = None
+        if cache_key:
+            load_shared = lambda run_token: _load_result_of_run(cache_key, run_token)
+        return run_coalescer.run(cache_key or _get_cache_key(rule_id, query_params), execute, load_shared)
+
     except HTTPException:
         raise
     except Exception as e:
@@ -8,30 +8,295 @@
 
 import json
 import os
+import random
 import sqlite3
 import time
 import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, List
-from urllib.parse import urlparse
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, List, Tuple
 
 import redis
 from config import settings
-from core.solver import solve_turnstile
+from core.solver import SolveChallengeError, solve_turnstile
+from services.proxy_manager import proxy_manager
+from utils import codec
+from utils.domain_scope import cookie_scope, lookup_scopes, scope_host, url_host
 from utils.logger import log
 
+# 等待同域名进行中过盾结果的最长时间（秒），需覆盖浏览器获取 + 过盾超时
+SOLVE_WAIT_TIMEOUT = 120
+
+# 分布式过盾租约 TTL（秒），持有者崩溃后租约自动过期，其他副本可接手
+SOLVE_LEASE_TTL = 100
+
+# 观察到的提前失效超过此时间（秒）未再出现则遗忘，重新按 Cookie 有效期设置 TTL
+INVALIDATION_MEMORY_SECONDS = 86400
+# 失效时间滚动平均的平滑系数
+_INVALIDATION_ALPHA = 0.5
+
+# 跨副本 L1 失效广播频道
+L1_INVALIDATE_CHANNEL = "cred_l1_invalidate"
+
+
+class _InflightSolve:
+    """进行中的过盾任务，同 (域名, 代理) 的并发请求共享其结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SolveBackoffError(Exception):
+    """域名过盾连续失败，处于回避期，请求被快速拒绝"""
+
+    def __init__(self, key: str, retry_after: float, failures: int, last_error: str):
+        self.key = key
+        self.retry_after = retry_after
+        self.failures = failures
+        self.last_error = last_error
+        super().__init__(
+            f"{key} 过盾连续失败 {failures} 次，回避中，{retry_after:.0f} 秒后重试 (最近错误: {last_error})"
+        )
+
+
+class _LifetimeLearner:
+    """按域名学习凭证的实际有效期
+
+    - Cookie 有效期：过盾时通过 CDP 读到的 cf_clearance expires
+    - 提前失效：过盾后首次遇到拦截时凭证的存活时间（站点提前吊销）
+    TTL 取 Cookie 剩余有效期，若观察到提前失效则不超过失效时间 * 安全系数，
+    最终限制在 [CREDENTIAL_TTL_MIN, CREDENTIAL_TTL_MAX] 内。
+    """
+
+    def __init__(self, default_ttl: Callable[[], int]):
+        # 读取函数而非数值：COOKIE_EXPIRE_SECONDS 可在运行时修改
+        self._default_ttl = default_ttl
+        self._lock = threading.Lock()
+        # host -> {"cookie_lifetime", "invalidation", "invalidations", "invalidated_at", "last_ttl"}
+        self._domains: Dict[str, Dict[str, Any]] = {}
+        # 缓存键 -> 已上报失效的凭证 solved_at，同一次过盾只计第一次拦截
+        self._reported: Dict[str, float] = {}
+
+    def _entry(self, host: str) -> Dict[str, Any]:
+        return self._domains.setdefault(host, {
+            "cookie_lifetime": None,
+            "invalidation": None,
+            "invalidations": 0,
+            "invalidated_at": None,
+            "last_ttl": None,
+        })
+
+    def ttl_for(self, host: str, creds: Dict[str, Any]) -> int:
+        """计算凭证写入时的 TTL（秒），同时记录其 Cookie 有效期"""
+        if not settings.CREDENTIAL_TTL_LEARNING:
+            return self._default_ttl()
+
+        now = time.time()
+        expires_at = creds.get("expires_at")
+        solved_at = creds.get("solved_at") or now
+        with self._lock:
+            entry = self._entry(host)
+            if expires_at:
+                entry["cookie_lifetime"] = expires_at - solved_at
+                ttl = expires_at - now
+            elif entry["cookie_lifetime"]:
+                ttl = entry["cookie_lifetime"] - (now - solved_at)
+            else:
+                ttl = self._default_ttl()
+
+            if entry["invalidation"] is not None:
+                if now - entry["invalidated_at"] > INVALIDATION_MEMORY_SECONDS:
+                    log.info(f"[Cache] {host} 长时间未再提前失效，恢复按 Cookie 有效期缓存")
+                    entry["invalidation"] = None
+                else:
+                    ttl = min(ttl, entry["invalidation"] * settings.CREDENTIAL_TTL_SAFETY - (now - solved_at))
+
+            ttl = int(max(settings.CREDENTIAL_TTL_MIN, min(settings.CREDENTIAL_TTL_MAX, ttl)))
+            entry["last_ttl"] = ttl
+            return ttl
+
+    def observe_blocked(self, key: str, host: str, solved_at: float):
+        """记录凭证被拦截时的存活时间（每次过盾只记第一次）"""
+        now = time.time()
+        age = now - solved_at
+        with self._lock:
+            if self._reported.get(key) == solved_at:
+                return
+            self._reported[key] = solved_at
+            entry = self._entry(host)
+            prev = entry["invalidation"]
+            entry["invalidation"] = age if prev is None else prev + _INVALIDATION_ALPHA * (age - prev)
+            entry["invalidations"] += 1
+            entry["invalidated_at"] = now
+        log.info(f"[Cache] {host} 凭证在过盾 {age:.0f}s 后失效，学习失效时间 {entry['invalidation']:.0f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                host: {
+                    "cookie_lifetime": round(e["cookie_lifetime"]) if e["cookie_lifetime"] else None,
+                    "invalidation": round(e["invalidation"]) if e["invalidation"] is not None else None,
+                    "invalidations": e["invalidations"],
+                    "ttl": e["last_ttl"],
+                }
+                for host, e in self._domains.items()
+            }
+
+
+class _L1Cache:
+    """进程内一级缓存：按主机缓存键 (host|proxy) 保存查找结果的有界 LRU
+
+    条目在凭证过期时间与 CACHE_L1_MAX_AGE 兜底时长中较早者失效；
+    凭证写入/清除时按作用域逐出，多副本部署下由 Redis 广播通知其他副本逐出。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # host_key -> (store_key, creds, expire_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, host_key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(host_key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[2] <= time.time():
+                del self._entries[host_key]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(host_key)
+            self._stats["hits"] += 1
+            return entry[0], entry[1]
+
+    def put(self, host_key: str, store_key: str, creds: Dict[str, Any]):
+        expire_at = time.time() + settings.CACHE_L1_MAX_AGE
+        if creds.get("expire_at"):
+            expire_at = min(expire_at, creds["expire_at"])
+        with self._lock:
+            self._entries[host_key] = (store_key, creds, expire_at)
+            self._entries.move_to_end(host_key)
+            while len(self._entries) > settings.CACHE_L1_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def evict(self, scope: Optional[str] = None, proxy: Optional[str] = None, any_proxy: bool = False) -> int:
+        """逐出被作用域覆盖的条目；scope 为空时清空全部
+
+        scope 为主机名时只逐出该主机，为 ".site.com" 时逐出 site.com 及其所有子域名。
+        """
+        with self._lock:
+            if scope is None:
+                count = len(self._entries)
+                self._entries.clear()
+            else:
+                base = scope.lstrip(".")
+                shared = scope.startswith(".")
+                doomed = []
+                for host_key in self._entries:
+                    host, _, entry_proxy = host_key.partition("|")
+                    if not any_proxy and (entry_proxy or None) != proxy:
+                        continue
+                    if host == base or (shared and host.endswith("." + base)):
+                        doomed.append(host_key)
+                for host_key in doomed:
+                    del self._entries[host_key]
+                count = len(doomed)
+            self._stats["invalidations"] += count
+            return count
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": settings.CACHE_L1_ENABLED,
+                "size": len(self._entries),
+                "max_entries": settings.CACHE_L1_MAX_ENTRIES,
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups * 100, 1) if lookups else 0,
+            }
+
+
+class _CounterBuckets:
+    """按线程分桶的计数器：热路径自增只写本线程的桶，不加锁
+
+    每个桶只由所属线程写入；汇总时取各桶累计值与上次已汇总值之差，桶本身不清零，
+    因此汇总与并发自增之间不会丢失计数。
+    """
+
+    def __init__(self, names: Tuple[str, ...]):
+        self._names = names
+        self._local = threading.local()
+        self._register_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # [(线程的桶, 该桶已汇总的值)]
+        self._buckets: List[Tuple[Dict[str, int], Dict[str, int]]] = []
+
+    def incr(self, name: str):
+        bucket = getattr(self._local, "bucket", None)
+        if bucket is None:
+            bucket = dict.fromkeys(self._names, 0)
+            with self._register_lock:
+                self._buckets.append((bucket, dict.fromkeys(self._names, 0)))
+            self._local.bucket = bucket
+        bucket[name] += 1
+
+    def pending(self) -> Dict[str, int]:
+        """尚未汇总的增量"""
+        with self._register_lock:
+            buckets = list(self._buckets)
+        totals = dict.fromkeys(self._names, 0)
+        for bucket, flushed in buckets:
+            for name in self._names:
+                totals[name] += bucket[name] - flushed[name]
+        return totals
+
+    def flush(self, sink: Callable[[Dict[str, int]], None]) -> Dict[str, int]:
+        """把自上次汇总以来的增量交给 sink；sink 抛出异常时增量保留到下次汇总"""
+        with self._flush_lock:
+            with self._register_lock:
+                buckets = list(self._buckets)
+            current = [dict(bucket) for bucket, _ in buckets]
+            delta = dict.fromkeys(self._names, 0)
+            for (_, flushed), values in zip(buckets, current):
+                for name in self._names:
+                    delta[name] += values[name] - flushed[name]
+            if any(delta.values()):
+                sink(delta)
+                for (_, flushed), values in zip(buckets, current):
+                    flushed.update(values)
+            return delta
+
 
 class BaseCache(ABC):
     """缓存接口基类"""
 
     def __init__(self, expire_seconds: int):
         self.expire_seconds = expire_seconds
+        # 单飞 (single-flight) 注册表: (domain, proxy) -> _InflightSolve
+        self._inflight: Dict[tuple, _InflightSolve] = {}
+        self._inflight_lock = threading.Lock()
+        self._flight_stats = {"solves": 0, "coalesced": 0}
+        self._lifetimes = _LifetimeLearner(lambda: self.expire_seconds)
+        # 过盾失败记录（负缓存）: 缓存键 -> {"failures", "until", "last_error", "last_failed_at", "expire_at"}
+        self._backoffs: Dict[str, Dict[str, Any]] = {}
+        self._backoff_lock = threading.Lock()
+        self._backoff_stats = {"recorded": 0, "rejected": 0}
+        self._l1 = _L1Cache()
 
     @abstractmethod
     def get_credentials(self, url: str, force_refresh: bool = False, proxy: str = None) -> Dict[str, Any]:
         """获取凭证，proxy 参数会传递给过盾流程"""
         pass
 
+    def start(self) -> "BaseCache":
+        """选定为全局缓存后启动后台任务，子类按需覆盖；返回自身"""
+        return self
+
     @abstractmethod
     def invalidate(self, domain: str) -> bool:
         pass
@@ -58,17 +323,361 @@ class BaseCache(ABC):
         """主动刷新指定域名的凭证"""
         pass
 
+    @abstractmethod
+    def _store_credentials(self, domain: str, creds: Dict[str, Any]):
+        """持久化过盾得到的凭证"""
+        pass
+
+    @abstractmethod
+    def _load_credentials(self, domain: str) -> Optional[Dict[str, Any]]:
+        """读取未过期的凭证，不存在或已过期返回 None"""
+        pass
+
+    def peek_credentials(self, url: str, proxy: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """只读查询缓存中的凭证，未命中时不触发过盾"""
+        return self._lookup_credentials(self._extract_domain(url), proxy)[1]
+
+    def store_credentials(self, url: str, creds: Dict[str, Any], proxy: Optional[str] = None) -> bool:
+        """写入在过盾流程之外获得的凭证（如浏览器直读过盾后拿到的 Cookie）
+
+        按与 get_credentials 相同的 (Cookie 作用域, 代理) 键覆盖旧凭证，后续请求可直接走 Cookie 复用。
+
+        Returns:
+            是否写入
+        """
+        cookies = creds.get("cookies")
+        ua = creds.get("ua")
+        if not cookies or not ua:
+            return False
+        stored = {"cookies": cookies, "ua": ua, "solved_at": creds.get("solved_at") or time.time()}
+        for field in ("expires_at", "cookie_domain"):
+            if creds.get(field):
+                stored[field] = creds[field]
+        self._store_scoped(self._cache_key(self._extract_domain(url), proxy), stored)
+        return True
+
+    def report_blocked(self, url: str, creds: Optional[Dict[str, Any]], proxy: Optional[str] = None):
+        """上报使用缓存凭证的请求遇到了拦截，用于学习该域名凭证的实际失效时间"""
+        solved_at = (creds or {}).get("solved_at")
+        if not solved_at:
+            return
+        domain = self._extract_domain(url)
+        # 与写入时一致，按凭证的 Cookie 作用域归属学习结果
+        host = scope_host(cookie_scope(domain, creds.get("cookie_domain")))
+        self._lifetimes.observe_blocked(self._cache_key(domain, proxy), host, solved_at)
+
+    def _ttl_for(self, key: str, creds: Dict[str, Any]) -> int:
+        """按域名学习到的有效期计算凭证 TTL"""
+        return self._lifetimes.ttl_for(scope_host(self._split_cache_key(key)[0]), creds)
+
+    def get_lifetime_stats(self) -> Dict[str, Any]:
+        """各域名学习到的凭证有效期"""
+        return self._lifetimes.snapshot()
+
+    # ------------------------------------------------------------------
+    # 过盾失败回避（负缓存）
+    # ------------------------------------------------------------------
+
+    def _load_backoff(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取失败记录，子类可覆盖为共享存储"""
+        with self._backoff_lock:
+            record = self._backoffs.get(key)
+            if record and record["expire_at"] <= time.time():
+                del self._backoffs[key]
+                return None
+            return dict(record) if record else None
+
+    def _save_backoff(self, key: str, record: Dict[str, Any], ttl: int):
+        with self._backoff_lock:
+            self._backoffs[key] = {**record, "expire_at": time.time() + ttl}
+
+    def _delete_backoff(self, key: str) -> bool:
+        with self._backoff_lock:
+            return self._backoffs.pop(key, None) is not None
+
+    def _list_backoffs(self) -> Dict[str, Dict[str, Any]]:
+        now = time.time()
+        with self._backoff_lock:
+            return {k: dict(r) for k, r in self._backoffs.items() if r["expire_at"] > now}
+
+    def _check_backoff(self, key: str):
+        """处于回避期时抛出 SolveBackoffError"""
+        if not settings.SOLVE_BACKOFF_ENABLED:
+            return
+        record = self._load_backoff(key)
+        if not record:
+            return
+        retry_after = record["until"] - time.time()
+        if retry_after > 0:
+            with self._backoff_lock:
+                self._backoff_stats["rejected"] += 1
+            raise SolveBackoffError(key, retry_after, record["failures"], record["last_error"])
+
+    def _record_failure(self, key: str, error: BaseException):
+        """记录一次过盾失败：回避时间按连续失败次数指数增长并加入随机抖动"""
+        if not settings.SOLVE_BACKOFF_ENABLED or isinstance(error, SolveBackoffError):
+            return
+        now = time.time()
+        record = self._load_backoff(key) or {}
+        failures = record.get("failures", 0) + 1
+        delay = min(settings.SOLVE_BACKOFF_MAX, settings.SOLVE_BACKOFF_BASE * 2 ** (failures - 1))
+        # 抖动避免多个副本/域名在同一时刻集中重试
+        delay *= random.uniform(1 - settings.SOLVE_BACKOFF_JITTER, 1)
+        record = {
+            "failures": failures,
+            "until": now + delay,
+            "last_error": (str(error) or type(error).__name__)[:200],
+            "last_failed_at": now,
+        }
+        # 回避结束后 SOLVE_BACKOFF_MAX 秒内再失败则继续累加，否则重新计数
+        self._save_backoff(key, record, int(delay + settings.SOLVE_BACKOFF_MAX))
+        with self._backoff_lock:
+            self._backoff_stats["recorded"] += 1
+        log.warning(f"[Cache] 过盾失败 {failures} 次，{key} 回避 {delay:.0f} 秒")
+
+    def _clear_backoff(self, key: str):
+        if self._delete_backoff(key):
+            log.info(f"[Cache] 过盾恢复，解除回避: {key}")
+
+    def check_backoff(self, url: str, proxy: Optional[str] = None):
+        """域名处于过盾失败回避期时抛出 SolveBackoffError（供浏览器直读等不经缓存过盾的路径使用）"""
+        self._check_backoff(self._cache_key(self._extract_domain(url), proxy))
+
+    def record_solve_failure(self, url: str, error: SolveChallengeError, proxy: Optional[str] = None):
+        """记录缓存之外的过盾失败（如浏览器直读时挑战未通过）"""
+        self._record_failure(self._cache_key(self._extract_domain(url), proxy), error)
+
+    def record_solve_success(self, url: str, proxy: Optional[str] = None):
+        self._clear_backoff(self._cache_key(self._extract_domain(url), proxy))
+
+    def clear_backoff(self, domain: Optional[str] = None) -> int:
+        """手动解除回避，domain 为空时解除全部，返回解除的记录数"""
+        keys = [
+            k for k in self._list_backoffs()
+            if domain is None or self._split_cache_key(k)[0] == domain
+        ]
+        return sum(1 for k in keys if self._delete_backoff(k))
+
+    def get_backoff_stats(self) -> Dict[str, Any]:
+        """过盾失败回避状态"""
+        now = time.time()
+        entries = []
+        for key, record in self._list_backoffs().items():
+            entries.append({
+                "key": key,
+                "failures": record["failures"],
+                "active": record["until"] > now,
+                "retry_after": max(0, round(record["until"] - now)),
+                "last_error": record["last_error"],
+                "last_failed_at": record["last_failed_at"],
+            })
+        entries.sort(key=lambda e: e["retry_after"], reverse=True)
+        with self._backoff_lock:
+            counters = dict(self._backoff_stats)
+        return {
+            "enabled": settings.SOLVE_BACKOFF_ENABLED,
+            **counters,
+            "active": sum(1 for e in entries if e["active"]),
+            "domains": entries,
+        }
+
     def _extract_domain(self, url: str) -> str:
-        return urlparse(url).netloc
+        """URL 的主机名（小写，不含端口：Cookie 不区分端口），与域名统计共用 url_host"""
+        return url_host(url)
+
+    # ------------------------------------------------------------------
+    # Cookie 作用域：一次过盾服务 Cookie 覆盖的所有主机
+    # ------------------------------------------------------------------
+
+    def _load_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """批量读取凭证，子类可覆盖为单次往返"""
+        return [self._load_credentials(key) for key in keys]
+
+    def _lookup_credentials(
+        self, host: str, proxy: Optional[str] = None, use_l1: bool = True
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """按作用域从具体到宽泛查找覆盖该主机的凭证
+
+        先查进程内 L1；未命中再查后端：先查仅主机凭证 (host)，再逐级向上查域凭证
+        (.host、.parent ... .可注册域名)，命中结果写回 L1。
+
+        Returns:
+            (命中的缓存键, 凭证)，未命中时均为 None
+        """
+        host_key = self._cache_key(host, proxy)
+        l1_enabled = use_l1 and settings.CACHE_L1_ENABLED
+        if l1_enabled:
+            cached = self._l1.get(host_key)
+            if cached:
+                return cached
+
+        keys = [self._cache_key(scope, proxy) for scope in lookup_scopes(host)]
+        for key, creds in zip(keys, self._load_many(keys)):
+            if creds:
+                if l1_enabled:
+                    self._l1.put(host_key, key, creds)
+                return key, creds
+        return None, None
+
+    def _store_scoped(self, host_key: str, creds: Dict[str, Any]) -> str:
+        """按 cf_clearance 的 Domain 作用域写入凭证，返回实际写入的缓存键"""
+        host, proxy = self._split_cache_key(host_key)
+        creds.setdefault("host", host)
+        key = self._cache_key(cookie_scope(host, creds.get("cookie_domain")), proxy)
+        self._store_credentials(key, creds)
+        self._invalidate_l1(key)
+        self._renew_proxy_pin(key, creds)
+        return key
+
+    def _renew_proxy_pin(self, key: str, creds: Dict[str, Any]):
+        """按凭证有效期延长代理池绑定，凭证过期前出口 IP 不轮换"""
+        scope, proxy = self._split_cache_key(key)
+        if proxy:
+            proxy_manager.renew_pin(scope_host(scope), proxy, self._ttl_for(key, creds))
+
+    # ------------------------------------------------------------------
+    # L1 失效
+    # ------------------------------------------------------------------
+
+    def _invalidate_l1(self, key: Optional[str] = None, any_proxy: bool = False):
+        """凭证写入/清除后逐出本地 L1 并通知其他副本；key 为空表示全部"""
+        message = {"all": True} if key is None else {"key": key, "any_proxy": any_proxy}
+        self._apply_l1_invalidation(message)
+        self._broadcast_l1_invalidation(message)
+
+    def _apply_l1_invalidation(self, message: Dict[str, Any]):
+        if message.get("all"):
+            self._l1.evict()
+            return
+        scope, proxy = self._split_cache_key(message["key"])
+        self._l1.evict(scope, proxy, any_proxy=message.get("any_proxy", False))
+
+    def _broadcast_l1_invalidation(self, message: Dict[str, Any]):
+        """通知其他副本，单机后端无需广播"""
+        pass
+
+    def _invalidate_l1_domain(self, domain: str):
+        """清除域名缓存时逐出其主机凭证与域作用域凭证（所有代理）"""
+        self._invalidate_l1(domain, any_proxy=True)
+        self._invalidate_l1(f".{domain.lstrip('.')}", any_proxy=True)
+
+    def get_l1_stats(self) -> Dict[str, Any]:
+        return self._l1.snapshot()
+
+    def _refresh_target(self, key: str) -> Tuple[str, str, Optional[str]]:
+        """刷新缓存键对应凭证时访问的 (URL, 主机缓存键, 代理)
+
+        域作用域凭证 (.site.com) 回到最初过盾的主机刷新，无记录时访问作用域本身。
+        """
+        scope, proxy = self._split_cache_key(key)
+        host = scope
+        if scope.startswith("."):
+            creds = self._load_credentials(key) or {}
+            host = creds.get("host") or scope_host(scope)
+        return f"https://{host}/", self._cache_key(host, proxy), proxy
+
+    def _cache_key(self, domain: str, proxy: Optional[str] = None) -> str:
+        """凭证缓存键
+
+        cf_clearance 与过盾时的出口 IP 绑定，经代理获取的凭证按 (域名, 代理) 分开存储，
+        格式为 "domain|proxy"；直连凭证仍以域名为键。
+        """
+        return f"{domain}|{proxy}" if proxy else domain
+
+    def _split_cache_key(self, key: str) -> tuple:
+        """将缓存键拆分为 (domain, proxy)"""
+        domain, _, proxy = key.partition("|")
+        return domain, proxy or None
+
+    def _solve_single_flight(self, url: str, domain: str, proxy: str = None) -> Dict[str, Any]:
+        """同一 (域名, 代理) 同时只运行一次过盾，其余调用方等待并共享结果
+
+        领头的调用方负责过盾并写入缓存，写入完成后才唤醒等待者，
+        保证等待者醒来后缓存中已是新凭证。
+        """
+        # 连续失败的域名在回避期内直接拒绝，不占用浏览器
+        self._check_backoff(domain)
+
+        key = (domain, proxy)
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = _InflightSolve()
+                self._inflight[key] = flight
+                self._flight_stats["solves"] += 1
+                is_leader = True
+            else:
+                flight.waiters += 1
+                self._flight_stats["coalesced"] += 1
+                is_leader = False
+
+        if not is_leader:
+            log.info(f"[Cache] 等待进行中的过盾: {domain} (已合并 {flight.waiters} 个请求)")
+            if not flight.event.wait(timeout=SOLVE_WAIT_TIMEOUT):
+                raise Exception(f"等待过盾结果超时 ({SOLVE_WAIT_TIMEOUT}秒): {domain}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            creds = self._solve_and_store(url, domain, proxy=proxy)
+            flight.result = creds
+            self._clear_backoff(domain)
+            return creds
+        except BaseException as e:
+            flight.error = e
+            # 只有挑战未通过才计入回避；浏览器池满、等待本地/其他副本过盾超时不代表域名异常
+            if isinstance(e, SolveChallengeError):
+                self._record_failure(domain, e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _solve_and_store(self, url: str, domain: str, proxy: str = None) -> Dict[str, Any]:
+        """执行过盾并写入缓存，子类可覆盖以加入跨进程协调"""
+        creds = solve_turnstile(url, proxy=proxy)
+        self._store_scoped(domain, creds)
+        return creds
+
+    def _single_flight_stats(self) -> Dict[str, Any]:
+        """单飞统计：实际过盾次数、被合并的请求数、进行中的过盾数"""
+        with self._inflight_lock:
+            return {
+                "solves": self._flight_stats["solves"],
+                "coalesced": self._flight_stats["coalesced"],
+                "inflight": len(self._inflight),
+            }
 
 
 class SQLiteCache(BaseCache):
-    """SQLite 缓存实现 (单机模式)"""
+    """SQLite 缓存实现 (单机模式)
+
+    - WAL 模式：读不阻塞写，读操作无锁并发
+    - 每个线程一条持久连接，语句由连接的语句缓存预编译复用
+    - 写操作由进程内写锁串行化，避免同进程写者之间 SQLITE_BUSY 重试
+    - 统计由内存中的过期时间索引维护，不再每次查询全表；清理作业执行时与数据库重新同步
+    """
+
+    _SELECT_SQL = "SELECT domain, cookies, ua, expire_at, created_at, meta FROM credentials WHERE domain IN ({})"
+    _UPSERT_SQL = """
+        INSERT OR REPLACE INTO credentials (domain, cookies, ua, expire_at, created_at, meta)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    _INVALIDATE_SQL = (
+        "DELETE FROM credentials WHERE domain IN (?, ?) "
+        "OR substr(domain, 1, ?) = ? OR substr(domain, 1, ?) = ?"
+    )
+    _EXPIRING_SQL = "SELECT domain FROM credentials WHERE expire_at > ? AND expire_at < ?"
 
     def __init__(self, expire_seconds: int, db_path: str):
         super().__init__(expire_seconds)
         self.db_path = db_path
-        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        # 缓存键 -> 过期时间，供统计使用
+        self._expiry: Dict[str, float] = {}
         self._init_db()
 
     def _init_db(self):
@@ -77,190 +686,318 @@ class SQLiteCache(BaseCache):
             os.makedirs(db_dir)
             log.info(f"[Cache:SQLite] 创建数据目录: {db_dir}")
 
-        with self._lock:
-            conn = sqlite3.connect(self.db_path)
-            try:
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS credentials (
-                        domain TEXT PRIMARY KEY,
-                        cookies TEXT NOT NULL,
-                        ua TEXT NOT NULL,
-                        expire_at REAL NOT NULL,
-                        created_at REAL NOT NULL
-                    )
-                """)
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_expire ON credentials(expire_at)")
-                conn.commit()
-                log.info(f"[Cache:SQLite] 数据库已初始化: {self.db_path}")
-            finally:
-                conn.close()
+        with self._write_lock:
+            conn = self._get_conn()
+            # WAL 模式写入数据库文件，对之后所有连接生效（部分文件系统不支持时保持原模式）
+            self._journal_mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS credentials (
+                    domain TEXT PRIMARY KEY,
+                    cookies TEXT NOT NULL,
+                    ua TEXT NOT NULL,
+                    expire_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    meta TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_expire ON credentials(expire_at)")
+            # 旧库补充 meta 列：cf_clearance 过期时间、Domain 作用域、过盾主机
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(credentials)")}
+            if "meta" not in columns:
+                conn.execute("ALTER TABLE credentials ADD COLUMN meta TEXT")
+            conn.commit()
+            self._sync_index(conn)
+            log.info(f"[Cache:SQLite] 数据库已初始化: {self.db_path} (journal_mode={self._journal_mode})")
 
     def _get_conn(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path)
+        """当前线程的持久连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # timeout 即 busy_timeout：其他进程持有写锁时等待而非立即报错
+            conn = sqlite3.connect(self.db_path, timeout=10, cached_statements=64)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _sync_index(self, conn: sqlite3.Connection):
+        """从数据库重建统计索引（需持有写锁）"""
+        self._expiry = dict(conn.execute("SELECT domain, expire_at FROM credentials"))
+
+    @staticmethod
+    def _row_to_creds(row) -> Dict[str, Any]:
+        meta = json.loads(row[5]) if row[5] else {}
+        return {
+            "cookies": codec.decode(row[1]), "ua": row[2],
+            "solved_at": row[4], "expire_at": row[3], **meta,
+        }
 
     def get_credentials(self, url: str, force_refresh: bool = False, proxy: str = None) -> Dict[str, Any]:
-        domain = self._extract_domain(url)
-        now = time.time()
+        host = self._extract_domain(url)
+        domain = self._cache_key(host, proxy)
 
         if not force_refresh:
-            with self._lock:
-                conn = self._get_conn()
-                try:
-                    cursor = conn.execute(
-                        "SELECT cookies, ua, expire_at FROM credentials WHERE domain = ?",
-                        (domain,)
-                    )
-                    row = cursor.fetchone()
-                    if row and row[2] > now:
-                        log.info(f"[Cache:SQLite] 命中缓存: {domain}")
-                        return {"cookies": json.loads(row[0]), "ua": row[1]}
-                finally:
-                    conn.close()
-
-        # 缓存无效，需要重新过盾
+            key, creds = self._lookup_credentials(host, proxy)
+            if creds:
+                log.info(f"[Cache:SQLite] 命中缓存: {key}")
+                return creds
+
+        # 缓存无效，需要重新过盾（同域名并发请求合并为一次）
         log.info(f"[Cache:SQLite] 启动过盾流程: {domain}")
-        creds = solve_turnstile(url, proxy=proxy)
+        return self._solve_single_flight(url, domain, proxy=proxy)
 
-        with self._lock:
-            conn = self._get_conn()
+    def _load_credentials(self, domain: str) -> Optional[Dict[str, Any]]:
+        return self._load_many([domain])[0]
+
+    def _load_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        # 各级作用域一次查询读取；WAL 下读操作无需加锁
+        sql = self._SELECT_SQL.format(", ".join("?" * len(keys)))
+        now = time.time()
+        found = {
+            row[0]: self._row_to_creds(row)
+            for row in self._get_conn().execute(sql, keys)
+            if row[3] > now
+        }
+        return [found.get(key) for key in keys]
+
+    def _store_credentials(self, domain: str, creds: Dict[str, Any]):
+        now = time.time()
+        ttl = self._ttl_for(domain, creds)
+        meta = {k: creds[k] for k in ("expires_at", "cookie_domain", "host") if creds.get(k)}
+        params = (
+            domain,
+            codec.encode(creds["cookies"]),
+            creds["ua"],
+            now + ttl,
+            creds.get("solved_at") or now,
+            json.dumps(meta) if meta else None
+        )
+        conn = self._get_conn()
+        with self._write_lock:
             try:
-                conn.execute("""
-                    INSERT OR REPLACE INTO credentials (domain, cookies, ua, expire_at, created_at)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    domain,
-                    json.dumps(creds["cookies"]),
-                    creds["ua"],
-                    now + self.expire_seconds,
-                    now
-                ))
+                conn.execute(self._UPSERT_SQL, params)
                 conn.commit()
-                log.info(f"[Cache:SQLite] 凭证已持久化: {domain}")
-            finally:
-                conn.close()
-
-        return creds
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            self._expiry[domain] = now + ttl
+        log.info(f"[Cache:SQLite] 凭证已持久化: {domain} (TTL={ttl}s)")
 
     def invalidate(self, domain: str) -> bool:
-        with self._lock:
-            conn = self._get_conn()
+        # 同时清除该域名的域作用域凭证 (".domain") 以及经各代理获取的凭证 ("domain|proxy")
+        scoped = f".{domain.lstrip('.')}"
+        prefix, scoped_prefix = f"{domain}|", f"{scoped}|"
+        conn = self._get_conn()
+        with self._write_lock:
             try:
-                cursor = conn.execute("DELETE FROM credentials WHERE domain = ?", (domain,))
+                cursor = conn.execute(
+                    self._INVALIDATE_SQL,
+                    (domain, scoped, len(prefix), prefix, len(scoped_prefix), scoped_prefix)
+                )
                 conn.commit()
-                if cursor.rowcount > 0:
-                    log.info(f"[Cache:SQLite] 已清除缓存: {domain}")
-                    return True
-                return False
-            finally:
-                conn.close()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            for key in [k for k in self._expiry if k in (domain, scoped) or k.startswith((prefix, scoped_prefix))]:
+                del self._expiry[key]
+        self._invalidate_l1_domain(domain)
+        if cursor.rowcount > 0:
+            log.info(f"[Cache:SQLite] 已清除缓存: {domain}")
+            return True
+        return False
 
     def invalidate_all(self) -> int:
-        with self._lock:
-            conn = self._get_conn()
+        conn = self._get_conn()
+        with self._write_lock:
             try:
-                cursor = conn.execute("SELECT COUNT(*) FROM credentials")
-                count = cursor.fetchone()[0]
-                conn.execute("DELETE FROM credentials")
+                count = conn.execute("DELETE FROM credentials").rowcount
                 conn.commit()
-                log.info(f"[Cache:SQLite] 已清除所有缓存，共 {count} 条")
-                return count
-            finally:
-                conn.close()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            self._expiry.clear()
+        self._invalidate_l1()
+        log.info(f"[Cache:SQLite] 已清除所有缓存，共 {count} 条")
+        return count
 
     def cleanup_expired(self) -> int:
-        with self._lock:
-            conn = self._get_conn()
+        conn = self._get_conn()
+        with self._write_lock:
             try:
-                now = time.time()
-                cursor = conn.execute("DELETE FROM credentials WHERE expire_at < ?", (now,))
+                cursor = conn.execute("DELETE FROM credentials WHERE expire_at < ?", (time.time(),))
                 conn.commit()
-                count = cursor.rowcount
-                if count > 0:
-                    log.info(f"[Cache:SQLite] 已清理过期缓存: {count} 条")
-                return count
-            finally:
-                conn.close()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            # 顺带与数据库重新同步统计索引（同一数据库文件可能被其他进程写入）
+            self._sync_index(conn)
+        count = cursor.rowcount
+        if count > 0:
+            log.info(f"[Cache:SQLite] 已清理过期缓存: {count} 条")
+        return count
 
     def get_stats(self) -> Dict[str, Any]:
-        with self._lock:
-            conn = self._get_conn()
-            try:
-                now = time.time()
-                cursor = conn.execute("SELECT COUNT(*) FROM credentials")
-                total = cursor.fetchone()[0]
-                cursor = conn.execute("SELECT COUNT(*) FROM credentials WHERE expire_at > ?", (now,))
-                valid = cursor.fetchone()[0]
-                cursor = conn.execute("SELECT domain FROM credentials")
-                domains = [row[0] for row in cursor.fetchall()]
-                return {
-                    "type": "sqlite",
-                    "total": total,
-                    "valid": valid,
-                    "expired": total - valid,
-                    "domains": domains,
-                    "db_path": self.db_path,
-                }
-            finally:
-                conn.close()
+        now = time.time()
+        with self._write_lock:
+            expiry = dict(self._expiry)
+        valid = sum(1 for expire_at in expiry.values() if expire_at > now)
+        return {
+            "type": "sqlite",
+            "codec": codec.describe(),
+            "total": len(expiry),
+            "valid": valid,
+            "expired": len(expiry) - valid,
+            "domains": list(expiry),
+            "db_path": self.db_path,
+            "journal_mode": self._journal_mode,
+            "single_flight": self._single_flight_stats(),
+            "lifetimes": self.get_lifetime_stats(),
+            "solve_backoff": self.get_backoff_stats(),
+            "l1": self.get_l1_stats(),
+        }
 
     def get_expiring_domains(self, threshold_seconds: int = 300) -> List[str]:
         """获取即将过期的域名列表"""
-        with self._lock:
-            conn = self._get_conn()
-            try:
-                now = time.time()
-                threshold_time = now + threshold_seconds
-                cursor = conn.execute(
-                    "SELECT domain FROM credentials WHERE expire_at > ? AND expire_at < ?",
-                    (now, threshold_time)
-                )
-                domains = [row[0] for row in cursor.fetchall()]
-                return domains
-            finally:
-                conn.close()
+        now = time.time()
+        cursor = self._get_conn().execute(self._EXPIRING_SQL, (now, now + threshold_seconds))
+        return [row[0] for row in cursor.fetchall()]
 
     def refresh_credential(self, domain: str) -> bool:
         """主动刷新指定域名的凭证"""
         try:
-            url = f"https://{domain}/"
+            url, host_key, proxy = self._refresh_target(domain)
             log.info(f"[Cache:SQLite] 主动刷新凭证: {domain}")
-            creds = solve_turnstile(url)
-            now = time.time()
-
-            with self._lock:
-                conn = self._get_conn()
-                try:
-                    conn.execute("""
-                        INSERT OR REPLACE INTO credentials (domain, cookies, ua, expire_at, created_at)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
-                        domain,
-                        json.dumps(creds["cookies"]),
-                        creds["ua"],
-                        now + self.expire_seconds,
-                        now
-                    ))
-                    conn.commit()
-                    log.info(f"[Cache:SQLite] 凭证刷新成功: {domain}")
-                finally:
-                    conn.close()
+            self._solve_single_flight(url, host_key, proxy=proxy)
+            log.info(f"[Cache:SQLite] 凭证刷新成功: {domain}")
             return True
         except Exception as e:
             log.error(f"[Cache:SQLite] 凭证刷新失败: {domain}, 错误: {e}")
             return False
 
 
+def _index_write_lua(i: int, member: str, expire_at: str, value: str) -> str:
+    """Redis 过期索引写入片段：KEYS[i..i+2] 为过期时间有序集合、大小哈希、统计哈希
+
+    登记 (成员, 过期时间)，并按新旧数据大小差更新总大小。
+    """
+    return f"""
+    redis.call('ZADD', KEYS[{i}], {expire_at}, {member})
+    local old_size = tonumber(redis.call('HGET', KEYS[{i + 1}], {member})) or 0
+    redis.call('HSET', KEYS[{i + 1}], {member}, #{value})
+    redis.call('HINCRBY', KEYS[{i + 2}], 'size_bytes', #{value} - old_size)
+    """
+
+
 class RedisCache(BaseCache):
-    """Redis 缓存实现 (分布式模式)"""
+    """Redis 缓存实现 (分布式模式)
+
+    多个网关副本共享同一 Redis 时，过盾由租约 (SET NX + TTL + 防护令牌) 协调：
+    同一域名同时只有一个副本过盾，其余副本订阅结果频道等待。
+    """
+
+    # 获取租约：成功时递增防护令牌并写入租约，返回令牌；失败返回 0
+    _ACQUIRE_LEASE_LUA = """
+    if redis.call('SET', KEYS[1], '0', 'NX', 'PX', ARGV[1]) then
+        local token = redis.call('INCR', KEYS[2])
+        redis.call('EXPIRE', KEYS[2], 86400)
+        redis.call('SET', KEYS[1], token, 'PX', ARGV[1])
+        return token
+    end
+    return 0
+    """
+
+    # 过期索引维护片段：KEYS 中依次为过期时间有序集合、大小哈希、统计哈希
+    # 移除：从过期索引中删除成员并扣减总大小
+    _INDEX_REMOVE_LUA = """
+    local function index_remove(member)
+        redis.call('ZREM', KEYS[1], member)
+        local size = tonumber(redis.call('HGET', KEYS[2], member)) or 0
+        redis.call('HDEL', KEYS[2], member)
+        redis.call('HINCRBY', KEYS[3], 'size_bytes', -size)
+    end
+    """
+
+    # 写入凭证并登记过期索引
+    _STORE_LUA = """
+    redis.call('SETEX', KEYS[4], ARGV[1], ARGV[2])
+    """ + _index_write_lua(1, "ARGV[3]", "ARGV[4]", "ARGV[2]")
+
+    # 提交凭证：仅当防护令牌仍是最新时写入，避免过期持有者覆盖新凭证
+    _COMMIT_LEASE_LUA = """
+    if tonumber(redis.call('GET', KEYS[2])) ~= tonumber(ARGV[1]) then
+        return 0
+    end
+    redis.call('SETEX', KEYS[3], ARGV[2], ARGV[3])
+    """ + _index_write_lua(4, "ARGV[5]", "ARGV[6]", "ARGV[3]") + """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+    end
+    redis.call('PUBLISH', ARGV[4], 'ok')
+    return 1
+    """
+
+    # 放弃租约：过盾失败时释放自己的租约并通知等待者
+    _ABORT_LEASE_LUA = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+    end
+    redis.call('PUBLISH', ARGV[2], 'fail')
+    return 1
+    """
+
+    # 删除凭证：KEYS[4..] 为数据键，ARGV 为对应的索引成员；返回删除的数据键数
+    _DROP_LUA = _INDEX_REMOVE_LUA + """
+    local deleted = 0
+    for i = 4, #KEYS do
+        deleted = deleted + redis.call('DEL', KEYS[i])
+        index_remove(ARGV[i - 3])
+    end
+    return deleted
+    """
+
+    # 清理索引中已过期的成员（数据键已由 Redis 自动过期）；返回清理数
+    _PRUNE_LUA = _INDEX_REMOVE_LUA + """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    for _, member in ipairs(expired) do
+        index_remove(member)
+    end
+    return #expired
+    """
 
     def __init__(self, expire_seconds: int, redis_url: str):
         super().__init__(expire_seconds)
         self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        # 凭证数据为二进制编码，单独使用不解码响应的连接读取
+        self._data_client = redis.from_url(redis_url)
         self.prefix = "cred:"
         self.stats_key = "cache_stats"
+        self.backoff_prefix = "solve_backoff:"
+        # 过期索引：缓存键 -> 过期时间 (有序集合)；缓存键 -> 数据大小 (哈希)，总大小记在 stats_key
+        self.expiry_key = "cred_expiry"
+        self.sizes_key = "cred_sizes"
+        self._store_script = self.redis_client.register_script(self._STORE_LUA)
+        self._drop_script = self.redis_client.register_script(self._DROP_LUA)
+        self._prune_script = self.redis_client.register_script(self._PRUNE_LUA)
+        self._acquire_lease_script = self.redis_client.register_script(self._ACQUIRE_LEASE_LUA)
+        self._commit_lease_script = self.redis_client.register_script(self._COMMIT_LEASE_LUA)
+        self._abort_lease_script = self.redis_client.register_script(self._ABORT_LEASE_LUA)
+        self._lease_stats = {"acquired": 0, "waited": 0, "remote_hits": 0, "fenced": 0}
+        self._lease_lock = threading.Lock()
+        self._l1_listener = None
+        self._counters = _CounterBuckets(("hits", "misses"))
+        self._redis_url = redis_url
+
+    def start(self) -> "RedisCache":
+        """确定使用 Redis 后再初始化统计、补建索引并启动 L1 订阅与统计刷新线程
+
+        连接检查失败降级到 SQLite 时，被丢弃的实例不会留下持续重试的后台线程。
+        """
+        self._start_l1_listener()
         # 初始化统计
         self._init_stats()
-        log.info(f"[Cache:Redis] 已连接到 Redis: {redis_url}")
+        self._backfill_index()
+        self._start_stats_flusher()
+        log.info(f"[Cache:Redis] 已连接到 Redis: {self._redis_url}")
+        return self
 
     def _init_stats(self):
         """初始化统计计数器"""
@@ -273,110 +1010,387 @@ class RedisCache(BaseCache):
         except redis.RedisError:
             pass
 
-    def _record_hit(self):
-        """记录缓存命中"""
+    def _index_keys(self) -> List[str]:
+        return [self.expiry_key, self.sizes_key, self.stats_key]
+
+    def _backfill_index(self):
+        """旧版本写入的凭证不在过期索引中，首次启动时用 SCAN 补登记（仅执行一次）"""
+        marker = f"{self.expiry_key}:ready"
         try:
-            self.redis_client.hincrby(self.stats_key, "hits", 1)
-        except redis.RedisError:
-            pass
+            if self.redis_client.exists(marker):
+                return
+            count = 0
+            now = time.time()
+            for key in self.redis_client.scan_iter(match=f"{self.prefix}*", count=500):
+                pipe = self.redis_client.pipeline()
+                pipe.ttl(key)
+                pipe.strlen(key)
+                ttl, size = pipe.execute()
+                if ttl is None or ttl <= 0:
+                    continue
+                member = key[len(self.prefix):]
+                pipe = self.redis_client.pipeline()
+                pipe.zadd(self.expiry_key, {member: now + ttl})
+                pipe.hset(self.sizes_key, member, size)
+                pipe.hincrby(self.stats_key, "size_bytes", size)
+                pipe.execute()
+                count += 1
+            self.redis_client.set(marker, 1)
+            if count:
+                log.info(f"[Cache:Redis] 已为 {count} 个旧凭证建立过期索引")
+        except redis.RedisError as e:
+            log.warning(f"[Cache:Redis] 建立过期索引失败: {e}")
+
+    def _record_hit(self):
+        """记录缓存命中（进程内累计，后台批量写入 Redis）"""
+        self._counters.incr("hits")
 
     def _record_miss(self):
-        """记录缓存未命中"""
+        """记录缓存未命中（进程内累计，后台批量写入 Redis）"""
+        self._counters.incr("misses")
+
+    def _start_stats_flusher(self):
+        thread = threading.Thread(target=self._stats_flush_loop, name="cache-stats-flush", daemon=True)
+        thread.start()
+
+    def _stats_flush_loop(self):
+        while True:
+            time.sleep(settings.CACHE_STATS_FLUSH_INTERVAL)
+            self._flush_counters()
+
+    def _flush_counters(self):
+        """将各线程累计的命中/未命中增量用一次管道写入 Redis"""
+        def write(delta: Dict[str, int]):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for name, count in delta.items():
+                if count:
+                    pipe.hincrby(self.stats_key, name, count)
+            pipe.execute()
+
         try:
-            self.redis_client.hincrby(self.stats_key, "misses", 1)
-        except redis.RedisError:
-            pass
+            self._counters.flush(write)
+        except redis.RedisError as e:
+            log.debug(f"[Cache:Redis] 写入命中统计失败，下次重试: {e}")
 
     def _get_key(self, domain: str) -> str:
         return f"{self.prefix}{domain}"
 
-    def get_credentials(self, url: str, force_refresh: bool = False, proxy: str = None) -> Dict[str, Any]:
-        domain = self._extract_domain(url)
-        key = self._get_key(domain)
+    def _start_l1_listener(self):
+        """订阅 L1 失效广播，其他副本写入/清除凭证时逐出本地 L1"""
+        if not settings.CACHE_L1_ENABLED:
+            return
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{L1_INVALIDATE_CHANNEL: self._on_l1_message})
+            self._l1_listener = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_l1_listener_error
+            )
+        except redis.RedisError as e:
+            log.warning(f"[Cache:Redis] 订阅 L1 失效频道失败，L1 仅按 CACHE_L1_MAX_AGE 过期: {e}")
 
-        if not force_refresh:
-            try:
-                data = self.redis_client.get(key)
+    def _on_l1_message(self, message: Dict[str, Any]):
+        try:
+            self._apply_l1_invalidation(json.loads(message["data"]))
+        except (ValueError, KeyError, TypeError) as e:
+            log.debug(f"[Cache:Redis] 无效的 L1 失效消息: {e}")
+
+    def _on_l1_listener_error(self, error: Exception, pubsub, thread):
+        # 连接中断期间可能错过广播，清空 L1 后稍候由 redis-py 重连
+        log.warning(f"[Cache:Redis] L1 失效订阅中断: {error}")
+        self._l1.evict()
+        time.sleep(1.0)
+
+    def _broadcast_l1_invalidation(self, message: Dict[str, Any]):
+        if not settings.CACHE_L1_ENABLED:
+            return
+        try:
+            self.redis_client.publish(L1_INVALIDATE_CHANNEL, json.dumps(message))
+        except redis.RedisError as e:
+            log.warning(f"[Cache:Redis] 广播 L1 失效失败: {e}")
+
+    def _lease_keys(self, domain: str) -> tuple:
+        """返回 (租约键, 防护令牌键, 结果频道)"""
+        return f"solve_lease:{domain}", f"solve_fence:{domain}", f"cred_ready:{domain}"
+
+    # 失败记录存于 Redis，所有副本共享同一回避状态；Redis 不可用时退回进程内记录
+
+    def _load_backoff(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = self.redis_client.get(f"{self.backoff_prefix}{key}")
+            return json.loads(data) if data else None
+        except redis.RedisError as e:
+            log.warning(f"[Cache:Redis] 读取过盾失败记录失败: {e}")
+            return super()._load_backoff(key)
+
+    def _save_backoff(self, key: str, record: Dict[str, Any], ttl: int):
+        try:
+            self.redis_client.setex(f"{self.backoff_prefix}{key}", ttl, json.dumps(record))
+        except redis.RedisError as e:
+            log.warning(f"[Cache:Redis] 写入过盾失败记录失败: {e}")
+            super()._save_backoff(key, record, ttl)
+
+    def _delete_backoff(self, key: str) -> bool:
+        try:
+            return bool(self.redis_client.delete(f"{self.backoff_prefix}{key}")) | super()._delete_backoff(key)
+        except redis.RedisError as e:
+            log.warning(f"[Cache:Redis] 删除过盾失败记录失败: {e}")
+            return super()._delete_backoff(key)
+
+    def _list_backoffs(self) -> Dict[str, Dict[str, Any]]:
+        records = super()._list_backoffs()
+        try:
+            for redis_key in self.redis_client.scan_iter(match=f"{self.backoff_prefix}*"):
+                data = self.redis_client.get(redis_key)
                 if data:
-                    log.info(f"[Cache:Redis] 命中缓存: {domain}")
-                    self._record_hit()
-                    return json.loads(data)
+                    records[redis_key[len(self.backoff_prefix):]] = json.loads(data)
+        except redis.RedisError as e:
+            log.warning(f"[Cache:Redis] 读取过盾失败记录失败: {e}")
+        return records
+
+    def _solve_and_store(self, url: str, domain: str, proxy: str = None) -> Dict[str, Any]:
+        """在分布式租约保护下过盾
+
+        抢到租约的副本负责过盾并提交凭证；未抢到的副本订阅结果频道等待，
+        若持有者失败或崩溃（租约过期），则重新竞争租约。
+        """
+        deadline = time.time() + SOLVE_WAIT_TIMEOUT
+        while True:
+            try:
+                token = self._acquire_lease(domain)
+            except redis.RedisError as e:
+                log.warning(f"[Cache:Redis] 获取过盾租约失败，降级为本地过盾: {e}")
+                return super()._solve_and_store(url, domain, proxy=proxy)
+
+            if token:
+                return self._solve_with_lease(url, domain, proxy, token)
+
+            with self._lease_lock:
+                self._lease_stats["waited"] += 1
+            log.info(f"[Cache:Redis] 其他副本正在过盾，等待结果: {domain}")
+            creds = self._wait_for_remote_solve(domain, deadline)
+            if creds:
+                with self._lease_lock:
+                    self._lease_stats["remote_hits"] += 1
+                return creds
+            if time.time() >= deadline:
+                raise Exception(f"等待其他副本过盾超时 ({SOLVE_WAIT_TIMEOUT}秒): {domain}")
+
+    def _lease_stats_snapshot(self) -> Dict[str, int]:
+        """过盾租约统计：获得租约、等待其他副本、等到远端结果、被 fencing 拒绝写入的次数"""
+        with self._lease_lock:
+            return dict(self._lease_stats)
+
+    def _acquire_lease(self, domain: str) -> int:
+        lease_key, fence_key, _ = self._lease_keys(domain)
+        token = int(self._acquire_lease_script(
+            keys=[lease_key, fence_key], args=[SOLVE_LEASE_TTL * 1000]
+        ))
+        if token:
+            with self._lease_lock:
+                self._lease_stats["acquired"] += 1
+            log.info(f"[Cache:Redis] 获得过盾租约: {domain} (token={token})")
+        return token
+
+    def _solve_with_lease(self, url: str, domain: str, proxy: Optional[str], token: int) -> Dict[str, Any]:
+        lease_key, fence_key, channel = self._lease_keys(domain)
+        try:
+            creds = solve_turnstile(url, proxy=proxy)
+        except BaseException:
+            try:
+                self._abort_lease_script(keys=[lease_key], args=[token, channel])
+            except redis.RedisError as e:
+                log.error(f"[Cache:Redis] 释放过盾租约失败: {e}")
+            raise
+
+        try:
+            host, proxy = self._split_cache_key(domain)
+            creds.setdefault("host", host)
+            store_key = self._cache_key(cookie_scope(host, creds.get("cookie_domain")), proxy)
+            ttl = self._ttl_for(store_key, creds)
+            expire_at = time.time() + ttl
+            committed = self._commit_lease_script(
+                keys=[lease_key, fence_key, self._get_key(store_key), *self._index_keys()],
+                args=[token, ttl, codec.encode({**creds, "expire_at": expire_at}), channel, store_key, expire_at],
+            )
+            if committed:
+                self._invalidate_l1(store_key)
+                self._renew_proxy_pin(store_key, creds)
+                log.info(f"[Cache:Redis] 凭证已缓存: {store_key} (TTL={ttl}s, token={token})")
+            else:
+                # 租约已过期且被其他副本接手，本次结果只返回给本地调用方
+                with self._lease_lock:
+                    self._lease_stats["fenced"] += 1
+                log.warning(f"[Cache:Redis] 过盾租约已失效，放弃写入: {domain} (token={token})")
+        except redis.RedisError as e:
+            log.error(f"[Cache:Redis] 写入失败: {e}")
+            # 提交失败时租约仍被持有，尽力释放并通知等待者，否则它们要等到租约 TTL 过期才重试
+            try:
+                self._abort_lease_script(keys=[lease_key], args=[token, channel])
             except redis.RedisError as e:
-                log.error(f"[Cache:Redis] 读取失败: {e}")
+                log.error(f"[Cache:Redis] 释放过盾租约失败: {e}")
+        return creds
+
+    def _wait_for_remote_solve(self, domain: str, deadline: float) -> Optional[Dict[str, Any]]:
+        """订阅结果频道等待持有租约的副本完成过盾
+
+        Returns:
+            凭证；持有者失败、租约过期或超时时返回 None
+        """
+        lease_key, _, channel = self._lease_keys(domain)
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(channel)
+            while time.time() < deadline:
+                # 订阅后检查租约：已释放说明结果已发布（或持有者已失败/崩溃）
+                if not self.redis_client.exists(lease_key):
+                    break
+                message = pubsub.get_message(timeout=min(5.0, max(deadline - time.time(), 0.1)))
+                if message is None:
+                    continue
+                if message.get("data") == "fail":
+                    return None
+                break
+
+            # 持有者按 Cookie 作用域写入，按作用域查找（绕过 L1，其中可能仍是旧凭证）
+            host, proxy = self._split_cache_key(domain)
+            return self._lookup_credentials(host, proxy, use_l1=False)[1]
+        except redis.RedisError as e:
+            log.error(f"[Cache:Redis] 等待过盾结果失败: {e}")
+            return None
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
 
-        # 缓存无效，过盾
+    def get_credentials(self, url: str, force_refresh: bool = False, proxy: str = None) -> Dict[str, Any]:
+        host = self._extract_domain(url)
+        domain = self._cache_key(host, proxy)
+
+        if not force_refresh:
+            key, creds = self._lookup_credentials(host, proxy)
+            if creds:
+                log.info(f"[Cache:Redis] 命中缓存: {key}")
+                self._record_hit()
+                return creds
+
+        # 缓存无效，过盾（同域名并发请求合并为一次）
         self._record_miss()
         log.info(f"[Cache:Redis] 启动过盾流程: {domain}")
-        creds = solve_turnstile(url, proxy=proxy)
+        return self._solve_single_flight(url, domain, proxy=proxy)
+
+    @staticmethod
+    def _decode_credentials(data: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        try:
+            return codec.decode(data)
+        except ValueError as e:
+            log.error(f"[Cache:Redis] 凭证数据无法解析: {e}")
+            return None
+
+    def _load_credentials(self, domain: str) -> Optional[Dict[str, Any]]:
+        return self._load_many([domain])[0]
 
-        # 写入 Redis
+    def _load_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        # 各级作用域一次 MGET 读取
         try:
-            # 存储格式: {"cookies": ..., "ua": ...}
-            # 设置过期时间
-            self.redis_client.setex(
-                key,
-                self.expire_seconds,
-                json.dumps(creds)
+            values = self._data_client.mget([self._get_key(k) for k in keys])
+            return [self._decode_credentials(v) for v in values]
+        except redis.RedisError as e:
+            log.error(f"[Cache:Redis] 读取失败: {e}")
+            return [None] * len(keys)
+
+    def _store_credentials(self, domain: str, creds: Dict[str, Any]):
+        try:
+            # 存储格式: codec 编码的 {"cookies": ..., "ua": ..., "solved_at": ..., "expires_at": ..., "expire_at": ...}
+            # 过期时间按域名学习到的有效期设置
+            ttl = self._ttl_for(domain, creds)
+            expire_at = time.time() + ttl
+            self._store_script(
+                keys=[*self._index_keys(), self._get_key(domain)],
+                args=[ttl, codec.encode({**creds, "expire_at": expire_at}), domain, expire_at],
             )
-            log.info(f"[Cache:Redis] 凭证已缓存: {domain} (TTL={self.expire_seconds}s)")
+            log.info(f"[Cache:Redis] 凭证已缓存: {domain} (TTL={ttl}s)")
         except redis.RedisError as e:
             log.error(f"[Cache:Redis] 写入失败: {e}")
 
-        return creds
+    def _drop(self, members: List[str]) -> int:
+        """删除凭证及其过期索引，分批执行避免单个脚本过长"""
+        deleted = 0
+        for i in range(0, len(members), 500):
+            batch = members[i:i + 500]
+            deleted += self._drop_script(
+                keys=[*self._index_keys(), *(self._get_key(m) for m in batch)],
+                args=batch,
+            )
+        return deleted
 
     def invalidate(self, domain: str) -> bool:
-        key = self._get_key(domain)
+        # 同时清除该域名的域作用域凭证 (".domain") 以及经各代理获取的凭证 ("domain|proxy")
+        scoped = f".{domain.lstrip('.')}"
+        members = [domain, scoped]
         try:
-            return bool(self.redis_client.delete(key))
+            for pattern in (f"{domain}|*", f"{scoped}|*"):
+                members.extend(m for m, _ in self.redis_client.zscan_iter(self.expiry_key, match=pattern))
+            deleted = bool(self._drop(members))
+            self._invalidate_l1_domain(domain)
+            return deleted
         except redis.RedisError as e:
             log.error(f"[Cache:Redis] 删除失败: {e}")
             return False
 
     def invalidate_all(self) -> int:
         try:
-            keys = self.redis_client.keys(f"{self.prefix}*")
-            if keys:
-                return self.redis_client.delete(*keys)
-            return 0
+            count = self._drop(self.redis_client.zrange(self.expiry_key, 0, -1))
+            self._invalidate_l1()
+            return count
         except redis.RedisError as e:
             log.error(f"[Cache:Redis] 批量删除失败: {e}")
             return 0
 
     def cleanup_expired(self) -> int:
-        # Redis 自动处理过期，无需手动清理
-        return 0
+        # 数据键由 Redis 自动过期，这里只清理过期索引
+        try:
+            count = self._prune_script(keys=self._index_keys(), args=[time.time()])
+            if count > 0:
+                log.info(f"[Cache:Redis] 已清理过期索引: {count} 条")
+            return count
+        except redis.RedisError as e:
+            log.error(f"[Cache:Redis] 清理过期索引失败: {e}")
+            return 0
 
     def get_stats(self) -> Dict[str, Any]:
         try:
-            keys = self.redis_client.keys(f"{self.prefix}*")
+            # 一次往返读取索引计数、有效凭证与命中统计
+            now = time.time()
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zcard(self.expiry_key)
+            pipe.zrangebyscore(self.expiry_key, now, "+inf")
+            pipe.hgetall(self.stats_key)
+            total, domains, stats_data = pipe.execute()
 
-            # 获取命中/未命中统计
-            stats_data = self.redis_client.hgetall(self.stats_key)
-            hits = int(stats_data.get("hits", 0))
-            misses = int(stats_data.get("misses", 0))
+            # 加上本副本尚未写入 Redis 的增量
+            pending = self._counters.pending()
+            hits = int(stats_data.get("hits", 0)) + pending["hits"]
+            misses = int(stats_data.get("misses", 0)) + pending["misses"]
             total_requests = hits + misses
             hit_rate = round(hits / total_requests * 100, 1) if total_requests > 0 else 0
 
-            # 计算存储大小（估算）
-            size_bytes = 0
-            for key in keys:
-                try:
-                    data = self.redis_client.get(key)
-                    if data:
-                        size_bytes += len(data.encode('utf-8') if isinstance(data, str) else data)
-                except:
-                    pass
-
             return {
                 "type": "redis",
-                "total": len(keys),
-                "valid": len(keys),
-                "expired": 0,
+                "codec": codec.describe(),
+                "total": total,
+                "valid": len(domains),
+                "expired": total - len(domains),
                 "hits": hits,
                 "misses": misses,
                 "hit_rate": hit_rate,
-                "size_bytes": size_bytes,
-                "domains": [k.replace(self.prefix, "") for k in keys],
+                "size_bytes": int(stats_data.get("size_bytes", 0)),
+                "domains": domains,
+                "single_flight": self._single_flight_stats(),
+                "solve_lease": self._lease_stats_snapshot(),
+                "lifetimes": self.get_lifetime_stats(),
+                "solve_backoff": self.get_backoff_stats(),
+                "l1": self.get_l1_stats(),
             }
         except redis.RedisError as e:
             log.error(f"[Cache:Redis] 获取统计失败: {e}")
@@ -385,14 +1399,10 @@ class RedisCache(BaseCache):
     def get_expiring_domains(self, threshold_seconds: int = 300) -> List[str]:
         """获取即将过期的域名列表（TTL 小于阈值）"""
         try:
-            keys = self.redis_client.keys(f"{self.prefix}*")
-            expiring = []
-            for key in keys:
-                ttl = self.redis_client.ttl(key)
-                if 0 < ttl < threshold_seconds:
-                    domain = key.replace(self.prefix, "")
-                    expiring.append(domain)
-            return expiring
+            now = time.time()
+            return self.redis_client.zrangebyscore(
+                self.expiry_key, f"({now}", f"({now + threshold_seconds}"
+            )
         except redis.RedisError as e:
             log.error(f"[Cache:Redis] 获取即将过期域名失败: {e}")
             return []
@@ -400,16 +1410,9 @@ class RedisCache(BaseCache):
     def refresh_credential(self, domain: str) -> bool:
         """主动刷新指定域名的凭证"""
         try:
-            url = f"https://{domain}/"
+            url, host_key, proxy = self._refresh_target(domain)
             log.info(f"[Cache:Redis] 主动刷新凭证: {domain}")
-            creds = solve_turnstile(url)
-
-            key = self._get_key(domain)
-            self.redis_client.setex(
-                key,
-                self.expire_seconds,
-                json.dumps(creds)
-            )
+            self._solve_single_flight(url, host_key, proxy=proxy)
             log.info(f"[Cache:Redis] 凭证刷新成功: {domain}")
             return True
         except Exception as e:
@@ -436,20 +1439,20 @@ def create_cache() -> BaseCache:
     
     if redis_url and "localhost" not in redis_url and "127.0.0.1" not in redis_url:
         # 生产环境通常不会是 localhost，或者我们在 docker-compose 里设置为 redis://redis:6379
-        return RedisCache(expire, redis_url)
+        return RedisCache(expire, redis_url).start()
     
     # 在 Docker 环境下，REDIS_URL 是 redis://redis:6379 (hostname 不含 localhost)
     if redis_url and "redis" in redis_url: 
-         return RedisCache(expire, redis_url)
+         return RedisCache(expire, redis_url).start()
 
     # 默认回退到 SQLite (本地开发方便)
     # 但由于本次任务明确是迁移到 Redis，我们强制优先尝试 Redis
     try:
         if redis_url:
             cache = RedisCache(expire, redis_url)
-            # 测试连接
+            # 测试连接，通过后才启动后台线程
             cache.redis_client.ping()
-            return cache
+            return cache.start()
     except Exception as e:
         log.warning(f"[Cache] Redis 连接失败 ({e})，降级到 SQLite")
 
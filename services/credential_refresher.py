@@ -0,0 +1,105 @@
+"""
+凭证提前刷新 - 在凭证过期前按热度并发重新过盾
+
+- 即将过期的凭证按域名近期请求速率 (domain_intel) 排序，热门域名优先
+- 在浏览器预算内并发刷新，预算取配置并发数与浏览器池剩余标签页容量的较小值
+- 沿用凭证原本的代理（缓存键 "domain|proxy"），保证 cf_clearance 与出口 IP 一致
+- 新凭证直接覆盖旧凭证，刷新期间旧凭证保持有效，请求不会遇到冷未命中
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from config import settings
+from core.browser_pool import browser_pool
+from services.cache_service import credential_cache
+from services.domain_intelligence import domain_intel
+from utils.domain_scope import scope_host
+from utils.logger import log
+
+
+class CredentialRefresher:
+    """按热度排序、预算内并发的凭证提前刷新"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "rounds": 0,
+            "refreshed": 0,
+            "failed": 0,
+            "skipped_cold": 0,
+            "deferred": 0,
+        }
+        self._last_round: Dict[str, Any] = {}
+
+    def _browser_budget(self) -> int:
+        """本轮可占用的浏览器标签页数"""
+        pool = browser_pool.get_stats()
+        free_tabs = pool["max_size"] * pool["tabs_per_instance"] - pool["tabs_in_use"]
+        return max(1, min(settings.REFRESH_AHEAD_CONCURRENCY, free_tabs))
+
+    def rank(self, keys: List[str]) -> List[tuple]:
+        """按近期请求速率降序排列缓存键，返回 [(key, rate)]"""
+        ranked = []
+        for key in keys:
+            scope, _ = credential_cache._split_cache_key(key)
+            # 域作用域凭证 (.site.com) 服务所有子域名，热度按子域名合计
+            shared = scope.startswith(".")
+            ranked.append((key, domain_intel.get_request_rate(scope_host(scope), include_subdomains=shared)))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+    def run_once(self) -> Dict[str, int]:
+        """执行一轮提前刷新"""
+        result = {"expiring": 0, "refreshed": 0, "failed": 0, "skipped_cold": 0, "deferred": 0}
+        if not settings.AUTO_REFRESH_CREDENTIALS:
+            return result
+
+        keys = credential_cache.get_expiring_domains(threshold_seconds=settings.REFRESH_AHEAD_THRESHOLD)
+        result["expiring"] = len(keys)
+        if not keys:
+            return result
+
+        ranked = self.rank(keys)
+        hot = [(key, rate) for key, rate in ranked if rate >= settings.REFRESH_AHEAD_MIN_RATE]
+        result["skipped_cold"] = len(ranked) - len(hot)
+        batch = hot[:settings.REFRESH_AHEAD_MAX_PER_ROUND]
+        result["deferred"] = len(hot) - len(batch)
+
+        budget = self._browser_budget()
+        # 排队中的刷新在作业超时前未开始则放弃，留给下一轮
+        deadline = time.time() + settings.WATCHDOG_REFRESH_TIMEOUT * 0.8
+        log.info(
+            f"[Refresh] {len(keys)} 个凭证即将过期，本轮刷新 {len(batch)} 个 (并发 {budget})，"
+            f"最热: {', '.join(f'{k}={r:.1f}/min' for k, r in batch[:3])}"
+        )
+
+        def refresh(key: str, rate: float) -> str:
+            if time.time() >= deadline:
+                return "deferred"
+            if credential_cache.refresh_credential(key):
+                log.info(f"[Refresh] 凭证已提前刷新: {key} ({rate:.1f}/min)")
+                return "refreshed"
+            log.warning(f"[Refresh] 凭证刷新失败: {key}")
+            return "failed"
+
+        with ThreadPoolExecutor(max_workers=budget, thread_name_prefix="refresh") as executor:
+            for outcome in executor.map(lambda item: refresh(*item), batch):
+                result[outcome] += 1
+
+        with self._lock:
+            self._stats["rounds"] += 1
+            for name in ("refreshed", "failed", "skipped_cold", "deferred"):
+                self._stats[name] += result[name]
+            self._last_round = {**result, "budget": budget, "finished_at": time.time()}
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "last_round": dict(self._last_round)}
+
+
+# 全局单例
+credential_refresher = CredentialRefresher()
@@ -4,15 +4,18 @@
 跟踪各域名的请求成功率，自动判断最佳访问策略：
 - 记录 Cookie 模式和 Browser 模式的成功/失败次数
 - 当 Cookie 模式失败率过高时，自动推荐切换到 Browser 模式
+- 记录域名是否受挑战保护（直连探测结果），未受保护的域名跳过浏览器过盾
+- 按指数衰减统计近期请求速率，供凭证提前刷新排序
 - 支持统计数据导出和手动重置
 """
 
 import json
+import math
 import time
 import threading
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass, field, asdict
-from urllib.parse import urlparse
+from utils.domain_scope import url_host
 
 from utils.logger import log
 
@@ -20,6 +23,7 @@ from utils.logger import log
 FAILURE_THRESHOLD = 0.5  # 失败率超过 50% 则推荐切换模式
 MIN_SAMPLES = 5  # 至少需要 5 次请求才做判断
 STATS_EXPIRE_HOURS = 24  # 统计数据保留 24 小时
+RATE_WINDOW_SECONDS = 600  # 请求速率衰减时间常数（秒），越早的请求权重越低
 
 
 @dataclass
@@ -32,6 +36,24 @@ class DomainStats:
     browser_failure: int = 0
     last_updated: float = field(default_factory=time.time)
     recommended_mode: str = "cookie"  # cookie 或 browser
+    protection: str = "unknown"  # unknown / unprotected / protected (直连探测结论)
+    rate_score: float = 0.0  # 指数衰减的请求计数
+    rate_updated_at: float = 0.0
+
+    def decayed_score(self, now: float) -> float:
+        """按时间衰减后的请求计数"""
+        if self.rate_score <= 0:
+            return 0.0
+        return self.rate_score * math.exp(-(now - self.rate_updated_at) / RATE_WINDOW_SECONDS)
+
+    def hit(self, now: float):
+        """计入一次请求"""
+        self.rate_score = self.decayed_score(now) + 1.0
+        self.rate_updated_at = now
+
+    def request_rate(self, now: float) -> float:
+        """近期请求速率（次/分钟）"""
+        return self.decayed_score(now) * 60 / RATE_WINDOW_SECONDS
 
     @property
     def cookie_total(self) -> int:
@@ -78,8 +100,14 @@ class DomainIntelligence:
         log.info("[DomainIntel] 域名智能学习服务已初始化")
 
     def _extract_domain(self, url: str) -> str:
-        """从 URL 提取域名"""
-        return urlparse(url).netloc
+        """从 URL 提取域名：与凭证缓存、提前刷新共用 url_host，按主机名（不含端口）统计"""
+        return url_host(url) if url else ""
+
+    def _get_or_create(self, domain: str) -> DomainStats:
+        """获取域名统计，不存在则创建（调用方需持有锁）"""
+        if domain not in self._stats:
+            self._stats[domain] = DomainStats(domain=domain)
+        return self._stats[domain]
 
     def record_request(self, url: str, mode: str, success: bool):
         """记录请求结果
@@ -94,11 +122,9 @@ class DomainIntelligence:
             return
 
         with self._lock:
-            if domain not in self._stats:
-                self._stats[domain] = DomainStats(domain=domain)
-
-            stats = self._stats[domain]
+            stats = self._get_or_create(domain)
             stats.last_updated = time.time()
+            stats.hit(stats.last_updated)
 
             if mode == "cookie":
                 if success:
@@ -133,6 +159,52 @@ class DomainIntelligence:
         """判断是否应该使用浏览器模式"""
         return self.get_recommended_mode(url) == "browser"
 
+    def get_request_rate(self, domain: str, include_subdomains: bool = False) -> float:
+        """获取域名近期请求速率（次/分钟），无记录返回 0
+
+        Args:
+            domain: 主机名，与凭证缓存键中的域名部分一致
+            include_subdomains: 是否累加所有子域名（用于子域名共享的域作用域凭证）
+        """
+        domain = self._extract_domain(domain)
+        now = time.time()
+        with self._lock:
+            if not include_subdomains:
+                stats = self._stats.get(domain)
+                return stats.request_rate(now) if stats else 0.0
+            suffix = "." + domain
+            total = 0.0
+            for host, stats in self._stats.items():
+                if host == domain or host.endswith(suffix):
+                    total += stats.request_rate(now)
+            return total
+
+    def get_protection(self, url: str) -> str:
+        """获取域名的挑战保护结论: unknown / unprotected / protected"""
+        domain = self._extract_domain(url)
+        with self._lock:
+            if domain in self._stats:
+                return self._stats[domain].protection
+        return "unknown"
+
+    def set_protection(self, url: str, protection: str):
+        """记录直连探测结论
+
+        Args:
+            url: 请求的 URL
+            protection: "unprotected"（直连未遇到挑战）或 "protected"（遇到挑战）
+        """
+        domain = self._extract_domain(url)
+        if not domain:
+            return
+
+        with self._lock:
+            stats = self._get_or_create(domain)
+            stats.last_updated = time.time()
+            if stats.protection != protection:
+                log.info(f"[DomainIntel] {domain} 挑战保护状态: {stats.protection} -> {protection}")
+                stats.protection = protection
+
     def get_domain_stats(self, url: str) -> Optional[Dict[str, Any]]:
         """获取指定域名的统计数据"""
         domain = self._extract_domain(url)
@@ -154,6 +226,8 @@ class DomainIntelligence:
                         "failure_rate": round(stats.browser_failure_rate, 3),
                     },
                     "recommended_mode": stats.recommended_mode,
+                    "protection": stats.protection,
+                    "request_rate": round(stats.request_rate(time.time()), 2),
                     "last_updated": stats.last_updated,
                 }
         return None
@@ -161,6 +235,7 @@ class DomainIntelligence:
     def get_all_stats(self) -> List[Dict[str, Any]]:
         """获取所有域名的统计数据"""
         with self._lock:
+            now = time.time()
             result = []
             for domain, stats in self._stats.items():
                 result.append({
@@ -171,6 +246,8 @@ class DomainIntelligence:
                     "browser_success": stats.browser_success,
                     "browser_failure": stats.browser_failure,
                     "recommended_mode": stats.recommended_mode,
+                    "protection": stats.protection,
+                    "request_rate": round(stats.request_rate(now), 2),
                 })
             return sorted(result, key=lambda x: x["cookie_failure"] + x["browser_failure"], reverse=True)
 
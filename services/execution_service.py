@@ -2,6 +2,7 @@
 规则执行服务 - 根据规则配置执行采集任务
 """
 from typing import Dict, Any
+from urllib.parse import urlparse
 from fastapi.responses import JSONResponse, Response
 
 from services.proxy_service import proxy_request
@@ -16,8 +17,8 @@ def _get_proxy_for_rule(rule: ScrapeConfig) -> str:
     proxy_mode = getattr(rule, "proxy_mode", "none")
 
     if proxy_mode == "pool":
-        # 从代理池获取
-        proxy = proxy_manager.get_proxy()
+        # 从代理池获取（同一域名固定出口，保证凭证与 IP 一致）
+        proxy = proxy_manager.get_sticky_proxy(urlparse(rule.target_url).netloc)
         if proxy:
             log.info(f"[Execution] 使用代理池: {proxy}")
             return proxy
@@ -99,6 +100,7 @@ def execute_rule_proxy(rule: ScrapeConfig) -> Dict[str, Any]:
             proxy=proxy,
             body_type=body_type,
             wait_for=wait_for,
+            block_profile=getattr(rule, "block_profile", None),
         )
 
         # 获取响应文本
@@ -179,6 +181,7 @@ def execute_rule_raw(rule: ScrapeConfig, test_mode: bool = False):
             proxy=proxy,
             body_type=body_type,
             wait_for=wait_for,
+            block_profile=getattr(rule, "block_profile", None),
         )
 
         content_type = resp.headers.get("Content-Type", "application/octet-stream")
@@ -242,6 +245,7 @@ def execute_rule_reader(rule: ScrapeConfig, test_mode: bool = False):
             proxy=proxy,
             body_type=body_type,
             wait_for=wait_for,
+            block_profile=getattr(rule, "block_profile", None),
         )
 
         # 测试模式返回 JSON 摘要
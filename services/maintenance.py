@@ -0,0 +1,185 @@
+"""
+后台维护调度 - 在工作线程中运行看门狗任务，不阻塞事件循环
+
+每个维护任务是独立的定时作业，拥有各自的执行间隔与超时:
+- 作业在专用线程池中执行，事件循环只负责调度
+- 超时的作业不会被强制终止（线程无法取消），但在其结束前不会再次调度
+- 事件循环延迟持续采样，每次作业记录执行前与执行期间的最大延迟
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from utils.logger import log
+
+# 事件循环延迟采样间隔（秒）
+LAG_SAMPLE_INTERVAL = 0.5
+# 作业执行前延迟取最近多少秒的样本
+LAG_WINDOW_SECONDS = 10
+
+
+class MaintenanceJob:
+    """单个维护作业及其运行统计"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        interval: Union[float, Callable[[], float]],
+        timeout: float,
+    ):
+        self.name = name
+        self.func = func
+        # 可传入函数，每轮重新读取（支持运行时修改配置）
+        self._interval = interval
+        self.timeout = timeout
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.last_started_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self.lag_before_ms: Optional[float] = None
+        self.lag_during_ms: Optional[float] = None
+
+    @property
+    def interval(self) -> float:
+        return self._interval() if callable(self._interval) else self._interval
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "timeout": self.timeout,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "last_started_at": self.last_started_at,
+            "last_duration_ms": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "lag_before_ms": self.lag_before_ms,
+            "lag_during_ms": self.lag_during_ms,
+        }
+
+
+class MaintenanceScheduler:
+    """维护作业调度器"""
+
+    def __init__(self):
+        self._jobs: Dict[str, MaintenanceJob] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # (采样时间, 延迟毫秒)
+        self._lag_samples: deque = deque(maxlen=int(600 / LAG_SAMPLE_INTERVAL))
+        self._lag_max_ms = 0.0
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        interval: Union[float, Callable[[], float]],
+        timeout: float,
+    ):
+        """注册作业，需在 start() 之前调用"""
+        self._jobs[name] = MaintenanceJob(name, func, interval, timeout)
+
+    def start(self):
+        """在当前事件循环中启动延迟监控与所有作业"""
+        # 每个作业一个线程，慢作业不会占住其他作业，也不占用 asyncio.to_thread 的默认线程池
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self._jobs)), thread_name_prefix="maintenance"
+        )
+        self._tasks.append(asyncio.create_task(self._monitor_lag()))
+        for job in self._jobs.values():
+            self._tasks.append(asyncio.create_task(self._run_job_loop(job)))
+        log.info(f"[Maintenance] 已启动 {len(self._jobs)} 个维护作业: {', '.join(self._jobs)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _monitor_lag(self):
+        """定时 sleep 并测量实际唤醒的滞后，即事件循环延迟"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LAG_SAMPLE_INTERVAL
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self._lag_samples.append((time.time(), lag_ms))
+            self._lag_max_ms = max(self._lag_max_ms, lag_ms)
+            if lag_ms > 1000:
+                log.warning(f"[Maintenance] 事件循环延迟 {lag_ms:.0f}ms")
+
+    def _max_lag_since(self, since: float) -> float:
+        # 作业线程中也会调用，先整体复制（原子操作）避免迭代时被采样协程修改
+        samples = list(self._lag_samples)
+        return round(max((lag for ts, lag in samples if ts >= since), default=0.0), 1)
+
+    async def _run_job_loop(self, job: MaintenanceJob):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(job.interval)
+            if job.running:
+                # 上次执行超时后仍在线程中运行，跳过本轮
+                log.warning(f"[Maintenance] 作业 {job.name} 上次执行尚未结束，跳过本轮")
+                continue
+
+            job.running = True
+            job.last_started_at = time.time()
+            job.lag_before_ms = self._max_lag_since(job.last_started_at - LAG_WINDOW_SECONDS)
+            future = loop.run_in_executor(self._executor, self._invoke, job)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=job.timeout)
+            except asyncio.TimeoutError:
+                job.timeouts += 1
+                log.warning(f"[Maintenance] 作业 {job.name} 超时 ({job.timeout}s)，等待其在后台结束")
+            except Exception as e:
+                log.error(f"[Maintenance] 作业 {job.name} 调度异常: {e}")
+
+    def _invoke(self, job: MaintenanceJob):
+        """在工作线程中执行作业"""
+        start = time.time()
+        try:
+            job.last_result = job.func()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            log.error(f"[Maintenance] 作业 {job.name} 异常: {e}")
+        finally:
+            job.runs += 1
+            job.last_duration = time.time() - start
+            job.lag_during_ms = self._max_lag_since(start)
+            job.running = False
+
+    def get_status(self) -> Dict[str, Any]:
+        recent = self._max_lag_since(time.time() - LAG_WINDOW_SECONDS)
+        current = self._lag_samples[-1][1] if self._lag_samples else 0.0
+        return {
+            "event_loop_lag_ms": {
+                "current": round(current, 1),
+                "recent_max": recent,
+                "max": round(self._lag_max_ms, 1),
+            },
+            "jobs": [job.to_dict() for job in self._jobs.values()],
+        }
+
+
+# 全局调度器
+maintenance_scheduler = MaintenanceScheduler()
@@ -4,13 +4,23 @@
 """
 import random
 import os
-from typing import Optional, List
+import threading
+import time
+from typing import Dict, Optional, List, Tuple
 from config import settings
+from utils.domain_scope import registrable_domain, url_host
 from utils.logger import log
 
+# 过期绑定的清理间隔（秒）
+PIN_PRUNE_INTERVAL = 60
+
 class ProxyManager:
     def __init__(self):
         self._proxies: List[str] = []
+        # 可注册域名 -> (代理, 过期时间)：凭证有效期内固定出口代理，保证 cf_clearance 与 IP 一致
+        self._pins: Dict[str, Tuple[str, float]] = {}
+        self._pin_lock = threading.Lock()
+        self._next_prune = 0.0
         self.reload()
 
     def reload(self):
@@ -50,6 +60,79 @@ class ProxyManager:
             return None
         return random.choice(self._proxies)
 
+    def _pin_key(self, domain: str) -> str:
+        """绑定键：可注册域名
+
+        与凭证缓存的作用域一致 —— 域 Cookie 覆盖可注册域名下的所有主机，
+        同一可注册域名的主机（含不同端口）必须走同一出口 IP。
+        """
+        return registrable_domain(url_host(domain))
+
+    def _prune_pins(self, now: float):
+        """清理过期绑定（调用方持有 _pin_lock）"""
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PIN_PRUNE_INTERVAL
+        self._pins = {d: v for d, v in self._pins.items() if v[1] > now}
+
+    def get_sticky_proxy(self, domain: str, ttl: Optional[int] = None) -> Optional[str]:
+        """获取与域名绑定的代理 (粘性会话)
+
+        同一可注册域名在绑定有效期内始终返回同一个代理，使过盾和后续 Cookie 复用走同一出口 IP。
+        绑定过期或代理已被移除时重新随机选择并绑定。
+
+        Args:
+            domain: 目标 URL、域名或 netloc
+            ttl: 绑定时长 (秒)，默认与凭证有效期 COOKIE_EXPIRE_SECONDS 一致
+        """
+        key = self._pin_key(domain)
+        now = time.time()
+        with self._pin_lock:
+            self._prune_pins(now)
+            pinned = self._pins.get(key)
+            if pinned and pinned[1] > now and pinned[0] in self._proxies:
+                return pinned[0]
+
+            proxy = self.get_proxy()
+            if proxy:
+                expire = ttl if ttl is not None else settings.COOKIE_EXPIRE_SECONDS
+                self._pins[key] = (proxy, now + expire)
+                log.info(f"[ProxyManager] Pinned {key} -> {proxy} ({expire}s)")
+            else:
+                self._pins.pop(key, None)
+            return proxy
+
+    def renew_pin(self, domain: str, proxy: Optional[str], ttl: int) -> bool:
+        """凭证写入/刷新后按其有效期延长绑定，凭证有效期间不轮换出口
+
+        只延长绑定到同一代理的记录；无有效绑定时（如重启后）为池内代理重新绑定。
+        """
+        if not proxy:
+            return False
+        key = self._pin_key(domain)
+        now = time.time()
+        with self._pin_lock:
+            if proxy not in self._proxies:
+                return False
+            pinned = self._pins.get(key)
+            if pinned and pinned[1] > now and pinned[0] != proxy:
+                return False
+            expire_at = max(pinned[1] if pinned and pinned[0] == proxy else 0, now + ttl)
+            self._pins[key] = (proxy, expire_at)
+            return True
+
+    def unpin(self, domain: str) -> bool:
+        """解除域名与代理的绑定"""
+        with self._pin_lock:
+            return self._pins.pop(self._pin_key(domain), None) is not None
+
+    def get_pins(self) -> Dict[str, str]:
+        """获取当前有效的域名-代理绑定"""
+        now = time.time()
+        with self._pin_lock:
+            self._prune_pins(now)
+            return {d: p for d, (p, exp) in self._pins.items() if exp > now}
+
     def get_all(self) -> List[str]:
         return self._proxies
 
@@ -72,6 +155,8 @@ class ProxyManager:
         normalized = self._normalize(proxy.strip())
         if normalized in self._proxies:
             self._proxies.remove(normalized)
+            with self._pin_lock:
+                self._pins = {d: v for d, v in self._pins.items() if v[0] != normalized}
             self._save_to_file()
             log.info(f"[ProxyManager] Removed proxy: {normalized}")
             return True
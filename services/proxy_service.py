@@ -29,11 +29,18 @@
 
     # 指定使用浏览器直读
     resp = proxy_request(url, method="GET", headers={}, fetcher="browser")
+
+    # 异步路由中使用协程版本
+    resp = await proxy_request_async(url, method="GET", headers={})
 """
 
-from typing import Any, Dict, Optional, Union
+import asyncio
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
 
+from config import settings
 from core.fetchers import CookieFetcher, BrowserFetcher, FetchResponse
+from services.cache_service import SolveBackoffError
 from services.domain_intelligence import domain_intel
 from utils.logger import log
 
@@ -129,6 +136,7 @@ def proxy_request(
     proxy: Optional[str] = None,
     body_type: Optional[str] = None,
     wait_for: Optional[str] = None,
+    block_profile: Optional[str] = None,
 ) -> Union[FetchResponse, Any]:
     """代理请求核心接口
 
@@ -145,49 +153,14 @@ def proxy_request(
         proxy: 代理地址
         body_type: 请求体类型 ("form" / "json" / "raw")，用于设置 Content-Type
         wait_for: 浏览器模式下等待指定元素出现
+        block_profile: 浏览器模式资源拦截档位 (off / lite / strict)，默认按域名/全局配置
 
     Returns:
         FetchResponse: 响应对象
     """
     headers = headers or {}
-
-    # 解析域名
-    from urllib.parse import urlparse
-    hostname = urlparse(url).hostname or ""
-
-    # 自动检测编码（如果未指定）
-    if data_encoding is None and data and method.upper() in ["POST", "PUT", "PATCH"]:
-        from config import get_encoding_for_domain
-        data_encoding = get_encoding_for_domain(hostname)
-        if data_encoding:
-            log.info(f"[ProxyService] 自动检测编码: {hostname} -> {data_encoding}")
-
-    # 选择 Fetcher
-    if fetcher:
-        # 显式指定 fetcher，但代理模式下 cookie 改用 browser（TLS 指纹不一致问题）
-        if proxy and fetcher == "cookie":
-            # 使用代理时，直接用 BrowserFetcher（避免 TLS 指纹不一致导致的失败）
-            selected_fetcher = _browser_fetcher
-            use_fallback = False
-            log.info(f"[ProxyService] 代理模式下 cookie fetcher 改用 BrowserFetcher")
-        else:
-            selected_fetcher = get_fetcher(fetcher)
-            # cookie 模式仍支持自动降级，browser 模式不降级
-            use_fallback = auto_fallback and fetcher == "cookie"
-    elif proxy:
-        # 使用代理时，直接用 BrowserFetcher（避免 TLS 指纹不一致导致的失败）
-        selected_fetcher = _browser_fetcher
-        use_fallback = False
-        log.info(f"[ProxyService] 使用代理模式，直接使用 BrowserFetcher")
-    elif _should_use_browser(hostname, url):
-        # 域名白名单或智能学习匹配，直接使用浏览器
-        selected_fetcher = _browser_fetcher
-        use_fallback = False
-        log.info(f"[ProxyService] 域名 {hostname} 使用浏览器模式")
-    else:
-        # 默认使用 Cookie 方式，支持自动降级
-        selected_fetcher = _default_fetcher
-        use_fallback = auto_fallback
+    data_encoding = _detect_data_encoding(url, method, data, data_encoding)
+    selected_fetcher, use_fallback = _select_fetcher(url, fetcher, proxy, auto_fallback)
 
     log.info(f"[ProxyService] 使用 {selected_fetcher.name} 处理请求: {url}")
 
@@ -206,6 +179,7 @@ def proxy_request(
             proxy=proxy,
             body_type=body_type,
             wait_for=wait_for,
+            block_profile=block_profile,
         )
 
         # 检查是否被拦截（即使返回了响应）
@@ -213,7 +187,9 @@ def proxy_request(
             log.warning(f"[ProxyService] CookieFetcher 返回被拦截，降级到 BrowserFetcher")
             # 记录 Cookie 模式失败
             domain_intel.record_request(url, "cookie", success=False)
-            fallback_response = _fallback_to_browser(url, method, headers, data, json, proxy=proxy)
+            fallback_response = _fallback_to_browser(
+                url, method, headers, data, json, proxy=proxy, block_profile=block_profile
+            )
             # 记录 Browser 模式结果
             is_success = not _is_response_blocked(fallback_response)
             domain_intel.record_request(url, "browser", success=is_success)
@@ -223,6 +199,9 @@ def proxy_request(
         domain_intel.record_request(url, used_mode, success=True)
         return response
 
+    except SolveBackoffError:
+        # 域名处于过盾失败回避期，浏览器降级同样会失败，直接返回
+        raise
     except Exception as e:
         # 记录失败
         domain_intel.record_request(url, used_mode, success=False)
@@ -231,7 +210,9 @@ def proxy_request(
         if use_fallback:
             log.warning(f"[ProxyService] CookieFetcher 异常: {e}，降级到 BrowserFetcher")
             try:
-                fallback_response = _fallback_to_browser(url, method, headers, data, json, proxy=proxy)
+                fallback_response = _fallback_to_browser(
+                    url, method, headers, data, json, proxy=proxy, block_profile=block_profile
+                )
                 # 记录 Browser 模式结果
                 is_success = not _is_response_blocked(fallback_response)
                 domain_intel.record_request(url, "browser", success=is_success)
@@ -242,6 +223,134 @@ def proxy_request(
         raise
 
 
+async def proxy_request_async(
+    url: str,
+    method: str = "GET",
+    headers: Optional[Dict[str, str]] = None,
+    data: Optional[Dict[str, Any]] = None,
+    json: Optional[Dict[str, Any]] = None,
+    fetcher: Optional[str] = None,
+    data_encoding: Optional[str] = None,
+    auto_fallback: bool = True,
+    proxy: Optional[str] = None,
+    body_type: Optional[str] = None,
+    wait_for: Optional[str] = None,
+    block_profile: Optional[str] = None,
+) -> Union[FetchResponse, Any]:
+    """proxy_request() 的协程版本
+
+    Cookie 模式走 CookieFetcher.fetch_async（复用 AsyncSession 连接池，不占线程）；
+    浏览器模式及降级仍是阻塞操作，放到线程中执行。参数与返回值同 proxy_request。
+    """
+    headers = headers or {}
+    data_encoding = _detect_data_encoding(url, method, data, data_encoding)
+    selected_fetcher, use_fallback = _select_fetcher(url, fetcher, proxy, auto_fallback)
+
+    log.info(f"[ProxyService] 使用 {selected_fetcher.name} 异步处理请求: {url}")
+
+    used_mode = "browser" if selected_fetcher == _browser_fetcher else "cookie"
+    fetch_kwargs = dict(
+        url=url,
+        method=method,
+        headers=headers,
+        data=data,
+        json=json,
+        data_encoding=data_encoding,
+        proxy=proxy,
+        body_type=body_type,
+        wait_for=wait_for,
+        block_profile=block_profile,
+    )
+
+    try:
+        if hasattr(selected_fetcher, "fetch_async"):
+            response = await selected_fetcher.fetch_async(**fetch_kwargs)
+        else:
+            response = await asyncio.to_thread(selected_fetcher.fetch, **fetch_kwargs)
+
+        if use_fallback and _is_response_blocked(response):
+            log.warning(f"[ProxyService] CookieFetcher 返回被拦截，降级到 BrowserFetcher")
+            domain_intel.record_request(url, "cookie", success=False)
+            fallback_response = await asyncio.to_thread(
+                _fallback_to_browser, url, method, headers, data, json,
+                proxy=proxy, block_profile=block_profile,
+            )
+            is_success = not _is_response_blocked(fallback_response)
+            domain_intel.record_request(url, "browser", success=is_success)
+            return fallback_response
+
+        domain_intel.record_request(url, used_mode, success=True)
+        return response
+
+    except SolveBackoffError:
+        raise
+    except Exception as e:
+        domain_intel.record_request(url, used_mode, success=False)
+
+        if use_fallback:
+            log.warning(f"[ProxyService] CookieFetcher 异常: {e}，降级到 BrowserFetcher")
+            try:
+                fallback_response = await asyncio.to_thread(
+                    _fallback_to_browser, url, method, headers, data, json,
+                    proxy=proxy, block_profile=block_profile,
+                )
+                is_success = not _is_response_blocked(fallback_response)
+                domain_intel.record_request(url, "browser", success=is_success)
+                return fallback_response
+            except Exception as fallback_e:
+                domain_intel.record_request(url, "browser", success=False)
+                raise fallback_e
+        raise
+
+
+def _detect_data_encoding(
+    url: str, method: str, data: Optional[Dict[str, Any]], data_encoding: Optional[str]
+) -> Optional[str]:
+    """自动检测 POST data 编码（如果未指定）"""
+    if data_encoding is None and data and method.upper() in ["POST", "PUT", "PATCH"]:
+        from config import get_encoding_for_domain
+        hostname = urlparse(url).hostname or ""
+        data_encoding = get_encoding_for_domain(hostname)
+        if data_encoding:
+            log.info(f"[ProxyService] 自动检测编码: {hostname} -> {data_encoding}")
+    return data_encoding
+
+
+def _select_fetcher(
+    url: str, fetcher: Optional[str], proxy: Optional[str], auto_fallback: bool
+) -> Tuple[Any, bool]:
+    """选择 Fetcher
+
+    Returns:
+        (selected_fetcher, use_fallback)
+    """
+    hostname = urlparse(url).hostname or ""
+
+    # 凭证按 (域名, 出口代理) 缓存后，代理请求也可以复用 Cookie；
+    # 关闭 PROXY_COOKIE_MODE 时恢复旧行为：代理请求直接使用 BrowserFetcher
+    force_browser_for_proxy = bool(proxy) and not settings.PROXY_COOKIE_MODE
+
+    if fetcher:
+        # 显式指定 fetcher，但代理模式下 cookie 改用 browser（TLS 指纹不一致问题）
+        if force_browser_for_proxy and fetcher == "cookie":
+            # 使用代理时，直接用 BrowserFetcher（避免 TLS 指纹不一致导致的失败）
+            log.info(f"[ProxyService] 代理模式下 cookie fetcher 改用 BrowserFetcher")
+            return _browser_fetcher, False
+        # cookie 模式仍支持自动降级，browser 模式不降级
+        return get_fetcher(fetcher), auto_fallback and fetcher == "cookie"
+    elif force_browser_for_proxy:
+        # 使用代理时，直接用 BrowserFetcher（避免 TLS 指纹不一致导致的失败）
+        log.info(f"[ProxyService] 使用代理模式，直接使用 BrowserFetcher")
+        return _browser_fetcher, False
+    elif _should_use_browser(hostname, url):
+        # 域名白名单或智能学习匹配，直接使用浏览器
+        log.info(f"[ProxyService] 域名 {hostname} 使用浏览器模式")
+        return _browser_fetcher, False
+
+    # 默认使用 Cookie 方式，支持自动降级
+    return _default_fetcher, auto_fallback
+
+
 def _is_response_blocked(resp: FetchResponse) -> bool:
     """检查响应是否被拦截"""
     if resp.status_code in [403, 503, 429]:
@@ -269,6 +378,7 @@ def _fallback_to_browser(
     data: Optional[Dict[str, Any]],
     json: Optional[Dict[str, Any]],
     proxy: Optional[str] = None,
+    block_profile: Optional[str] = None,
 ) -> FetchResponse:
     """降级到浏览器直读
 
@@ -282,6 +392,7 @@ def _fallback_to_browser(
         headers=headers or {},
         data=data,
         proxy=proxy,
+        block_profile=block_profile,
     )
 
 
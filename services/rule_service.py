@@ -1,11 +1,17 @@
 
 """
 规则服务 - 管理爬虫规则
+
+已解析的规则缓存在进程内，并预编译 target_url / body / 请求头中的 {param} 占位符；
+规则创建、更新、删除时通过 Redis 广播通知所有副本逐出缓存。
 """
 import json
+import re
+import threading
 import uuid
 import time
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
 from pydantic import BaseModel, Field
 import redis
 
@@ -20,6 +26,7 @@ class ScrapeConfig(BaseModel):
     selectors: Optional[Dict[str, str]] = Field(default_factory=dict, description="CSS选择器映射")
     mode: str = "cookie"  # cookie 或 browser
     wait_for: Optional[str] = None  # 仅 browser 模式有效
+    block_profile: Optional[str] = None  # 浏览器渲染资源拦截档位 off / lite / strict，空则按域名/全局配置
     created_at: float = Field(default_factory=time.time)
     # 接口与格式
     api_type: str = "proxy"  # proxy / raw / reader
@@ -34,6 +41,73 @@ class ScrapeConfig(BaseModel):
     proxy: Optional[str] = None  # 指定代理地址（proxy_mode=fixed时使用）
     # 缓存
     cache_ttl: int = 0  # 缓存时间（秒），0 表示不缓存
+    stale_ttl: int = 0  # 缓存过期后仍可返回旧结果的时间（秒），期间后台刷新一次
+
+# 规则变更广播频道
+RULE_INVALIDATE_CHANNEL = "rule_invalidate"
+
+# 规则列表分页默认/最大条数
+RULE_PAGE_SIZE = 50
+RULE_PAGE_MAX = 200
+
+_PLACEHOLDER_RE = re.compile(r"\{([^{}]+)\}")
+
+
+class _Template:
+    """预编译的占位符模板：拆分为字面量与参数名交替的片段，渲染时一次拼接
+
+    未提供的参数保留原占位符文本。
+    """
+
+    __slots__ = ("parts", "names")
+
+    def __init__(self, text: str):
+        # parts 偶数位为字面量，奇数位为参数名
+        self.parts = _PLACEHOLDER_RE.split(text)
+        self.names = frozenset(self.parts[1::2])
+
+    def render(self, params: Dict[str, str]) -> str:
+        parts = self.parts
+        out = [parts[0]]
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            value = params.get(name)
+            out.append(f"{{{name}}}" if value is None else value)
+            out.append(parts[i + 1])
+        return "".join(out)
+
+
+class CompiledRule:
+    """已解析的规则及其参数模板（缓存共享，调用方不得修改 rule）"""
+
+    def __init__(self, rule: ScrapeConfig):
+        self.rule = rule
+        self._url = _Template(rule.target_url) if rule.target_url else None
+        self._body = _Template(rule.body) if rule.body else None
+        self._headers = {k: _Template(v) for k, v in (rule.headers or {}).items() if isinstance(v, str)}
+        names = set()
+        for template in (self._url, self._body, *self._headers.values()):
+            if template:
+                names |= template.names
+        self.param_names = frozenset(names)
+
+    def render(self, params: Dict[str, str]) -> ScrapeConfig:
+        """将 URL 查询参数代入 target_url、body 与请求头中的 {param} 占位符
+
+        例如: target_url="https://example.com/search?q={q}" 或 body="searchkey={q}"
+        不含相关占位符时直接返回原规则，否则返回副本。
+        """
+        if not params or not self.param_names.intersection(params):
+            return self.rule
+        update: Dict[str, Any] = {}
+        if self._url:
+            update["target_url"] = self._url.render(params)
+        if self._body:
+            update["body"] = self._body.render(params)
+        if self._headers:
+            update["headers"] = {**self.rule.headers, **{k: t.render(params) for k, t in self._headers.items()}}
+        return self.rule.model_copy(update=update)
+
 
 class RuleService:
     def __init__(self):
@@ -41,10 +115,142 @@ class RuleService:
         self.redis_url = getattr(settings, "REDIS_URL", "redis://localhost:6379")
         self.client = redis.from_url(self.redis_url, decode_responses=True)
         self.prefix = "rule:"
+        # 二级索引（有序集合，分数为 created_at）：全部规则、按所有者、无所有者、公开规则
+        self.index_all = "rules:by_created"
+        self.index_owner_prefix = "rules:owner:"
+        self.index_unowned = "rules:unowned"
+        self.index_public = "rules:public"
+        # 进程内规则缓存: rule_id -> (CompiledRule, 缓存时间)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._listener = None
+        self._start_listener()
+        self._backfill_index()
 
     def _get_key(self, rule_id: str) -> str:
         return f"{self.prefix}{rule_id}"
 
+    # ------------------------------------------------------------------
+    # 二级索引
+    # ------------------------------------------------------------------
+
+    def _owner_index(self, owner: Optional[str]) -> str:
+        return f"{self.index_owner_prefix}{owner}" if owner else self.index_unowned
+
+    def _index_add(self, pipe, rule: ScrapeConfig):
+        member = {rule.id: rule.created_at}
+        pipe.zadd(self.index_all, member)
+        pipe.zadd(self._owner_index(rule.owner), member)
+        if rule.is_public:
+            pipe.zadd(self.index_public, member)
+        else:
+            pipe.zrem(self.index_public, rule.id)
+
+    def _index_remove(self, pipe, rule: ScrapeConfig):
+        pipe.zrem(self.index_all, rule.id)
+        pipe.zrem(self._owner_index(rule.owner), rule.id)
+        pipe.zrem(self.index_public, rule.id)
+
+    def _backfill_index(self):
+        """旧版本保存的规则没有索引，首次启动时用 SCAN 补建（仅执行一次）"""
+        marker = "rules:indexed"
+        try:
+            if self.client.exists(marker):
+                return
+            count = 0
+            for key in self.client.scan_iter(match=f"{self.prefix}*", count=500):
+                data = self.client.get(key)
+                if not data:
+                    continue
+                try:
+                    rule = ScrapeConfig.model_validate_json(data)
+                except Exception:
+                    continue
+                rule.id = rule.id or key[len(self.prefix):]
+                pipe = self.client.pipeline()
+                self._index_add(pipe, rule)
+                pipe.execute()
+                count += 1
+            self.client.set(marker, 1)
+            if count:
+                log.info(f"[RuleService] 已为 {count} 条规则建立索引")
+        except redis.RedisError as e:
+            log.warning(f"[RuleService] 建立规则索引失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 进程内规则缓存
+    # ------------------------------------------------------------------
+
+    def _start_listener(self):
+        """订阅规则变更广播，其他副本修改规则时逐出本地缓存"""
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{RULE_INVALIDATE_CHANNEL: self._on_invalidate_message})
+            self._listener = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+            )
+        except redis.RedisError as e:
+            log.warning(f"[RuleService] 订阅规则变更失败，缓存仅按 RULE_CACHE_MAX_AGE 过期: {e}")
+
+    def _on_invalidate_message(self, message: Dict[str, Any]):
+        self._evict(message.get("data") or None)
+
+    def _on_listener_error(self, error: Exception, pubsub, thread):
+        # 连接中断期间可能错过广播，清空缓存后稍候由 redis-py 重连
+        log.warning(f"[RuleService] 规则变更订阅中断: {error}")
+        self._evict(None)
+        time.sleep(1.0)
+
+    def _evict(self, rule_id: Optional[str]):
+        """逐出指定规则；rule_id 为空时清空"""
+        with self._cache_lock:
+            if rule_id is None:
+                count = len(self._cache)
+                self._cache.clear()
+            else:
+                count = 1 if self._cache.pop(rule_id, None) else 0
+            self._cache_stats["invalidations"] += count
+
+    def _invalidate(self, rule_id: str):
+        """规则写入/删除后逐出本地缓存并通知其他副本"""
+        self._evict(rule_id)
+        try:
+            self.client.publish(RULE_INVALIDATE_CHANNEL, rule_id)
+        except redis.RedisError as e:
+            log.warning(f"[RuleService] 广播规则变更失败: {e}")
+
+    def get_compiled(self, rule_id: str) -> Optional[CompiledRule]:
+        """获取已解析并预编译模板的规则，命中进程内缓存时不访问 Redis"""
+        now = time.time()
+        with self._cache_lock:
+            entry = self._cache.get(rule_id)
+            if entry and now - entry[1] < settings.RULE_CACHE_MAX_AGE:
+                self._cache.move_to_end(rule_id)
+                self._cache_stats["hits"] += 1
+                return entry[0]
+            self._cache_stats["misses"] += 1
+
+        rule = self._load_rule(rule_id)
+        if rule is None:
+            return None
+        compiled = CompiledRule(rule)
+        with self._cache_lock:
+            self._cache[rule_id] = (compiled, now)
+            self._cache.move_to_end(rule_id)
+            while len(self._cache) > settings.RULE_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            lookups = self._cache_stats["hits"] + self._cache_stats["misses"]
+            return {
+                "size": len(self._cache),
+                **self._cache_stats,
+                "hit_rate": round(self._cache_stats["hits"] / lookups * 100, 1) if lookups else 0,
+            }
+
     def create_rule(self, rule: ScrapeConfig) -> str:
         """创建或更新规则"""
         is_update = False
@@ -65,7 +271,15 @@ class RuleService:
         key = self._get_key(rule.id)
 
         try:
-            self.client.set(key, rule.model_dump_json())
+            # 数据与索引在同一事务中写入；所有者/公开状态变化时先移出旧索引
+            previous = self._load_rule(rule.id) if is_update else None
+            pipe = self.client.pipeline()
+            if previous:
+                self._index_remove(pipe, previous)
+            pipe.set(key, rule.model_dump_json())
+            self._index_add(pipe, rule)
+            pipe.execute()
+            self._invalidate(rule.id)
             action = "更新" if is_update else "创建"
             log.info(f"[RuleService] {action}规则: {rule.id} ({rule.name})")
             return rule.id
@@ -74,6 +288,11 @@ class RuleService:
             raise
 
     def get_rule(self, rule_id: str) -> Optional[ScrapeConfig]:
+        """获取规则（进程内缓存共享的实例，调用方不得修改）"""
+        compiled = self.get_compiled(rule_id)
+        return compiled.rule if compiled else None
+
+    def _load_rule(self, rule_id: str) -> Optional[ScrapeConfig]:
         key = self._get_key(rule_id)
         try:
             data = self.client.get(key)
@@ -84,37 +303,124 @@ class RuleService:
             log.error(f"[RuleService]读取失败: {e}")
             return None
 
-    def list_rules(self, owner: Optional[str] = None, is_admin: bool = False) -> List[ScrapeConfig]:
-        """获取规则列表
+    def list_rules(
+        self,
+        owner: Optional[str] = None,
+        is_admin: bool = False,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        public_only: bool = False,
+    ) -> Tuple[List[ScrapeConfig], Optional[str]]:
+        """按创建时间倒序获取规则列表
 
         Args:
-            owner: 用户名，非管理员只能看到自己的规则
+            owner: 用户名，非管理员只能看到自己的规则与无所有者的规则
             is_admin: 是否管理员，管理员可以看到所有规则
+            cursor: 上一页返回的游标，为空从最新开始
+            limit: 每页条数；cursor 与 limit 都为空时返回全部规则（兼容旧客户端）
+            public_only: 只列出公开规则，非管理员看到的他人规则不含请求头/请求体/代理
+
+        Returns:
+            (规则列表, 下一页游标)，没有更多时游标为 None
         """
+        if public_only:
+            indexes = [self.index_public]
+        elif is_admin or not owner:
+            indexes = [self.index_all]
+        else:
+            indexes = [self._owner_index(owner), self.index_unowned]
+
+        after = self._parse_cursor(cursor)
+        paginate = after is not None or limit is not None
+        limit = max(1, min(limit or RULE_PAGE_SIZE, RULE_PAGE_MAX)) if paginate else None
         try:
-            keys = self.client.keys(f"{self.prefix}*")
+            # 各索引取游标之后的一页，合并后取前 limit 条
+            pages = self._fetch_pages(indexes, after, limit)
+            entries = [entry for page in pages for entry in page]
+            entries.sort(key=lambda item: (item[1], item[0]), reverse=True)
+            # 任一索引取满一页即可能还有后续
+            has_more = paginate and any(len(page) >= limit for page in pages)
+            if paginate:
+                entries = entries[:limit]
+
             rules = []
-            for key in keys:
-                data = self.client.get(key)
-                if data:
+            if entries:
+                values = self.client.mget([self._get_key(rule_id) for rule_id, _ in entries])
+                for data in values:
+                    if not data:
+                        continue
                     try:
                         rule = ScrapeConfig.model_validate_json(data)
-                        # 权限过滤：管理员看所有，普通用户只看自己的
-                        if is_admin or not owner or rule.owner == owner or rule.owner is None:
-                            rules.append(rule)
                     except Exception:
-                        pass
-            # 按时间倒序
-            rules.sort(key=lambda x: x.created_at, reverse=True)
-            return rules
+                        continue
+                    if not is_admin and rule.owner and rule.owner != owner:
+                        rule = self._redact(rule)
+                    rules.append(rule)
+            next_cursor = None
+            if has_more and entries:
+                last_id, last_score = entries[-1]
+                next_cursor = f"{last_score!r}:{last_id}"
+            return rules, next_cursor
         except Exception as e:
             log.error(f"[RuleService] 列表获取失败: {e}")
-            return []
+            return [], None
+
+    @staticmethod
+    def _redact(rule: ScrapeConfig) -> ScrapeConfig:
+        """他人的公开规则只展示基本信息，去掉可能含凭据的请求头、请求体与代理"""
+        return rule.model_copy(update={"headers": {}, "body": None, "proxy": None})
+
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+        if not cursor:
+            return None
+        score, _, rule_id = cursor.partition(":")
+        try:
+            return float(score), rule_id
+        except ValueError:
+            raise ValueError(f"无效的游标: {cursor}")
+
+    def _fetch_pages(
+        self, indexes: List[str], after: Optional[Tuple[float, str]], limit: Optional[int]
+    ) -> List[list]:
+        """从每个索引取游标 (created_at, rule_id) 之后的 limit 条 (rule_id, created_at)，按 (created_at, rule_id) 倒序
+
+        limit 为空时取全部。游标规则被删除后仍按 (created_at, rule_id) 定位：
+        与游标同分的规则按 id 过滤，再接分数更小的规则，相同 created_at 不会遗漏。
+        """
+        pipe = self.client.pipeline(transaction=False)
+        if after is None:
+            for index in indexes:
+                pipe.zrevrange(index, 0, -1 if limit is None else limit - 1, withscores=True)
+            return pipe.execute()
+
+        score, rule_id = after
+        for index in indexes:
+            pipe.zrevrangebyscore(index, score, score, withscores=True)
+            pipe.zrevrangebyscore(index, f"({score!r}", "-inf", start=0, num=limit, withscores=True)
+        results = pipe.execute()
+
+        pages = []
+        for i in range(len(indexes)):
+            ties = [(member, s) for member, s in results[2 * i] if member < rule_id]
+            pages.append((ties + results[2 * i + 1])[:limit])
+        return pages
 
     def delete_rule(self, rule_id: str) -> bool:
         key = self._get_key(rule_id)
         try:
-            return bool(self.client.delete(key))
+            rule = self._load_rule(rule_id)
+            pipe = self.client.pipeline()
+            pipe.delete(key)
+            if rule:
+                self._index_remove(pipe, rule)
+            else:
+                # 数据已丢失时至少从总索引与公开索引中移除
+                pipe.zrem(self.index_all, rule_id)
+                pipe.zrem(self.index_public, rule_id)
+            deleted = bool(pipe.execute()[0])
+            self._invalidate(rule_id)
+            return deleted
         except Exception:
             return False
 
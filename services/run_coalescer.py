@@ -0,0 +1,200 @@
+"""
+规则执行合并 - 相同规则 + 相同参数的并发执行只访问一次上游
+
+- 进程内：按结果缓存键 (_get_cache_key) 合并，第一个请求执行，其余请求等待并共享结果
+- 跨副本：规则开启缓存时，通过 Redis 锁选出一个副本执行，其他副本等待结果写入结果缓存后直接读取；
+  持有者失败或超时未写入时，等待者自行执行
+- 持有者把锁令牌随结果写入缓存，等待者按令牌识别本次执行的结果，不比较各副本的时钟；
+  完成时在 run_done:<键> 频道发布令牌，等待者订阅该频道而不是轮询
+- 未开启缓存的规则没有可共享的结果存储，只做进程内合并
+"""
+
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Response
+
+from config import settings
+from utils.logger import log
+
+# 等待进行中执行结果的最长时间（秒），需覆盖浏览器模式的完整执行
+RUN_WAIT_TIMEOUT = 120
+# 跨副本执行锁 TTL（秒），持有者崩溃后自动释放
+RUN_LOCK_TTL = 120
+# 等待完成通知时检查持有者是否仍持有锁的间隔（秒），从最小值起逐次翻倍
+RUN_CHECK_INTERVAL_MIN = 0.5
+RUN_CHECK_INTERVAL_MAX = 5.0
+
+# 仅释放自己持有的锁，并在完成频道发布令牌 (KEYS[1]=锁键, ARGV[1]=令牌, ARGV[2]=完成频道)
+_RELEASE_LOCK_LUA = """
+redis.call('PUBLISH', ARGV[2], ARGV[1])
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _InflightRun:
+    """进行中的规则执行，等待者共享其结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+def _share(result: Any) -> Any:
+    """为等待者复制 Response：框架会在响应对象上挂载各自请求的后台任务，不能共用同一对象"""
+    if isinstance(result, Response):
+        headers = {k: v for k, v in result.headers.items() if k.lower() != "content-length"}
+        return Response(content=result.body, status_code=result.status_code, headers=headers)
+    return result
+
+
+class RunCoalescer:
+    """规则执行合并器"""
+
+    def __init__(self):
+        self._inflight: Dict[str, _InflightRun] = {}
+        self._lock = threading.Lock()
+        self._stats = {"executions": 0, "coalesced": 0, "remote_waits": 0, "remote_hits": 0}
+        try:
+            import redis
+            self._redis = redis.from_url(getattr(settings, "REDIS_URL", "redis://localhost:6379"), decode_responses=True)
+            self._release_script = self._redis.register_script(_RELEASE_LOCK_LUA)
+        except Exception as e:
+            log.warning(f"[Runner] Redis 不可用，规则执行只在进程内合并: {e}")
+            self._redis = None
+
+    def run(
+        self,
+        key: str,
+        execute: Callable[[Optional[str]], Any],
+        load_shared: Optional[Callable[[str], Any]] = None,
+    ) -> Any:
+        """执行或加入进行中的执行
+
+        Args:
+            key: 合并键（结果缓存键）
+            execute: 实际执行规则（并写入结果缓存），参数为本次执行的锁令牌（未跨副本合并时为 None），
+                需随结果一起写入缓存
+            load_shared: 按令牌读取其他副本写入的结果，不是该令牌的结果或未就绪返回 None；为空时不做跨副本合并
+        """
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = _InflightRun()
+                self._inflight[key] = flight
+                is_leader = True
+            else:
+                flight.waiters += 1
+                self._stats["coalesced"] += 1
+                is_leader = False
+
+        if not is_leader:
+            log.info(f"[Runner] 等待进行中的相同执行: {key} (已合并 {flight.waiters} 个请求)")
+            if not flight.event.wait(timeout=RUN_WAIT_TIMEOUT):
+                raise Exception(f"等待规则执行结果超时 ({RUN_WAIT_TIMEOUT}秒)")
+            if flight.error is not None:
+                raise flight.error
+            return _share(flight.result)
+
+        try:
+            flight.result = self._run_leader(key, execute, load_shared)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _run_leader(
+        self, key: str, execute: Callable[[Optional[str]], Any], load_shared: Optional[Callable[[str], Any]]
+    ) -> Any:
+        if load_shared is None or self._redis is None:
+            return self._execute(execute, None)
+
+        lock_key = f"run_lock:{key}"
+        channel = f"run_done:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = bool(self._redis.set(lock_key, token, nx=True, ex=RUN_LOCK_TTL))
+            holder = None if acquired else self._redis.get(lock_key)
+            if not acquired and holder is None:
+                # 持有者刚好释放，再抢一次
+                acquired = bool(self._redis.set(lock_key, token, nx=True, ex=RUN_LOCK_TTL))
+        except Exception as e:
+            log.warning(f"[Runner] 获取执行锁失败，直接执行: {e}")
+            return self._execute(execute, None)
+
+        if not acquired:
+            shared = self._wait_remote(lock_key, channel, holder, load_shared) if holder else None
+            if shared is not None:
+                return shared
+            return self._execute(execute, None)
+
+        try:
+            return self._execute(execute, token)
+        finally:
+            try:
+                self._release_script(keys=[lock_key], args=[token, channel])
+            except Exception as e:
+                log.warning(f"[Runner] 释放执行锁失败: {e}")
+
+    def _wait_remote(self, lock_key: str, channel: str, holder: str, load_shared: Callable[[str], Any]) -> Any:
+        """订阅完成频道等待持有锁的副本写入结果；持有者结束仍无结果或超时返回 None"""
+        with self._lock:
+            self._stats["remote_waits"] += 1
+        log.info(f"[Runner] 其他副本正在执行，等待结果: {lock_key}")
+        deadline = time.time() + RUN_WAIT_TIMEOUT
+        interval = RUN_CHECK_INTERVAL_MIN
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(channel)
+            while time.time() < deadline:
+                # 订阅后再检查，避免错过订阅前已发布的完成通知；
+                # 先看锁再读结果：持有者先写结果后释放锁，锁已释放时结果必然可见
+                held = self._redis.get(lock_key) == holder
+                result = load_shared(holder)
+                if result is not None:
+                    with self._lock:
+                        self._stats["remote_hits"] += 1
+                    return result
+                if not held:
+                    break
+                message = pubsub.get_message(timeout=min(interval, max(deadline - time.time(), 0.1)))
+                if message is None:
+                    interval = min(interval * 2, RUN_CHECK_INTERVAL_MAX)
+        except Exception as e:
+            log.warning(f"[Runner] 等待其他副本结果失败: {e}")
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+        log.warning(f"[Runner] 其他副本未产出结果，自行执行: {lock_key}")
+        return None
+
+    def _execute(self, execute: Callable[[Optional[str]], Any], token: Optional[str]) -> Any:
+        with self._lock:
+            self._stats["executions"] += 1
+        return execute(token)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """执行次数、合并次数与节省的上游请求数"""
+        with self._lock:
+            return {
+                **self._stats,
+                "saved": self._stats["coalesced"] + self._stats["remote_hits"],
+                "inflight": len(self._inflight),
+            }
+
+
+# 全局单例
+run_coalescer = RunCoalescer()
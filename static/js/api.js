@@ -114,6 +114,10 @@ class ApiClient {
         return this.request('/cache/clear', { method: 'POST' });
     }
 
+    async clearSolveBackoff() {
+        return this.request('/solve-backoff/clear', { method: 'POST' });
+    }
+
     // 用户管理
     async getUsers() {
         return this.request('/users');
@@ -139,8 +143,9 @@ class ApiClient {
     }
 
     // 规则管理（使用 /v1 路径，不带 /api 前缀）
-    async getRules() {
-        return this.requestDirect('/v1/rules');
+    async getRules(cursor = null, limit = 50) {
+        const query = `?limit=${limit}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+        return this.requestDirect(`/v1/rules${query}`);
     }
 
     async createRule(rule) {
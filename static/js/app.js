@@ -295,6 +295,21 @@ const app = createApp({
             try {
                 const res = await api.getRules();
                 state.rules.splice(0, state.rules.length, ...(res.rules || []));
+                state.rulesCursor.value = res.next_cursor || null;
+            } catch (e) {
+                notifyError('获取规则列表失败');
+            } finally {
+                state.rulesLoading.value = false;
+            }
+        };
+
+        const loadMoreRules = async () => {
+            if (!state.rulesCursor.value) return;
+            state.rulesLoading.value = true;
+            try {
+                const res = await api.getRules(state.rulesCursor.value);
+                state.rules.push(...(res.rules || []));
+                state.rulesCursor.value = res.next_cursor || null;
             } catch (e) {
                 notifyError('获取规则列表失败');
             } finally {
@@ -315,7 +330,9 @@ const app = createApp({
                 state.ruleForm.proxy_mode = rule.proxy_mode || 'none';
                 state.ruleForm.proxy = rule.proxy || '';
                 state.ruleForm.wait_for = rule.wait_for || '';
+                state.ruleForm.block_profile = rule.block_profile || '';
                 state.ruleForm.cache_ttl = rule.cache_ttl || 0;
+                state.ruleForm.stale_ttl = rule.stale_ttl || 0;
                 state.ruleForm.body_type = rule.body_type || 'none';
                 state.ruleForm.body = rule.body || '';
 
@@ -345,7 +362,9 @@ const app = createApp({
                 state.ruleForm.proxy_mode = 'none';
                 state.ruleForm.proxy = '';
                 state.ruleForm.wait_for = '';
+                state.ruleForm.block_profile = '';
                 state.ruleForm.cache_ttl = 0;
+                state.ruleForm.stale_ttl = 0;
                 state.ruleForm.body_type = 'none';
                 state.ruleForm.body = '';
                 state.ruleForm.headers_list = [];
@@ -392,7 +411,9 @@ const app = createApp({
                     proxy: proxyValue,
                     proxy_mode: state.ruleForm.proxy_mode,
                     wait_for: state.ruleForm.wait_for || null,
+                    block_profile: state.ruleForm.block_profile || null,
                     cache_ttl: state.ruleForm.cache_ttl || 0,
+                    stale_ttl: state.ruleForm.stale_ttl || 0,
                     body_type: state.ruleForm.body_type,
                     body: state.ruleForm.body || null,
                     headers: headersObj,
@@ -625,6 +646,16 @@ const app = createApp({
             }
         };
 
+        const clearSolveBackoff = async () => {
+            try {
+                await api.clearSolveBackoff();
+                showToast('已解除回避', 'success');
+                loadData();
+            } catch (e) {
+                showToast(e.message || '解除回避失败', 'error');
+            }
+        };
+
         const restartBrowserPool = async () => {
             if (!confirm('确定要重启浏览器池吗？')) return;
             try {
@@ -690,7 +721,9 @@ const app = createApp({
             state.ruleForm.proxy_mode = example.proxy_mode || 'none';
             state.ruleForm.proxy = example.proxy || '';
             state.ruleForm.wait_for = example.wait_for || '';
+            state.ruleForm.block_profile = example.block_profile || '';
             state.ruleForm.cache_ttl = example.cache_ttl || 0;
+            state.ruleForm.stale_ttl = example.stale_ttl || 0;
             state.ruleForm.body_type = example.body_type || 'none';
             state.ruleForm.body = example.body || '';
             state.ruleForm.headers_list = [];
@@ -797,6 +830,7 @@ const app = createApp({
 
             // 规则管理
             loadRules,
+            loadMoreRules,
             openRuleForm,
             saveRule,
             deleteRule,
@@ -824,6 +858,7 @@ const app = createApp({
 
             // 其他
             clearAllCache,
+            clearSolveBackoff,
             restartBrowserPool,
             exportRequests,
             exportLogs,
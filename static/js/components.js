@@ -241,7 +241,9 @@ const HELP_TEXTS = {
     // 其他
     is_public: '公开：任何人无需密钥即可调用；私有：需要 API Key 才能访问',
     wait_for: '等待页面中某个元素出现后再采集，确保动态内容加载完成',
+    block_profile: '浏览器渲染时拦截图片、字体、媒体和追踪脚本以加快速度，Cloudflare 验证请求始终放行',
     cache_ttl: '相同请求在此时间内返回缓存结果，0 表示不缓存',
+    stale_ttl: '缓存过期后的这段时间内仍立即返回旧结果，同时在后台刷新一次，0 表示不启用',
     selectors: 'CSS 选择器用于从页面提取特定内容，如 h1 表示标题，.price 表示价格',
     permlink: '专属链接，通过 GET 请求即可获取数据，支持传参替换占位符'
 };
@@ -54,6 +54,7 @@ function createAppState() {
     // 规则管理
     const rules = reactive([]);
     const rulesLoading = ref(false);
+    const rulesCursor = ref(null);
     const showRuleForm = ref(false);
     const editingRule = ref(null);
     const ruleForm = reactive({
@@ -66,7 +67,9 @@ function createAppState() {
         proxy_mode: 'none',
         proxy: '',
         wait_for: '',
+        block_profile: '',
         cache_ttl: 0,
+        stale_ttl: 0,
         body_type: 'none',
         body: '',
         headers_list: [],
@@ -185,6 +188,7 @@ function createAppState() {
         // 规则
         rules,
         rulesLoading,
+        rulesCursor,
         showRuleForm,
         editingRule,
         ruleForm,
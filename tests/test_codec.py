@@ -0,0 +1,31 @@
+"""缓存编解码 (utils/codec.py) 测试"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import codec
+
+
+def test_round_trip():
+    value = {"cookies": {"cf_clearance": "x" * 600}, "content": b"\x00\xff" * 300, "n": 1}
+    assert codec.decode(codec.encode(value)) == value
+
+
+def test_legacy_json():
+    assert codec.decode('{"a": 1}') == {"a": 1}
+    assert codec.decode(None) is None
+
+
+def test_concurrent_round_trip():
+    """多线程并发编解码（zstd 压缩器按线程持有）"""
+
+    def work(i):
+        for j in range(200):
+            value = {"id": i, "j": j, "body": f"{i}-{j}-" * 200, "raw": bytes([i % 256]) * 1024}
+            assert codec.decode(codec.encode(value)) == value
+        return i
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert sorted(executor.map(work, range(16))) == list(range(16))
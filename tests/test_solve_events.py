@@ -0,0 +1,58 @@
+"""过盾事件检测 (core/solve_events.py) 测试"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.solve_events import SolveWatcher, _BINDING_NAME
+
+
+class _Page:
+    tab_id = "main"
+
+
+def _response(watcher, status, headers=None):
+    watcher._on_response(
+        type="Document", frameId="main", response={"status": status, "headers": headers or {}}
+    )
+
+
+def test_404_is_not_challenge():
+    """普通 404 不算挑战：browser_fetcher 只在 challenged 时上报凭证被拒 (report_blocked)"""
+    watcher = SolveWatcher(_Page())
+    _response(watcher, 404, {"server": "cloudflare"})
+    assert not watcher.challenged
+    assert watcher.cleared.is_set() and watcher.document_ready.is_set()
+
+
+def test_500_is_not_challenge():
+    watcher = SolveWatcher(_Page())
+    _response(watcher, 500)
+    assert not watcher.challenged
+
+
+def test_cf_mitigated_is_challenge():
+    watcher = SolveWatcher(_Page())
+    _response(watcher, 403, {"cf-mitigated": "challenge"})
+    assert watcher.challenged
+    assert not watcher.cleared.is_set()
+
+
+def test_403_needs_challenge_marker():
+    watcher = SolveWatcher(_Page())
+    _response(watcher, 403)
+    assert not watcher.challenged and not watcher.cleared.is_set()
+    watcher._on_binding(name=_BINDING_NAME, payload="dom")
+    assert not watcher.challenged and watcher.document_ready.is_set()
+
+    watcher = SolveWatcher(_Page())
+    _response(watcher, 503)
+    watcher._on_binding(name=_BINDING_NAME, payload="challenge")
+    assert watcher.challenged
+
+
+def test_marker_on_200_is_not_challenge():
+    watcher = SolveWatcher(_Page())
+    _response(watcher, 200)
+    watcher._on_binding(name=_BINDING_NAME, payload="challenge")
+    assert not watcher.challenged
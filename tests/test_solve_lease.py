@@ -0,0 +1,83 @@
+"""跨副本过盾租约 (RedisCache 的 acquire / commit / abort Lua 脚本) 测试"""
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis 执行 Lua 脚本所需
+
+import redis
+
+DOMAIN = "example.com"
+CREDS = {"cookies": {"cf_clearance": "abc"}, "user_agent": "Mozilla/5.0"}
+
+
+@pytest.fixture
+def cache_service(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis, "from_url",
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server, decode_responses=kwargs.get("decode_responses", False)),
+    )
+    module = importlib.import_module("services.cache_service")
+    monkeypatch.setattr(module, "solve_turnstile", lambda url, proxy=None: dict(CREDS))
+    return module
+
+
+@pytest.fixture
+def cache(cache_service):
+    # 不调用 start()，避免启动后台线程
+    return cache_service.RedisCache(3600, "redis://fake:6379")
+
+
+def _stored_keys(cache):
+    return cache.redis_client.keys(f"{cache.prefix}*")
+
+
+def test_stale_commit_rejected_after_takeover(cache):
+    lease_key, fence_key, _ = cache._lease_keys(DOMAIN)
+
+    stale = cache._acquire_lease(DOMAIN)
+    assert stale
+    # 持有者卡住，租约 TTL 到期
+    cache.redis_client.delete(lease_key)
+
+    current = cache._acquire_lease(DOMAIN)
+    assert current > stale
+    assert int(cache.redis_client.get(lease_key)) == current
+
+    # 旧持有者恢复后提交：被 fencing 拒绝，不写入凭证，也不动新持有者的租约
+    cache._solve_with_lease(f"https://{DOMAIN}/", DOMAIN, None, stale)
+    assert _stored_keys(cache) == []
+    assert int(cache.redis_client.get(lease_key)) == current
+    assert cache._lease_stats_snapshot()["fenced"] == 1
+
+    # 新持有者正常提交并释放租约
+    creds = cache._solve_with_lease(f"https://{DOMAIN}/", DOMAIN, None, current)
+    assert creds["cookies"] == CREDS["cookies"]
+    assert len(_stored_keys(cache)) == 1
+    assert not cache.redis_client.exists(lease_key)
+    assert cache._lease_stats_snapshot() == {"acquired": 2, "waited": 0, "remote_hits": 0, "fenced": 1}
+
+
+def test_acquire_fails_while_lease_held(cache):
+    assert cache._acquire_lease(DOMAIN)
+    assert cache._acquire_lease(DOMAIN) == 0
+
+
+def test_stale_abort_keeps_new_lease(cache):
+    lease_key, _, channel = cache._lease_keys(DOMAIN)
+
+    stale = cache._acquire_lease(DOMAIN)
+    cache.redis_client.delete(lease_key)
+    current = cache._acquire_lease(DOMAIN)
+
+    cache._abort_lease_script(keys=[lease_key], args=[stale, channel])
+    assert int(cache.redis_client.get(lease_key)) == current
+
+    cache._abort_lease_script(keys=[lease_key], args=[current, channel])
+    assert not cache.redis_client.exists(lease_key)
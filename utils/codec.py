@@ -0,0 +1,137 @@
+"""缓存数据编解码：带版本头的 msgpack + zstd/zlib 二进制格式
+
+凭证缓存 (Redis/SQLite) 与规则结果缓存共用同一格式:
+
+    b"CG" | 版本 (1 字节) | 序列化方式 (1 字节) | 压缩方式 (1 字节) | 数据
+
+- 序列化优先 msgpack，bytes 原样保存；未安装时退化为 JSON，bytes 以 base64 标记保存
+- 超过 COMPRESS_MIN_BYTES 且压缩后更小时压缩，优先 zstd，未安装时用 zlib
+- 没有格式头的数据按旧版 JSON 字符串解析，旧缓存无需迁移
+"""
+from __future__ import annotations
+
+import base64
+import json
+import threading
+import zlib
+from typing import Any, Optional, Union
+
+from utils.logger import log
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 依赖缺失时退化为 JSON
+    msgpack = None
+    log.warning("[Codec] 未安装 msgpack，缓存数据使用 JSON 序列化: pip install msgpack")
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 依赖缺失时退化为 zlib
+    zstandard = None
+
+MAGIC = b"CG"
+VERSION = 1
+
+SERIALIZER_JSON = 0
+SERIALIZER_MSGPACK = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+# 小于此大小的数据不压缩（压缩头开销大于收益）
+COMPRESS_MIN_BYTES = 256
+
+_HEADER_SIZE = len(MAGIC) + 3
+# JSON 序列化时 bytes 的标记键
+_BYTES_TAG = "__bytes__"
+
+# zstd 压缩/解压器不是线程安全的，编解码会在请求线程池、L1 监听线程与统计刷新线程中并发调用，按线程各持一份
+_zstd_local = threading.local()
+
+
+def _zstd_compressor():
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=3)
+    return compressor
+
+
+def _zstd_decompressor():
+    decompressor = getattr(_zstd_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, (bytes, bytearray)):
+        return {_BYTES_TAG: base64.b64encode(obj).decode("ascii")}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_object_hook(obj: dict) -> Any:
+    if len(obj) == 1 and _BYTES_TAG in obj:
+        return base64.b64decode(obj[_BYTES_TAG])
+    return obj
+
+
+def _serialize(obj: Any) -> tuple:
+    if msgpack is not None:
+        return SERIALIZER_MSGPACK, msgpack.packb(obj, use_bin_type=True)
+    return SERIALIZER_JSON, json.dumps(obj, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _compress(payload: bytes) -> tuple:
+    if len(payload) < COMPRESS_MIN_BYTES:
+        return COMPRESSION_NONE, payload
+    if zstandard is not None:
+        method, compressed = COMPRESSION_ZSTD, _zstd_compressor().compress(payload)
+    else:
+        method, compressed = COMPRESSION_ZLIB, zlib.compress(payload, 6)
+    if len(compressed) >= len(payload):
+        return COMPRESSION_NONE, payload
+    return method, compressed
+
+
+def encode(obj: Any) -> bytes:
+    """序列化并按需压缩，返回带格式头的字节串"""
+    serializer, payload = _serialize(obj)
+    compression, payload = _compress(payload)
+    return MAGIC + bytes((VERSION, serializer, compression)) + payload
+
+
+def decode(data: Optional[Union[bytes, str]]) -> Any:
+    """解析 encode 的输出；没有格式头的数据按旧版 JSON 解析。空数据返回 None"""
+    if not data:
+        return None
+    if isinstance(data, str) or not data.startswith(MAGIC):
+        return json.loads(data)
+
+    version, serializer, compression = data[len(MAGIC):_HEADER_SIZE]
+    if version != VERSION:
+        raise ValueError(f"不支持的缓存数据版本: {version}")
+    payload = data[_HEADER_SIZE:]
+
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise ValueError("缓存数据使用 zstd 压缩，但未安装 zstandard")
+        payload = _zstd_decompressor().decompress(payload)
+    elif compression == COMPRESSION_ZLIB:
+        payload = zlib.decompress(payload)
+    elif compression != COMPRESSION_NONE:
+        raise ValueError(f"未知的压缩方式: {compression}")
+
+    if serializer == SERIALIZER_MSGPACK:
+        if msgpack is None:
+            raise ValueError("缓存数据使用 msgpack 序列化，但未安装 msgpack")
+        return msgpack.unpackb(payload, raw=False)
+    if serializer == SERIALIZER_JSON:
+        return json.loads(payload, object_hook=_json_object_hook)
+    raise ValueError(f"未知的序列化方式: {serializer}")
+
+
+def describe() -> str:
+    """当前写入使用的格式，如 "msgpack+zstd" """
+    serializer = "msgpack" if msgpack is not None else "json"
+    return f"{serializer}+{'zstd' if zstandard is not None else 'zlib'}"
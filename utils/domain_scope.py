@@ -0,0 +1,82 @@
+"""Cookie 作用域工具：可注册域名解析与按域名层级查找凭证。
+
+凭证缓存按 cf_clearance 的实际作用域存储：
+- 域 Cookie (Domain=.site.com) 存为 ".site.com"，site.com 的所有子域名共享
+- 仅主机 Cookie (无 Domain 属性) 存为主机名本身，只供该主机使用
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from utils.logger import log
+
+try:
+    import tldextract
+
+    # 使用内置的公共后缀列表快照，不联网下载
+    _extract = tldextract.TLDExtract(suffix_list_urls=())
+except ImportError:  # pragma: no cover - 依赖缺失时退化为取最后两级
+    _extract = None
+    log.warning("[DomainScope] 未安装 tldextract，可注册域名按最后两级域名估算: pip install tldextract")
+
+
+def url_host(url: str) -> str:
+    """URL 或 netloc 的主机名（小写，不含端口：Cookie 不区分端口）"""
+    parsed = urlparse(url if "//" in url else f"//{url}")
+    return (parsed.hostname or parsed.netloc or url).lower()
+
+
+@lru_cache(maxsize=4096)
+def registrable_domain(host: str) -> str:
+    """返回主机的可注册域名 (eTLD+1)，如 www.site.co.uk -> site.co.uk；IP/单级主机名原样返回"""
+    host = host.lower().rstrip(".")
+    if _extract is not None:
+        ext = _extract(host)
+        if ext.domain and ext.suffix:
+            return f"{ext.domain}.{ext.suffix}"
+        return host
+    labels = host.split(".")
+    if len(labels) <= 2 or labels[-1].isdigit():
+        return host
+    return ".".join(labels[-2:])
+
+
+def cookie_scope(host: str, cookie_domain: Optional[str]) -> str:
+    """根据 Cookie 的 Domain 属性确定凭证存储作用域
+
+    域 Cookie 返回 ".scope"；仅主机 Cookie、作用域与主机不匹配或宽于可注册域名（公共后缀）时返回主机名。
+    """
+    host = host.lower()
+    if not cookie_domain or not cookie_domain.startswith("."):
+        return host
+    scope = cookie_domain.lower().lstrip(".")
+    if host != scope and not host.endswith("." + scope):
+        return host
+    registrable = registrable_domain(host)
+    if scope != registrable and not scope.endswith("." + registrable):
+        return host
+    return "." + scope
+
+
+def lookup_scopes(host: str) -> List[str]:
+    """按优先级列出可能覆盖该主机的凭证作用域：主机本身，再逐级向上到可注册域名的域作用域
+
+    www.a.site.com -> ["www.a.site.com", ".www.a.site.com", ".a.site.com", ".site.com"]
+    """
+    host = host.lower()
+    registrable = registrable_domain(host)
+    scopes = [host]
+    labels = host.split(".")
+    for i in range(len(labels)):
+        candidate = ".".join(labels[i:])
+        scopes.append("." + candidate)
+        if candidate == registrable:
+            break
+    return scopes
+
+
+def scope_host(scope: str) -> str:
+    """作用域对应的主机名（去掉域作用域的前导点）"""
+    return scope.lstrip(".")